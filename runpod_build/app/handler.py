@@ -13,6 +13,10 @@ import gc
 import torch
 import tempfile
 import json
+import time
+import shutil
+import asyncio
+import threading
 from pathlib import Path
 
 # Adiciona src ao path
@@ -22,40 +26,181 @@ sys.path.insert(0, str(Path(__file__).parent / "src"))
 from core.ai_services.local_ai_service import (
     transcribe_audio_batch,
     generate_viral_title_batch,
-    manually_unload_whisper,
-    manually_unload_llama
+    generate_viral_titles,
+    analyze_viral_segments_deepseek,
+    slice_transcript_text,
+    transcribe_stream,
+    stt_settings,
+    MODEL_REGISTRY
 )
+from core.ai_services.long_form import stitch_results
+from modules.AnimeCut.ffmpeg_engine import probe_video, renderizar_corte_ffmpeg
+from core.downloader import download, discard_download, cached_path
+from core.job_cache import open_job
+from core.metrics import start_job, stage, record_model, run_in_context
+from core.ai_services.audio_io import SAMPLE_RATE, decode_audio_16k, EpisodeAudio
+from core.ai_services.model_registry import detect_available_ram_mb
+from core.ai_services.completion_cache import set_bypass as bypass_llm_cache
 
-# Variáveis globais para cache de modelos
-MODELS_LOADED = False
+# ==================== MODELOS ====================
+# Modelos que cada operação usa: o primeiro job carrega só o que precisa
+# (generate_title não espera o Whisper; operação desconhecida não carrega nada)
+OPERATION_MODELS = {
+    "process_video": ("whisper", "llama"),
+    "transcribe_audio": ("whisper",),
+    "generate_title": ("llama",),
+}
+ALL_MODELS = ("whisper", "llama")
 
-def initialize_models():
-    """Inicializa modelos uma única vez"""
-    global MODELS_LOADED
+# Aquecimento no boot do worker (uma thread por modelo, em paralelo com o
+# primeiro job): "all" (padrão), "whisper,llama" ou "" (sob demanda)
+PREFETCH_MODELS = os.environ.get("AUTOCORTES_PREFETCH_MODELS", "all")
+
+# Cold start de cada modelo (segundos desde o boot): início/fim da carga,
+# espera do primeiro estágio que precisou dele e quanto da carga ficou escondido
+BOOT_TIME = time.perf_counter()
+MODEL_STARTUP = {}
+
+# ==================== CONCORRÊNCIA ====================
+# Jobs simultâneos por worker (teto); o valor efetivo cai quando falta RAM livre
+MAX_CONCURRENCY = int(os.environ.get("AUTOCORTES_MAX_CONCURRENCY", "4"))
+
+# Estágios pesados (transcrição/análise/render) em paralelo no mesmo worker
+MAX_HEAVY_JOBS = int(os.environ.get("AUTOCORTES_MAX_HEAVY_JOBS", "1"))
+
+# RAM livre exigida para aceitar mais um job simultâneo
+JOB_RAM_HEADROOM_MB = float(os.environ.get("AUTOCORTES_JOB_RAM_MB", "2048"))
+
+HEAVY_JOB_SEMAPHORE = asyncio.Semaphore(MAX_HEAVY_JOBS)
+
+# Modo streaming (handler gerador): transcrição, segmentos e cada corte
+# são enviados assim que ficam prontos
+STREAMING = os.environ.get("AUTOCORTES_STREAMING", "0") in ("1", "true", "True")
+
+# Renderização paralela do modo manual: cada worker conduz um processo ffmpeg.
+# 0 = automático (núcleos / 2, limitado às sessões NVENC quando há GPU)
+RENDER_WORKERS = int(os.environ.get("AUTOCORTES_RENDER_WORKERS", "0"))
+NVENC_SESSIONS = int(os.environ.get("AUTOCORTES_NVENC_SESSIONS", "3"))
+
+# Pipeline progressivo (opt-in): o ffmpeg lê a URL e a transcrição roda enquanto
+# o download ainda acontece (latência ~ max(download, transcrição)). O ffmpeg
+# busca a mesma URL que o downloader: o vídeo trafega ~2x. MP4 com o moov no
+# fim não pode ser lido em stream único, então não há tee do mesmo download.
+PROGRESSIVE = os.environ.get("AUTOCORTES_PROGRESSIVE", "0") in ("1", "true", "True")
+
+def concurrency_modifier(current_concurrency):
+    """
+    Concorrência do worker para o RunPod: teto configurado, limitado pela
+    RAM livre (cada job precisa de JOB_RAM_HEADROOM_MB).
     
-    if not MODELS_LOADED:
-        print("[INIT] Carregando modelos...")
-        
-        # Pre-load Whisper
-        try:
-            from core.ai_services.local_ai_service import load_whisper_model
-            load_whisper_model()
-            print("[INIT] ✅ Whisper carregado")
-        except Exception as e:
-            print(f"[INIT] ⚠️  Whisper: {e}")
-        
-        # Pre-load Llama
-        try:
-            from core.ai_services.local_ai_service import load_llama_model
-            load_llama_model()
-            print("[INIT] ✅ Llama carregado")
-        except Exception as e:
-            print(f"[INIT] ⚠️  Llama: {e}")
-        
-        MODELS_LOADED = True
-        print("[INIT] ✅ Modelos inicializados")
+    `current_concurrency` é o limite atual (não o número de jobs rodando):
+    o alvo sai só da RAM livre e do teto, então o limite também pode cair.
+    """
+    target = MAX_CONCURRENCY
+    free_mb = detect_available_ram_mb()
+    if free_mb and JOB_RAM_HEADROOM_MB > 0:
+        target = min(target, int(free_mb // JOB_RAM_HEADROOM_MB))
+    return max(1, target)
 
-def process_video(job):
+def load_model(name):
+    """
+    Carrega um modelo pelo MODEL_REGISTRY (uma única vez; ele permanece
+    residente entre jobs, com despejo LRU só se o orçamento for excedido).
+    Thread-safe: o registro serializa a carga (load_lock por modelo), então
+    quem chega durante a carga espera por ela.
+    """
+    if MODEL_REGISTRY.is_loaded(name):
+        return True
+    
+    t0 = time.perf_counter()
+    try:
+        instance = MODEL_REGISTRY.get(name)
+    except Exception as e:
+        print(f"[INIT] ⚠️  {name}: {e}")
+        instance = None
+    if instance is None:
+        print(f"[INIT] ⚠️  {name}: falha ao carregar")
+        return False
+    
+    load_s = round(time.perf_counter() - t0, 2)
+    # Só quem carregou registra (quem esperou pela carga chega depois)
+    if name not in MODEL_STARTUP:
+        MODEL_STARTUP[name] = {
+            "started_at_s": round(t0 - BOOT_TIME, 2),
+            "load_s": load_s,
+            "ready_at_s": round(time.perf_counter() - BOOT_TIME, 2)
+        }
+        print(f"[INIT] ✅ {name} carregado em {load_s:.1f}s")
+    return True
+
+def warm_up_models(names):
+    """
+    Carrega os modelos em segundo plano, uma thread por modelo (Whisper na
+    GPU e Llama na CPU carregam juntos). Não bloqueia: os estágios esperam
+    só pelo modelo que usam (wait_for_model).
+    """
+    threads = []
+    for name in names:
+        if MODEL_REGISTRY.is_loaded(name):
+            continue
+        thread = threading.Thread(target=load_model, args=(name,), name=f"warmup-{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+def start_prefetch():
+    """Aquece AUTOCORTES_PREFETCH_MODELS no boot (não atrasa o início do worker)."""
+    if PREFETCH_MODELS.strip().lower() == "all":
+        names = ALL_MODELS
+    else:
+        names = [n.strip() for n in PREFETCH_MODELS.split(",") if n.strip() in ALL_MODELS]
+    if names:
+        print(f"[INIT] Aquecendo em segundo plano: {', '.join(names)}")
+    return warm_up_models(names)
+
+def wait_for_model(name):
+    """
+    Bloqueia até o modelo estar pronto (espera o aquecimento em curso ou
+    carrega agora). A espera do primeiro estágio mostra quanto do cold start
+    ficou escondido atrás do download/estágios anteriores.
+    """
+    warm = MODEL_REGISTRY.is_loaded(name)
+    t0 = time.perf_counter()
+    load_model(name)
+    waited = time.perf_counter() - t0
+    record_model(name, "warm" if warm else "cold", waited)
+    
+    info = MODEL_STARTUP.get(name)
+    if info is not None and "first_wait_s" not in info:
+        info["first_wait_s"] = round(waited, 2)
+        info["hidden_s"] = round(max(0.0, info["load_s"] - waited), 2)
+        print(f"[INIT] {name}: espera de {waited:.1f}s ({info['hidden_s']:.1f}s da carga escondidos)")
+    return waited
+
+def with_model(name, func, *args, **kwargs):
+    """Executa func depois de esperar o modelo (para asyncio.to_thread)."""
+    wait_for_model(name)
+    return func(*args, **kwargs)
+
+def startup_report():
+    """Tempos de cold start dos modelos (anexados às respostas)."""
+    return {"uptime_s": round(time.perf_counter() - BOOT_TIME, 2), "models": dict(MODEL_STARTUP)}
+
+def download_video(video_url):
+    """
+    Baixa o vídeo (faixas paralelas, cache LRU em disco) e retorna o caminho.
+    Libere com discard_download(): arquivos do cache são mantidos.
+    """
+    with stage("download"):
+        return download(video_url)
+
+def transcribe_progressive(video_url):
+    """Transcrição progressiva direto da URL (espera o Whisper e mede o estágio)."""
+    wait_for_model("whisper")
+    with stage("transcribe", progressive=True):
+        return transcribe_stream(video_url)
+
+async def process_video(job):
     """
     Processa vídeo completo
     
@@ -65,6 +210,7 @@ def process_video(job):
             "video_url": "https://...",
             "anime_name": "Nome do Anime",
             "mode": "auto|manual",
+            "cuts": [{"start": 10, "end": 70, "title": "opcional"}],  # modo manual
             "config": {
                 "font_size": 70,
                 "text_color": "#FFD700",
@@ -76,6 +222,9 @@ def process_video(job):
             }
         }
     }
+    
+    O download roda fora do semáforo de jobs pesados, então sobrepõe-se a
+    transcrições/análises de outros jobs no mesmo worker.
     """
     try:
         input_data = job['input']
@@ -87,27 +236,25 @@ def process_video(job):
         print(f"[PROCESS] Iniciando processamento: {anime_name}")
         print(f"[PROCESS] Modo: {mode}")
         
-        # Download do vídeo
-        import requests
-        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as tmp_video:
-            response = requests.get(video_url, stream=True)
-            for chunk in response.iter_content(chunk_size=8192):
-                tmp_video.write(chunk)
-            video_path = tmp_video.name
+        # Download do vídeo (I/O: não ocupa vaga de job pesado), com
+        # transcrição progressiva em paralelo quando possível
+        video_path, transcript = await fetch_video(video_url, mode)
         
         print(f"[PROCESS] ✅ Vídeo baixado: {video_path}")
         
-        # Processar baseado no modo
-        if mode == 'auto':
-            result = process_auto_mode(video_path, anime_name, config)
-        else:
-            result = process_manual_mode(video_path, anime_name, config)
-        
-        # Limpar
-        os.remove(video_path)
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        try:
+            # Processar baseado no modo (estágios pesados limitados por MAX_HEAVY_JOBS)
+            async with HEAVY_JOB_SEMAPHORE:
+                if mode == 'auto':
+                    result = await asyncio.to_thread(process_auto_mode, video_path, anime_name, config, job.get('id'), transcript)
+                else:
+                    result = await asyncio.to_thread(process_manual_mode, video_path, anime_name, config, input_data.get('cuts', []), job.get('id'))
+        finally:
+            # Limpar
+            discard_download(video_path)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
         
         return result
         
@@ -118,90 +265,617 @@ def process_video(job):
             "traceback": traceback.format_exc()
         }
 
-def process_auto_mode(video_path, anime_name, config):
-    """Modo automático com DeepSeek"""
-    print("[AUTO] Iniciando modo automático...")
+_PIPELINE_DONE = object()
+
+async def iterate_in_thread(generator):
+    """Consome um gerador síncrono (estágios pesados) sem bloquear o event loop."""
+    while True:
+        item = await asyncio.to_thread(next, generator, _PIPELINE_DONE)
+        if item is _PIPELINE_DONE:
+            break
+        yield item
+
+async def process_video_stream(job):
+    """
+    Versão streaming de process_video (AUTOCORTES_STREAMING=1): entrega a
+    transcrição, a lista de segmentos e cada corte (URL/caminho, título,
+    tempos) assim que ficam prontos. Um corte que falha vira 'clip_error'
+    sem descartar os anteriores.
+    """
+    input_data = job['input']
+    video_url = input_data.get('video_url')
+    anime_name = input_data.get('anime_name', 'Anime')
+    mode = input_data.get('mode', 'auto')
+    config = input_data.get('config', {})
     
-    # Extrair áudio
-    from moviepy.editor import VideoFileClip
-    clip = VideoFileClip(video_path)
+    print(f"[STREAM] Iniciando processamento: {anime_name} (modo {mode})")
     
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_audio:
-        clip.audio.write_audiofile(tmp_audio.name, codec='pcm_s16le')
-        audio_path = tmp_audio.name
+    try:
+        video_path, transcript = await fetch_video(video_url, mode)
+    except Exception as e:
+        yield {"event": "error", "error": f"Download falhou: {e}"}
+        return
     
-    clip.close()
+    yield {"event": "downloaded"}
     
-    # Transcrever
-    print("[AUTO] Transcrevendo áudio...")
-    transcript = transcribe_audio_batch(audio_path)
-    transcript_text = transcript['text'] if isinstance(transcript, dict) else transcript
+    try:
+        async with HEAVY_JOB_SEMAPHORE:
+            if mode == 'auto':
+                pipeline = run_auto_pipeline(video_path, anime_name, config, job.get('id'), transcript)
+                async for event in iterate_in_thread(pipeline):
+                    yield event
+            else:
+                pipeline = run_manual_pipeline(video_path, anime_name, config, input_data.get('cuts', []), job.get('id'))
+                async for event in iterate_in_thread(pipeline):
+                    yield event
+        yield {"event": "done"}
+    except Exception as e:
+        import traceback
+        yield {"event": "error", "error": str(e), "traceback": traceback.format_exc()}
+    finally:
+        discard_download(video_path)
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+def use_progressive(video_url, mode):
+    """
+    Transcrição progressiva só no modo auto, para URLs HTTP que ainda não
+    estão no cache de downloads (no cache, o caminho normal usa o cache de
+    transcrições).
+    """
+    if not (PROGRESSIVE and mode == 'auto' and str(video_url).startswith(("http://", "https://"))):
+        return False
+    try:
+        return cached_path(video_url) is None
+    except Exception:
+        return True
+
+async def fetch_video(video_url, mode):
+    """
+    Baixa o vídeo e, no pipeline progressivo, transcreve em paralelo direto
+    da URL. Retorna (video_path, transcript ou None).
+    """
+    download_task = asyncio.ensure_future(asyncio.to_thread(download_video, video_url))
     
-    # Analisar com DeepSeek (se disponível)
-    # TODO: Implementar análise de segmentos
+    transcript = None
+    if await asyncio.to_thread(use_progressive, video_url, mode):
+        print("[PROCESS] Pipeline progressivo: transcrevendo durante o download...")
+        try:
+            async with HEAVY_JOB_SEMAPHORE:
+                transcript = await asyncio.to_thread(transcribe_progressive, video_url)
+        except Exception as e:
+            print(f"[PROCESS] ⚠️  {e}. Transcrevendo após o download...")
     
-    # Gerar título
-    print("[AUTO] Gerando título...")
-    titulo = generate_viral_title_batch(anime_name, transcript_text)
+    video_path = await download_task
+    return video_path, transcript
+
+def upload_clip(clip_path, job_id=None):
+    """
+    Envia o corte para o bucket (BUCKET_ENDPOINT_URL configurado) e retorna a URL.
+    Sem bucket, retorna None e o arquivo fica no disco do worker.
+    """
+    if not os.environ.get("BUCKET_ENDPOINT_URL"):
+        return None
+    from runpod.serverless.utils import rp_upload
+    url = rp_upload.upload_file_to_bucket(
+        file_name=os.path.basename(clip_path),
+        file_location=clip_path,
+        prefix=job_id
+    )
+    os.remove(clip_path)
+    return url
+
+def render_clip(video_path, index, segment, config, info, output_dir, job_id=None, on_rendered=None):
+    """
+    Renderiza (ffmpeg) e envia um corte com o título de segment['title']
+    (gerado antes, em lote, por assign_titles). Retorna o evento 'clip'.
+    `on_rendered(index, clip_path)` é chamado antes do upload (cache de jobs).
+    """
+    timings = {}
+    event = {"event": "clip", "index": index, "start": segment['start'], "end": segment['end']}
+    print(f"[RENDER] Corte {index} ({segment['start']:.0f}s - {segment['end']:.0f}s)...")
     
-    # Limpar
-    os.remove(audio_path)
+    try:
+        titulo = segment.get('title')
+        
+        t0 = time.perf_counter()
+        clip_path = os.path.join(output_dir, f"Corte_{index:03d}.mp4")
+        with stage("render", clip=index):
+            renderizar_corte_ffmpeg(video_path, segment['start'], segment['end'], clip_path, config, titulo=titulo, info=info)
+        timings["render_s"] = round(time.perf_counter() - t0, 2)
+        
+        if on_rendered is not None:
+            on_rendered(index, clip_path)
+        
+        t0 = time.perf_counter()
+        with stage("upload", clip=index):
+            url = upload_clip(clip_path, job_id)
+        timings["upload_s"] = round(time.perf_counter() - t0, 2)
+        
+        event.update({"title": titulo, "url": url, "path": None if url else clip_path})
+    except Exception as e:
+        # Falha em um corte não descarta os cortes já prontos
+        print(f"[RENDER] ❌ Corte {index} falhou: {e}")
+        event.update({"event": "clip_error", "error": str(e)})
     
+    event["timings"] = timings
+    return event
+
+def assign_titles(segments, anime_name, transcript_segments=None, episode_audio=None):
+    """
+    Títulos por IA para os cortes sem título, em uma única passada do LLM
+    (generate_viral_titles). O diálogo vem do recorte da transcrição do
+    episódio ou, sem ela, da transcrição da fatia do memmap.
+    """
+    pendentes = []
+    for i, seg in enumerate(segments):
+        if seg.get('title') is not None:
+            continue
+        if transcript_segments:
+            dialogo = slice_transcript_text(transcript_segments, seg['start'], seg['end'])
+        elif episode_audio is not None:
+            with stage("transcribe", clip=i + 1):
+                res = transcribe_audio_batch(episode_audio.slice(seg['start'], min(seg['end'], seg['start'] + 300)))
+            dialogo = res.get('text', '') if res else ''
+        else:
+            dialogo = ''
+        if dialogo:
+            pendentes.append((i, dialogo))
+    
+    if not pendentes:
+        return segments
+    
+    print(f"[RENDER] Gerando {len(pendentes)} título(s) em lote...")
+    with stage("llm", task="titles", clips=len(pendentes)):
+        titulos = generate_viral_titles([(anime_name, dialogo) for _, dialogo in pendentes])
+    
+    segments = list(segments)
+    for (i, _), titulo in zip(pendentes, titulos):
+        segments[i] = dict(segments[i], title=titulo)
+    return segments
+
+def cached_clip_event(stages, clip, output_dir, job_id=None):
+    """Entrega um corte do cache de jobs (cópia local + upload, sem renderizar)."""
+    t0 = time.perf_counter()
+    clip_path = os.path.join(output_dir, clip['file'])
+    shutil.copyfile(stages.file_path("clips", clip['file']), clip_path)
+    with stage("upload", clip=clip['index'], cached=True):
+        url = upload_clip(clip_path, job_id)
     return {
-        "mode": "auto",
-        "transcript": transcript_text,
-        "title": titulo,
-        "segments": []  # TODO
+        "event": "clip", "index": clip['index'], "start": clip['start'], "end": clip['end'],
+        "title": clip.get('title'), "url": url, "path": None if url else clip_path,
+        "cached": True, "timings": {"upload_s": round(time.perf_counter() - t0, 2)}
     }
 
-def process_manual_mode(video_path, anime_name, config):
-    """Modo manual com cortes definidos"""
+def render_stage(video_path, segments, anime_name, config, transcript_segments, stages,
+                 job_id=None, info=None, audio_source=None, workers=1):
+    """
+    Títulos + renderização dos cortes com o cache de jobs: cortes em cache
+    são só reenviados; títulos em cache pulam a IA e vão direto ao ffmpeg.
+    Os títulos que faltam são gerados em lote (uma passada do LLM) antes da
+    renderização. Renderiza em um pool de `workers` threads (cada uma conduz
+    um ffmpeg) e entrega cada 'clip' assim que termina. `audio_source`
+    decodifica o áudio do episódio (memmap) só se algum corte ainda precisar
+    de título por IA e não houver transcrição.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    output_dir = tempfile.mkdtemp(prefix="autocortes_")
+    
+    titles = stages.get("titles")
+    cached = stages.get("clips")
+    if cached is not None and not all(os.path.exists(stages.file_path("clips", c['file'])) for c in cached['clips']):
+        stages.invalidate("clips")
+        cached = None
+    if cached is not None:
+        print(f"[CACHE] ♻️  {len(cached['clips'])} corte(s) reaproveitado(s) do cache de jobs")
+        for clip in cached['clips']:
+            yield cached_clip_event(stages, clip, output_dir, job_id)
+        return
+    
+    if titles is not None:
+        segments = [
+            dict(seg, title=seg.get('title') or title)
+            for seg, title in zip(segments, titles['titles'])
+        ]
+    
+    if titles is None:
+        if config.get("usar_ia", True) and any(seg.get('title') is None for seg in segments):
+            episode_audio = None
+            if audio_source and not transcript_segments:
+                wait_for_model("whisper")
+                try:
+                    with stage("audio_extract"):
+                        episode_audio = EpisodeAudio.from_media(audio_source)
+                except Exception as e:
+                    print(f"[RENDER] ⚠️  Áudio do episódio indisponível ({e}). Cortes sem título por IA.")
+            wait_for_model("llama")
+            try:
+                segments = assign_titles(segments, anime_name, transcript_segments, episode_audio)
+            finally:
+                if episode_audio is not None:
+                    episode_audio.close(remove=True)
+        stages.put("titles", {"titles": [seg.get('title') for seg in segments]})
+    
+    # Cópia (hardlink) de cada corte antes do upload, para gravar no cache
+    kept = {}
+    def keep_rendered(index, clip_path):
+        keep_path = f"{clip_path}.keep"
+        try:
+            os.link(clip_path, keep_path)
+        except OSError:
+            shutil.copyfile(clip_path, keep_path)
+        kept[index] = keep_path
+    
+    info = info or probe_video(video_path)
+    events = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [
+                pool.submit(run_in_context(render_clip, video_path, index, seg, config, info, output_dir, job_id,
+                                           keep_rendered if stages.enabled else None))
+                for index, seg in enumerate(segments, start=1)
+            ]
+            for future in as_completed(futures):
+                event = future.result()
+                events.append(dict(event))  # o consumidor pode alterar o evento
+                yield event
+        
+        events.sort(key=lambda e: e['index'])
+        if events and all(e['event'] == "clip" and e['index'] in kept for e in events):
+            clips = [
+                {"index": e['index'], "start": e['start'], "end": e['end'],
+                 "title": e.get('title'), "file": f"Corte_{e['index']:03d}.mp4"}
+                for e in events
+            ]
+            stages.put("clips", {"clips": clips}, files={c['file']: kept[c['index']] for c in clips})
+    finally:
+        for keep_path in kept.values():
+            if os.path.exists(keep_path):
+                os.remove(keep_path)
+
+def run_auto_pipeline(video_path, anime_name, config, job_id=None, transcript=None):
+    """
+    Pipeline do modo automático como gerador de eventos:
+    'transcript' -> 'segments' -> um 'clip' (ou 'clip_error') por corte -> 'cache'.
+    `transcript` já pronto (pipeline progressivo) pula a transcrição.
+    Cada estágio passa pelo cache de jobs (maior prefixo reaproveitado).
+    """
+    print("[AUTO] Iniciando modo automático...")
+    stages = open_job(video_path, "auto", config, anime_name, stt=stt_settings())
+    
+    cached = stages.get("transcript")
+    if cached is not None:
+        transcript = cached
+        duration = transcript['duration']
+    elif transcript is not None:
+        duration = transcript.get('duration') or probe_video(video_path)['duration']
+    else:
+        # Extrair áudio direto em memória (16 kHz mono float32, sem WAV temporário)
+        with stage("audio_extract"):
+            audio = decode_audio_16k(video_path)
+        duration = len(audio) / SAMPLE_RATE
+        
+        # Transcrever
+        print("[AUTO] Transcrevendo áudio...")
+        wait_for_model("whisper")
+        with stage("transcribe"):
+            transcript = transcribe_audio_batch(audio)
+        del audio
+    transcript_text = transcript['text'] if isinstance(transcript, dict) else transcript
+    transcript_segments = transcript.get('segments', []) if isinstance(transcript, dict) else []
+    vad = transcript.get('vad') if isinstance(transcript, dict) else None
+    if cached is None:
+        stages.put("transcript", {"text": transcript_text, "segments": transcript_segments, "vad": vad, "duration": duration})
+    
+    yield {"event": "transcript", "transcript": transcript_text, "vad": vad}
+    
+    # Analisar com DeepSeek (map-reduce sobre o episódio inteiro)
+    cached = stages.get("segments")
+    if cached is not None:
+        segments = cached['segments']
+    else:
+        print("[AUTO] Analisando segmentos virais...")
+        wait_for_model("llama")
+        with stage("llm", task="segments"):
+            segments = analyze_viral_segments_deepseek(transcript_text, duration, segments=transcript_segments)
+        stages.put("segments", {"segments": segments})
+    
+    yield {"event": "segments", "segments": segments}
+    
+    # Renderizar cada corte (título + ffmpeg + upload) e entregar assim que terminar
+    yield from render_stage(video_path, segments, anime_name, config, transcript_segments, stages, job_id)
+    
+    print(f"[CACHE] Estágios: {stages.report}")
+    yield {"event": "cache", "cache": stages.report}
+
+def process_auto_mode(video_path, anime_name, config, job_id=None, transcript=None):
+    """Modo automático com DeepSeek (resultado agregado do pipeline)"""
+    result = {"mode": "auto", "clips": []}
+    
+    for event in run_auto_pipeline(video_path, anime_name, config, job_id, transcript):
+        kind = event.pop("event")
+        if kind == "transcript":
+            result.update(event)
+        elif kind == "segments":
+            result["segments"] = event["segments"]
+        elif kind == "cache":
+            result["cache"] = event["cache"]
+        else:
+            result["clips"].append(event)
+    
+    # Compatibilidade: título do primeiro corte
+    result["title"] = next((c.get("title") for c in result["clips"] if c.get("title")), None)
+    return result
+
+def render_worker_count(num_cuts):
+    """Workers de renderização: configuração, núcleos e sessões NVENC da GPU."""
+    if RENDER_WORKERS > 0:
+        return max(1, min(RENDER_WORKERS, num_cuts))
+    workers = max(1, (os.cpu_count() or 1) // 2)
+    if torch.cuda.is_available():
+        workers = min(workers, NVENC_SESSIONS)
+    return max(1, min(workers, num_cuts))
+
+def normalize_cuts(cuts, duration):
+    """Valida/ordena os cortes {start, end, title?} e limita à duração do vídeo."""
+    normalized = []
+    for cut in cuts or []:
+        try:
+            start = max(0.0, float(cut['start']))
+            end = min(float(cut['end']), duration) if duration else float(cut['end'])
+        except (KeyError, TypeError, ValueError):
+            print(f"[MANUAL] ⚠️  Corte inválido ignorado: {cut}")
+            continue
+        if end - start < 1:
+            print(f"[MANUAL] ⚠️  Corte fora do vídeo ignorado: {cut}")
+            continue
+        item = {"start": start, "end": end}
+        if cut.get('title'):
+            item["title"] = str(cut['title'])
+        normalized.append(item)
+    return normalized
+
+def run_manual_pipeline(video_path, anime_name, config, cuts, job_id=None):
+    """
+    Modo manual como gerador: renderiza os cortes em paralelo (pool limitado
+    por núcleos/sessões NVENC) e entrega cada 'clip' assim que termina.
+    O vídeo é sondado uma única vez; se algum corte precisar de título por IA,
+    o áudio é decodificado uma única vez (memmap) e cada corte lê sua fatia.
+    Títulos e cortes passam pelo cache de jobs (chave inclui os cortes pedidos).
+    """
     print("[MANUAL] Iniciando modo manual...")
     
-    # TODO: Implementar lógica de cortes manuais
+    t0 = time.perf_counter()
+    info = probe_video(video_path)
+    cuts = normalize_cuts(cuts, info.get("duration"))
+    stages = open_job(video_path, "manual", config, anime_name, cuts, stt=stt_settings())
+    prepare_s = round(time.perf_counter() - t0, 2)
+    
+    workers = render_worker_count(len(cuts))
+    yield {"event": "plan", "cuts": cuts, "workers": workers, "prepare_s": prepare_s}
     
+    yield from render_stage(video_path, cuts, anime_name, config, None, stages, job_id,
+                            info=info, audio_source=video_path, workers=workers)
+    
+    print(f"[CACHE] Estágios: {stages.report}")
+    yield {"event": "cache", "cache": stages.report}
+
+def process_manual_mode(video_path, anime_name, config, cuts=None, job_id=None):
+    """Modo manual com cortes definidos (resultado agregado do pipeline)"""
+    result = {"mode": "manual", "clips": []}
+    start = time.perf_counter()
+    
+    for event in run_manual_pipeline(video_path, anime_name, config, cuts, job_id):
+        kind = event.pop("event")
+        if kind in ("plan", "cache"):
+            result.update(event)
+        else:
+            result["clips"].append(event)
+    
+    result["clips"].sort(key=lambda c: c["index"])
+    result["total_s"] = round(time.perf_counter() - start, 2)
+    print(f"[MANUAL] ✅ {len(result['clips'])} corte(s) em {result['total_s']}s ({result.get('workers')} worker(s))")
+    return result
+
+# ==================== TRANSCRIBE_AUDIO ====================
+
+def transcribe_url(source, word_timestamps=True, vad=None, chunk_seconds=None, on_partial=None):
+    """
+    Transcrição direto da URL: o ffmpeg lê o stream HTTP e entrega PCM 16 kHz
+    ao backend de STT em chunks (sem arquivo intermediário e sem o pipeline
+    de vídeo). `on_partial(segmentos)` recebe cada chunk já na linha do
+    tempo final.
+    
+    Raises:
+        RuntimeError: se a decodificação ou a transcrição falhar
+    """
+    def on_chunk(offset, result):
+        if on_partial is not None:
+            on_partial(stitch_results([(offset, result)])["segments"])
+    
+    options = {"word_timestamps": word_timestamps, "vad": vad, "on_chunk": on_chunk}
+    if chunk_seconds:
+        options["chunk_seconds"] = float(chunk_seconds)
+    
+    wait_for_model("whisper")
+    with stage("transcribe", streaming=True):
+        return transcribe_stream(source, **options)
+
+def transcription_options(input_data):
+    """Fonte e opções de transcribe_audio a partir do input do job."""
+    source = input_data.get('audio_url') or input_data.get('video_url')
+    if not source:
+        raise ValueError("audio_url (ou video_url) é obrigatório")
+    return source, {
+        "word_timestamps": input_data.get('word_timestamps', True),
+        "vad": input_data.get('vad'),
+        "chunk_seconds": input_data.get('chunk_seconds'),
+    }
+
+def transcription_response(result):
+    """Resposta de transcribe_audio (segmentos com palavras, se pedidas)."""
     return {
-        "mode": "manual",
-        "message": "Modo manual em desenvolvimento"
+        "operation": "transcribe_audio",
+        "text": result.get("text", ""),
+        "language": result.get("language"),
+        "duration": result.get("duration"),
+        "segments": result.get("segments", []),
+        "vad": result.get("vad"),
     }
 
-def handler(job):
+async def transcribe_audio_job(job):
+    """
+    Operação transcribe_audio (handler normal). Com `partial: true`, cada
+    chunk transcrito é enviado como progress_update do RunPod.
+    """
+    input_data = job['input']
+    try:
+        source, options = transcription_options(input_data)
+    except ValueError as e:
+        return {"error": str(e)}
+    
+    if input_data.get('partial'):
+        def send_partial(segments):
+            try:
+                runpod.serverless.progress_update(job, {"segments": segments})
+            except Exception as e:
+                print(f"[TRANSCRIBE] ⚠️  progress_update falhou: {e}")
+        options["on_partial"] = send_partial
+    
+    print("[TRANSCRIBE] Transcrevendo direto da URL...")
+    try:
+        async with HEAVY_JOB_SEMAPHORE:
+            result = await asyncio.to_thread(transcribe_url, source, **options)
+    except Exception as e:
+        return {"error": str(e)}
+    return transcription_response(result)
+
+async def transcribe_audio_stream(job):
     """
-    Handler principal do RunPod
+    Versão streaming de transcribe_audio: um evento 'partial' por chunk
+    (com `partial: true`), depois 'transcript' e 'done'.
+    """
+    input_data = job['input']
+    try:
+        source, options = transcription_options(input_data)
+    except ValueError as e:
+        yield {"event": "error", "error": str(e)}
+        return
+    
+    loop = asyncio.get_running_loop()
+    partials = asyncio.Queue()
+    if input_data.get('partial'):
+        options["on_partial"] = lambda segments: loop.call_soon_threadsafe(partials.put_nowait, segments)
+    
+    async with HEAVY_JOB_SEMAPHORE:
+        task = asyncio.ensure_future(asyncio.to_thread(transcribe_url, source, **options))
+        while not task.done() or not partials.empty():
+            getter = asyncio.ensure_future(partials.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield {"event": "partial", "segments": getter.result()}
+            else:
+                getter.cancel()
+    
+    try:
+        result = task.result()
+    except Exception as e:
+        yield {"event": "error", "error": str(e)}
+        return
+    yield {"event": "transcript", **transcription_response(result)}
+    yield {"event": "done"}
+
+def generate_title_measured(anime_name, dialogue):
+    """generate_viral_title_batch medido como estágio 'llm'."""
+    with stage("llm", task="title"):
+        return generate_viral_title_batch(anime_name, dialogue)
+
+def generate_titles_measured(anime_name, dialogues):
+    """generate_viral_titles medido como estágio 'llm'."""
+    with stage("llm", task="titles", clips=len(dialogues)):
+        return generate_viral_titles([(anime_name, dialogue) for dialogue in dialogues])
+
+async def handler(job):
+    """
+    Handler principal do RunPod (assíncrono: vários jobs por worker,
+    ver concurrency_modifier)
     
     Suporta múltiplas operações:
     - process_video: Processa vídeo completo
     - transcribe_audio: Apenas transcrição
-    - generate_title: Apenas geração de título
-    """
-    
-    # Inicializa modelos (apenas uma vez)
-    initialize_models()
+    - generate_title: Apenas geração de título (leve: não espera jobs pesados)
     
+    Toda resposta leva `metrics` (tempo, CPU, RSS/VRAM por estágio e modelos
+    quentes/frios) e `startup` (cold start dos modelos).
+    Com `"llm_cache": false`, o LLM gera respostas novas (ignora o cache).
+    """
+    metrics = start_job()
+    bypass_llm_cache(job['input'].get('llm_cache') is False)
+    result = await run_operation(job)
+    result["startup"] = startup_report()
+    result["metrics"] = metrics.report()
+    return result
+
+async def run_operation(job):
+    """Executa a operação pedida e retorna o dicionário de resposta."""
     # Determina operação
     operation = job['input'].get('operation', 'process_video')
     
     print(f"[HANDLER] Operação: {operation}")
     
+    # Aquece só os modelos da operação, sem esperar: o download e os
+    # estágios iniciais seguem em paralelo e cada estágio espera o seu modelo
+    warm_up_models(OPERATION_MODELS.get(operation, ()))
+    
     if operation == 'process_video':
-        return process_video(job)
+        return await process_video(job)
     
     elif operation == 'transcribe_audio':
-        audio_url = job['input'].get('audio_url')
-        # Download e transcrição
-        # TODO: Implementar
-        return {"operation": "transcribe_audio", "status": "not_implemented"}
+        return await transcribe_audio_job(job)
     
     elif operation == 'generate_title':
         anime_name = job['input'].get('anime_name')
+        dialogues = job['input'].get('dialogues')
+        if dialogues:
+            # Vários diálogos: uma única passada do LLM (saída numerada)
+            titulos = await asyncio.to_thread(with_model, "llama", generate_titles_measured, anime_name, dialogues)
+            return {"titles": titulos}
         dialogue = job['input'].get('dialogue')
-        titulo = generate_viral_title_batch(anime_name, dialogue)
+        titulo = await asyncio.to_thread(with_model, "llama", generate_title_measured, anime_name, dialogue)
         return {"title": titulo}
     
     else:
         return {"error": f"Operação desconhecida: {operation}"}
 
+async def stream_handler(job):
+    """
+    Handler gerador (AUTOCORTES_STREAMING=1). process_video e
+    transcribe_audio são enviados em eventos; as demais operações geram um
+    único evento com o resultado.
+    """
+    operation = job['input'].get('operation', 'process_video')
+    if operation in ('process_video', 'transcribe_audio'):
+        metrics = start_job()
+        bypass_llm_cache(job['input'].get('llm_cache') is False)
+        warm_up_models(OPERATION_MODELS[operation])
+        events = process_video_stream(job) if operation == 'process_video' else transcribe_audio_stream(job)
+        async for event in events:
+            if event.get("event") in ("done", "error"):
+                event["startup"] = startup_report()
+                event["metrics"] = metrics.report()
+            yield event
+    else:
+        yield await handler(job)
+
 # Inicializa RunPod
 if __name__ == "__main__":
-    print("[RUNPOD] Iniciando serverless handler...")
-    runpod.serverless.start({"handler": handler})
+    print(f"[RUNPOD] Iniciando serverless handler (streaming={STREAMING})...")
+    start_prefetch()
+    runpod.serverless.start({
+        "handler": stream_handler if STREAMING else handler,
+        "concurrency_modifier": concurrency_modifier,
+        # /run também recebe a lista completa de eventos ao final
+        "return_aggregate_stream": True
+    })
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+ÁUDIO EM MEMÓRIA
+Decodifica áudio/vídeo direto para um array NumPy float32 mono 16 kHz
+(o formato que o Whisper consome) através de um pipe do ffmpeg.
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+
+from .transcript_cache import fingerprint_file
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Leitura do pipe do ffmpeg em blocos de 1MB
+PIPE_READ_SIZE = 1024 * 1024
+
+# Diretório de trabalho dos jobs (memmaps de áudio dos episódios)
+DEFAULT_SCRATCH_DIR = os.path.join(tempfile.gettempdir(), "autocortes_scratch")
+SCRATCH_MAX_AGE_HOURS = float(os.environ.get("AUTOCORTES_SCRATCH_MAX_AGE_HOURS", 6))
+
+def get_scratch_dir():
+    """Diretório de trabalho (AUTOCORTES_SCRATCH_DIR)."""
+    return os.environ.get("AUTOCORTES_SCRATCH_DIR", DEFAULT_SCRATCH_DIR)
+
+def get_ffmpeg_binary():
+    """Localiza o ffmpeg (variável FFMPEG_BINARY, PATH ou o binário do imageio-ffmpeg)."""
+    env_bin = os.environ.get("FFMPEG_BINARY")
+    if env_bin and env_bin != "auto-detect":
+        return env_bin
+
+    system_bin = shutil.which("ffmpeg")
+    if system_bin:
+        return system_bin
+
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+def decode_audio_16k(source, start=None, duration=None, sr=SAMPLE_RATE):
+    """
+    Decodifica o áudio de `source` (arquivo ou URL) para float32 mono em `sr` Hz.
+
+    Args:
+        source: Caminho ou URL de áudio/vídeo
+        start: Início em segundos (opcional)
+        duration: Duração em segundos (opcional)
+
+    Returns:
+        numpy.ndarray float32 com amostras em [-1, 1]
+
+    Raises:
+        RuntimeError: se o ffmpeg falhar
+    """
+    import numpy as np
+
+    cmd = [get_ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error']
+    cmd += _input_options(source)
+    if start:
+        cmd += ['-ss', f"{start:.3f}"]
+    if duration:
+        cmd += ['-t', f"{duration:.3f}"]
+    cmd += ['-i', str(source), '-vn', '-ac', '1', '-ar', str(sr), '-f', 'f32le', 'pipe:1']
+
+    # bytearray (gravável) evita uma cópia extra: o Whisper precisa de um array gravável
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    buffer = bytearray()
+    while True:
+        chunk = proc.stdout.read(PIPE_READ_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+    stderr = proc.stderr.read()
+    proc.wait()
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg falhou ao decodificar áudio: {stderr.decode(errors='ignore').strip()[-300:]}")
+
+    usable = len(buffer) - len(buffer) % 4
+    return np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+
+def clip_audio_16k(audio_clip, sr=SAMPLE_RATE):
+    """
+    Converte o áudio de um clip do MoviePy (já recortado/editado) para float32
+    mono em `sr` Hz, sem passar por arquivo WAV.
+    Use decode_audio_16k quando houver o arquivo de origem e o intervalo.
+    """
+    import numpy as np
+
+    samples = audio_clip.to_soundarray(fps=sr)
+    if samples.ndim == 2:
+        samples = samples.mean(axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+def _input_options(source):
+    """Opções de entrada do ffmpeg para URLs HTTP (reconexão em quedas)."""
+    if str(source).startswith(("http://", "https://")):
+        return ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+    return []
+
+def iter_audio_16k(source, block_seconds=10.0, sr=SAMPLE_RATE):
+    """
+    Decodifica `source` (arquivo ou URL HTTP) progressivamente, entregando
+    blocos float32 mono de ~block_seconds assim que o ffmpeg os produz.
+
+    Uma thread drena o pipe para uma fila: o ffmpeg (e a conexão HTTP) não
+    ficam parados enquanto o chamador transcreve um bloco.
+
+    Raises:
+        RuntimeError: se o ffmpeg falhar
+    """
+    import queue
+    import numpy as np
+
+    cmd = [get_ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error']
+    cmd += _input_options(source)
+    cmd += ['-i', str(source), '-vn', '-ac', '1', '-ar', str(sr), '-f', 'f32le', 'pipe:1']
+
+    block_bytes = int(block_seconds * sr) * 4
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    blocks = queue.Queue()
+
+    def reader():
+        try:
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                blocks.put(data)
+        finally:
+            blocks.put(None)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    try:
+        pending = b""
+        while True:
+            data = blocks.get()
+            if data is None:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % 4
+            pending = data[usable:]
+            if usable:
+                yield np.frombuffer(bytearray(data[:usable]), dtype=np.float32)
+
+        stderr = proc.stderr.read()
+        proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg falhou ao decodificar áudio: {stderr.decode(errors='ignore').strip()[-300:]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        thread.join(timeout=1)
+
+# ==================== ÁUDIO DO EPISÓDIO (MEMMAP) ====================
+
+def _prune_scratch(scratch_dir, max_age_hours=SCRATCH_MAX_AGE_HOURS):
+    """Remove memmaps antigos do diretório de trabalho."""
+    limite = time.time() - max_age_hours * 3600
+    try:
+        nomes = os.listdir(scratch_dir)
+    except OSError:
+        return
+    for nome in nomes:
+        caminho = os.path.join(scratch_dir, nome)
+        try:
+            if nome.endswith(".f32") and os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            continue
+
+class EpisodeAudio:
+    """
+    Áudio do episódio decodificado UMA vez para um memmap float32 16 kHz no
+    diretório de trabalho. Cada corte lê uma fatia sem cópia (transcrição,
+    loudness, features), em vez de decodificar o áudio de novo por corte.
+
+    Uso:
+        with EpisodeAudio.from_media(video_path) as episodio:
+            audio = episodio.slice(inicio, fim)
+
+    O `with` (ou close(remove=True)) remove o arquivo no fim do job; memmaps
+    esquecidos são apagados por idade (AUTOCORTES_SCRATCH_MAX_AGE_HOURS).
+    """
+
+    def __init__(self, path, sr=SAMPLE_RATE):
+        import numpy as np
+
+        self.path = path
+        self.sr = sr
+        # 'c' (copy-on-write): gravável para o Whisper sem tocar no arquivo
+        self.samples = np.memmap(path, dtype=np.float32, mode="c")
+
+    @classmethod
+    def from_media(cls, source, scratch_dir=None, sr=SAMPLE_RATE):
+        """
+        Decodifica `source` para o diretório de trabalho (reaproveita o memmap
+        se o mesmo arquivo já foi decodificado).
+
+        Raises:
+            RuntimeError: se o ffmpeg falhar
+        """
+        scratch_dir = scratch_dir or get_scratch_dir()
+        os.makedirs(scratch_dir, exist_ok=True)
+        _prune_scratch(scratch_dir)
+
+        nome = fingerprint_file(source) if os.path.isfile(source) else str(abs(hash(source)))
+        path = os.path.join(scratch_dir, f"{nome}_{sr}.f32")
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            os.utime(path, None)
+            logger.info(f"[AUDIO] Memmap do episódio reaproveitado: {path}")
+            return cls(path, sr)
+
+        # Jobs simultâneos no mesmo processo decodificam para temporários distintos
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        cmd = [
+            get_ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', str(source), '-vn', '-ac', '1', '-ar', str(sr), '-f', 'f32le', tmp_path
+        ]
+        start = time.perf_counter()
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f"ffmpeg falhou ao decodificar áudio: {result.stderr.decode(errors='ignore').strip()[-300:]}")
+        os.replace(tmp_path, path)
+
+        episodio = cls(path, sr)
+        logger.info(
+            f"[AUDIO] Episódio decodificado em {time.perf_counter() - start:.1f}s "
+            f"({episodio.duration / 60:.1f}min, {os.path.getsize(path) / 1024**2:.0f}MB): {path}"
+        )
+        return episodio
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sr
+
+    def slice(self, start=0.0, end=None):
+        """Fatia [start, end) em segundos (view do memmap, sem cópia)."""
+        a = max(0, int(start * self.sr))
+        b = len(self.samples) if end is None else min(len(self.samples), int(end * self.sr))
+        return self.samples[a:max(a, b)]
+
+    def loudness(self, start=0.0, end=None):
+        """Loudness RMS (dBFS) do intervalo; -inf se for silêncio absoluto."""
+        import numpy as np
+
+        trecho = self.slice(start, end)
+        if len(trecho) == 0:
+            return float("-inf")
+
+        # Soma em blocos: não materializa o quadrado do trecho inteiro
+        bloco = self.sr * 60
+        soma = 0.0
+        for i in range(0, len(trecho), bloco):
+            parte = trecho[i:i + bloco]
+            soma += float(np.dot(parte, parte))
+        rms = (soma / len(trecho)) ** 0.5
+        return 20 * np.log10(rms) if rms > 0 else float("-inf")
+
+    def close(self, remove=False):
+        """Libera o memmap (e remove o arquivo se `remove`; senão fica para reuso)."""
+        self.samples = None
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # Fim do bloco = fim do uso no job: o memmap sai do diretório de trabalho
+        self.close(remove=True)
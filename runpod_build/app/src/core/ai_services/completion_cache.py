@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+CACHE PERSISTENTE DE COMPLETIONS DO LLM
+Os mesmos animes e os mesmos trechos de diálogo voltam o tempo todo (vários
+clientes cortando o mesmo episódio novo). A resposta do Llama fica em SQLite,
+com chave = hash do arquivo do modelo + mensagens + parâmetros de amostragem
+(+ gramática). Um acerto é uma consulta indexada, sem tocar no modelo.
+
+Entradas vencem após AUTOCORTES_LLM_CACHE_TTL_HOURS e o banco é limitado por
+AUTOCORTES_LLM_CACHE_MB (despejo LRU pelo último acesso). Para respostas
+novas (aleatoriedade desejada), use `set_bypass(True)` no contexto do job
+(input `"llm_cache": false` no handler).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import contextvars
+
+from .transcript_cache import get_cache_root
+
+logger = logging.getLogger(__name__)
+
+_BYPASS = contextvars.ContextVar("autocortes_llm_cache_bypass", default=False)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS completions ("
+    " key TEXT PRIMARY KEY, content TEXT NOT NULL, finish_reason TEXT,"
+    " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+)
+
+def _count(name, amount=1):
+    """Contador no job corrente (sem core.metrics, ex. AnimeCut, não faz nada)."""
+    try:
+        from ..metrics import count
+    except ImportError:
+        return
+    count(name, amount)
+
+def set_bypass(enabled=True):
+    """Ignora o cache (leitura e escrita) no contexto atual (job corrente)."""
+    _BYPASS.set(bool(enabled))
+
+def bypassed():
+    """True se o contexto atual ignora o cache."""
+    return _BYPASS.get()
+
+class CompletionCache:
+    """Respostas do LLM em SQLite, com TTL e limite de tamanho (LRU)."""
+
+    # Evita recalcular o tamanho total a cada put
+    EVICT_EVERY = 32
+
+    def __init__(self, path=None, max_mb=None, ttl_hours=None):
+        if max_mb is None:
+            max_mb = float(os.environ.get("AUTOCORTES_LLM_CACHE_MB", 256))
+        if ttl_hours is None:
+            ttl_hours = float(os.environ.get("AUTOCORTES_LLM_CACHE_TTL_HOURS", 168))
+
+        self.path = path or os.path.join(get_cache_root(), "llm_completions.sqlite3")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_hours * 3600
+        self._conn = None
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def active(self):
+        """Habilitado e sem bypass no contexto atual."""
+        return self.enabled and not _BYPASS.get()
+
+    def make_key(self, model_fingerprint, messages, params, grammar=None):
+        """Chave: modelo + mensagens + parâmetros de amostragem + gramática."""
+        payload = json.dumps(
+            {"model": model_fingerprint, "messages": messages, "params": params, "grammar": grammar},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """(content, finish_reason) em cache, ou None. Registra hit/miss no job."""
+        start = time.perf_counter()
+        row = None
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                row = conn.execute(
+                    "SELECT content, finish_reason FROM completions WHERE key = ? AND created > ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"[LLMCACHE] Falha na leitura: {e}")
+
+        if row is None:
+            _count("llm_cache_misses")
+            return None
+        _count("llm_cache_hits")
+        _count("llm_cache_hit_ms", round((time.perf_counter() - start) * 1000, 3))
+        return row[0], row[1]
+
+    def put(self, key, content, finish_reason=None):
+        """Grava a resposta e, de tempos em tempos, aplica TTL e limite de tamanho."""
+        if not content:
+            return
+        size = len(key) + len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, content, finish_reason, size, now, now)
+                )
+                self._puts += 1
+                if self._puts % self.EVICT_EVERY == 1:
+                    self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"[LLMCACHE] Falha ao gravar: {e}")
+
+    def _evict(self, conn, now):
+        """Remove vencidas e, depois, as menos acessadas até caber em max_bytes."""
+        conn.execute("DELETE FROM completions WHERE created <= ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        logger.info(f"[LLMCACHE] {removed} respostas despejadas (LRU). Tamanho atual: {total / 1024**2:.1f}MB")
+
+def chat_response(content, finish_reason=None, stream=False):
+    """Resposta no formato de create_chat_completion (ou stream de um chunk)."""
+    if stream:
+        return iter([{
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": finish_reason}],
+        }])
+    return {
+        "object": "chat.completion",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+    }
@@ -5,14 +5,24 @@ import logging
 import re
 import sys
 
+from .stt_backend import BACKEND_OPENAI_WHISPER, BACKEND_FASTER_WHISPER, create_stt_backend, detect_device, resolve_compute_type
+from .model_registry import ModelRegistry
+from .prompt_cache import PromptStateCache, cached_chat_completion
+from .structured_output import load_grammar, grammar_source, parse_json_list, segments_gbnf, titles_gbnf, titles_max_tokens, title_line_gbnf
+from .completion_cache import CompletionCache, chat_response, set_bypass, bypassed
+from .transcript_compression import TRANSCRIPT_COMPRESSION, compress_transcript, compact_line, raw_line
+from .transcript_cache import TranscriptCache, fingerprint_audio, fingerprint_file
+from .audio_io import SAMPLE_RATE, decode_audio_16k, iter_audio_16k
+from .vad import VAD_ENABLED, apply_vad, remap_timestamps
+from .long_form import (
+    LONGFORM_MIN_SECONDS, STT_WORKERS, STT_MIN_THREADS_PER_WORKER, SILENCE_SEARCH_SECONDS,
+    transcribe_chunks_parallel, quietest_point, stitch_results
+)
+
 # Configuração de Logs
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Variáveis Globais para Instâncias (Singleton)
-_WHISPER_INSTANCE = None
-_LLAMA_INSTANCE = None
-
 # ==================== DETECÇÃO DE AMBIENTE ====================
 
 def is_running_in_colab():
@@ -36,7 +46,13 @@ def get_model_path(model_name):
 
 # Caminhos dos Modelos (Dinâmicos)
 MODEL_PATH_LLAMA = get_model_path('llama-3-8b-instruct.Q4_K_M.gguf')
-MODEL_SIZE_WHISPER = "medium"
+MODEL_SIZE_WHISPER = os.environ.get("AUTOCORTES_WHISPER_MODEL", "medium")
+
+# Backend de STT: "openai-whisper" ou "faster-whisper" (CTranslate2)
+STT_BACKEND = os.environ.get("AUTOCORTES_STT_BACKEND", BACKEND_OPENAI_WHISPER)
+
+# Compute type do faster-whisper: auto (float16 GPU / int8 CPU), float16, int8, int8_float16
+STT_COMPUTE_TYPE = os.environ.get("AUTOCORTES_STT_COMPUTE_TYPE", "auto")
 
 def _clean_memory():
     """Força a limpeza da VRAM e RAM."""
@@ -49,143 +65,308 @@ def _clean_memory():
         pass
     logger.info("[MEMORIA] Limpeza forçada concluída.")
 
+# Registro de modelos (substitui as instâncias globais). Orçamento em
+# AUTOCORTES_RAM_BUDGET_MB / AUTOCORTES_VRAM_BUDGET_MB (padrão: fração da memória física).
+MODEL_REGISTRY = ModelRegistry(on_evict=_clean_memory)
+
 # ==================== WHISPER (STT) ====================
 
-def load_whisper_model():
-    global _WHISPER_INSTANCE
-    if _WHISPER_INSTANCE is None:
-        logger.info(f"[WHISPER] Carregando modelo '{MODEL_SIZE_WHISPER}'...")
+# Parâmetros (milhões) por tamanho de modelo Whisper, para estimar o custo de memória
+WHISPER_PARAMS_M = {
+    "tiny": 39, "base": 74, "small": 244, "medium": 769,
+    "large": 1550, "large-v2": 1550, "large-v3": 1550, "turbo": 809,
+}
+
+def _whisper_cost_mb():
+    """Estimativa (RAM, VRAM) em MB do backend de STT configurado."""
+    params_m = WHISPER_PARAMS_M.get(MODEL_SIZE_WHISPER.replace(".en", ""), 769)
+    device = detect_device()
+    
+    if STT_BACKEND == BACKEND_FASTER_WHISPER:
+        compute_type = resolve_compute_type(STT_COMPUTE_TYPE, device)
+        bytes_per_param = 1 if compute_type.startswith("int8") else (2 if compute_type == "float16" else 4)
+    else:
+        bytes_per_param = 4  # openai-whisper carrega os pesos em FP32
+    
+    custo = params_m * bytes_per_param * 1.5  # pesos + buffers de decodificação
+    ram_mb = float(os.environ.get("AUTOCORTES_WHISPER_RAM_MB", 0)) or (500 if device == "cuda" else custo)
+    vram_mb = float(os.environ.get("AUTOCORTES_WHISPER_VRAM_MB", 0)) or (custo if device == "cuda" else 0)
+    return ram_mb, vram_mb
+
+def _load_whisper_instance():
+    """Loader do registro: cria o backend de STT configurado (None se falhar)."""
+    logger.info(f"[WHISPER] Carregando modelo '{MODEL_SIZE_WHISPER}' (backend: {STT_BACKEND})...")
+    try:
+        device = detect_device()
+        logger.info(f"[WHISPER] Usando device: {device}")
+        
+        instance = create_stt_backend(
+            STT_BACKEND,
+            model_size=MODEL_SIZE_WHISPER,
+            device=device,
+            compute_type=STT_COMPUTE_TYPE
+        )
+        logger.info(f"[WHISPER] Modelo carregado com sucesso (compute_type={instance.compute_type}).")
+        
+        # Mostra VRAM usada
         try:
-            import whisper
             import torch
-            
-            # Força uso da GPU se disponível
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"[WHISPER] Usando device: {device}")
-            
-            _WHISPER_INSTANCE = whisper.load_model(MODEL_SIZE_WHISPER, device=device)
-            logger.info("[WHISPER] Modelo carregado com sucesso.")
-            
-            # Mostra VRAM usada
             if torch.cuda.is_available():
                 vram_usada = torch.cuda.memory_allocated(0) / (1024**3)
                 logger.info(f"[WHISPER] VRAM usada: {vram_usada:.2f}GB")
-                
         except ImportError:
-            logger.error("[WHISPER] Biblioteca 'openai-whisper' não instalada.")
-            _WHISPER_INSTANCE = None
-        except Exception as e:
-            logger.error(f"[WHISPER] Erro ao carregar: {e}")
-            _WHISPER_INSTANCE = None
+            pass
+        
+        return instance
+    except ImportError as e:
+        logger.error(f"[WHISPER] Biblioteca do backend '{STT_BACKEND}' não instalada: {e}")
+    except Exception as e:
+        logger.error(f"[WHISPER] Erro ao carregar: {e}")
+    return None
+
+MODEL_REGISTRY.register(
+    "whisper", _load_whisper_instance,
+    ram_mb=lambda: _whisper_cost_mb()[0],
+    vram_mb=lambda: _whisper_cost_mb()[1]
+)
+
+def load_whisper_model():
+    """Carrega o backend de STT configurado (STT_BACKEND) via registro de modelos."""
+    return MODEL_REGISTRY.get("whisper")
+
+def get_whisper_backend():
+    """
+    Retorna a instância compartilhada do backend de STT (carrega se necessário).
+    Use em vez de criar um WhisperModel próprio.
+    """
+    return MODEL_REGISTRY.get("whisper")
 
 def unload_whisper_model():
-    global _WHISPER_INSTANCE
-    if _WHISPER_INSTANCE is not None:
-        logger.info("[WHISPER] Descarregando modelo...")
-        del _WHISPER_INSTANCE
-        _WHISPER_INSTANCE = None
-        _clean_memory()
+    MODEL_REGISTRY.unload("whisper")
 
-def transcribe_audio_local(audio_path):
+# Cache persistente de transcrições (AUTOCORTES_CACHE_DIR / AUTOCORTES_TRANSCRIPT_CACHE_MB; 0 = desativado)
+TRANSCRIPT_CACHE = TranscriptCache()
+
+def stt_model_id():
+    """Backend + modelo + compute type do STT (o que muda o texto transcrito)."""
+    compute_type = resolve_compute_type(STT_COMPUTE_TYPE, detect_device()) if STT_BACKEND == BACKEND_FASTER_WHISPER else 'default'
+    return f"{STT_BACKEND}:{MODEL_SIZE_WHISPER}:{compute_type}"
+
+def stt_settings(word_timestamps=False, vad=None):
+    """Modelo, idioma e opções da transcrição (entram nas chaves de cache)."""
+    if vad is None:
+        vad = VAD_ENABLED
+    return {"model": stt_model_id(), "language": 'pt', "word_timestamps": bool(word_timestamps), "vad": bool(vad)}
+
+def _transcript_cache_key(audio_path, word_timestamps=False, vad=False):
+    """Chave do cache: fingerprint do áudio + modelo/backend + idioma + opções."""
+    return TRANSCRIPT_CACHE.make_key(
+        fingerprint_audio(audio_path),
+        stt_model_id(),
+        'pt',
+        {"word_timestamps": bool(word_timestamps), "vad": bool(vad)}
+    )
+
+def _cached_transcription(audio_path, word_timestamps=False, vad=False):
+    """Retorna (chave, resultado em cache ou None). Não carrega o modelo."""
+    if not TRANSCRIPT_CACHE.enabled:
+        return None, None
+    
+    import time
+    start = time.perf_counter()
+    key = _transcript_cache_key(audio_path, word_timestamps, vad)
+    result = TRANSCRIPT_CACHE.get(key)
+    if result is not None:
+        logger.info(f"[WHISPER] Transcrição encontrada no cache ({(time.perf_counter() - start) * 1000:.1f}ms)")
+    return key, result
+
+# Tamanho do lote do faster-whisper em GPU (modo longo)
+STT_BATCH_SIZE = int(os.environ.get("AUTOCORTES_STT_BATCH_SIZE", "16"))
+
+def _stt_worker_count(duration):
     """
-    Fluxo Serializado: Load -> Transcribe -> Unload
+    Processos de STT limitados por configuração, núcleos e RAM livre no orçamento.
+    Sem AUTOCORTES_STT_WORKERS >= 2, 1 (o modelo residente transcreve sozinho).
     """
-    # Converte para caminho absoluto longo (resolve problema de caminhos curtos do Windows)
-    audio_path = os.path.abspath(audio_path)
+    if STT_WORKERS <= 1:
+        return 1
+    by_cores = (os.cpu_count() or 1) // STT_MIN_THREADS_PER_WORKER
+    ram_used, _ = MODEL_REGISTRY.usage()
+    cost_ram, _ = _whisper_cost_mb()
+    by_ram = int((MODEL_REGISTRY.ram_budget_mb - ram_used) // cost_ram) if MODEL_REGISTRY.ram_budget_mb and cost_ram else by_cores
+    by_duration = int(duration // (LONGFORM_MIN_SECONDS / 2)) if LONGFORM_MIN_SECONDS else by_cores
+    return max(1, min(STT_WORKERS, by_cores, by_ram, by_duration))
+
+def _transcribe_long_form(whisper, audio, word_timestamps=False):
+    """
+    Modo longo: lote do faster-whisper na GPU ou, se habilitado
+    (AUTOCORTES_STT_WORKERS), chunks em processos paralelos na CPU, com a
+    RAM das cópias do modelo reservada no registro. Retorna None quando não
+    se aplica (o chamador usa a chamada única).
+    """
+    if whisper.device == "cuda":
+        if hasattr(whisper, "transcribe_batched"):
+            logger.info(f"[WHISPER] Modo longo: pipeline em lote (batch_size={STT_BATCH_SIZE})...")
+            return whisper.transcribe_batched(
+                audio, language='pt', word_timestamps=word_timestamps, batch_size=STT_BATCH_SIZE
+            )
+        return None  # openai-whisper na GPU já satura o dispositivo
     
-    if not os.path.exists(audio_path):
-        logger.error(f"[WHISPER] Arquivo não encontrado: {audio_path}")
+    workers = _stt_worker_count(len(audio) / SAMPLE_RATE)
+    if workers <= 1:
         return None
+    
+    cost_ram, _ = _whisper_cost_mb()
+    with MODEL_REGISTRY.reserve("whisper-pool", ram_mb=cost_ram * workers):
+        return transcribe_chunks_parallel(
+            audio, workers,
+            backend=whisper.name,
+            model_size=whisper.model_size,
+            compute_type=whisper.compute_type if whisper.name == BACKEND_FASTER_WHISPER else "auto",
+            language='pt',
+            word_timestamps=word_timestamps
+        )
 
+def _run_transcription(whisper, audio, word_timestamps=False, vad=False):
+    """
+    Executa a transcrição no backend informado (sem carregar/descarregar).
+    Áudios longos (>= LONGFORM_MIN_SECONDS) usam o modo longo em paralelo.
+    
+    Args:
+        audio: Caminho do arquivo ou array float32 16 kHz
+        vad: Transcreve só as regiões com fala (resultado ganha a chave 'vad')
+    """
+    # Limpa cache CUDA antes de transcrever
     try:
-        load_whisper_model()
-        if _WHISPER_INSTANCE is None:
-            return None
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            logger.info(f"[WHISPER] Cache CUDA limpo. VRAM livre: {torch.cuda.memory_reserved(0) / 1024**3:.2f}GB")
+    except:
+        pass
 
-        # Limpa cache CUDA antes de transcrever
+    if isinstance(audio, (str, os.PathLike)):
+        logger.info(f"[WHISPER] Transcrevendo: {audio}")
+        logger.info(f"[WHISPER] Tamanho do arquivo: {os.path.getsize(audio) / 1024**2:.2f}MB")
         try:
-            import torch
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                logger.info(f"[WHISPER] Cache CUDA limpo. VRAM livre: {torch.cuda.memory_reserved(0) / 1024**3:.2f}GB")
-        except:
-            pass
+            audio = decode_audio_16k(audio)
+        except Exception as e:
+            logger.warning(f"[WHISPER] Falha ao decodificar em memória ({e}). Passando o arquivo ao backend...")
+    
+    spans = vad_stats = None
+    if vad and not isinstance(audio, (str, os.PathLike)):
+        audio, spans, vad_stats = apply_vad(audio, SAMPLE_RATE)
+        if not spans:
+            logger.info("[WHISPER] Nenhuma fala detectada. Transcrição vazia.")
+            return {"text": "", "language": "pt", "segments": [], "vad": vad_stats}
+    
+    result = _transcribe_array_or_path(whisper, audio, word_timestamps)
+    if vad_stats is not None:
+        result = remap_timestamps(result, spans)
+        result["vad"] = vad_stats
+    return result
+
+def _transcribe_array_or_path(whisper, audio, word_timestamps=False):
+    """Chamada única ou modo longo, conforme a duração do áudio."""
+    if not isinstance(audio, (str, os.PathLike)):
+        duration = len(audio) / SAMPLE_RATE
+        logger.info(f"[WHISPER] Duração do áudio: {duration / 60:.1f}min")
+        if duration >= LONGFORM_MIN_SECONDS:
+            try:
+                result = _transcribe_long_form(whisper, audio, word_timestamps=word_timestamps)
+                if result is not None:
+                    logger.info(f"[WHISPER] Transcrição concluída! Texto: {len(result.get('text', ''))} caracteres")
+                    return result
+            except Exception as e:
+                logger.warning(f"[WHISPER] Modo longo falhou ({e}). Usando chamada única...")
+    
+    logger.info(f"[WHISPER] Iniciando transcrição ({whisper.name}, {whisper.compute_type})...")
+    result = whisper.transcribe(
+        audio,
+        language='pt',  # Define português para acelerar
+        word_timestamps=word_timestamps
+    )
+    logger.info(f"[WHISPER] Transcrição concluída! Texto: {len(result.get('text', ''))} caracteres")
+    return result
+
+def _resolve_audio_input(audio):
+    """
+    Normaliza a entrada de áudio: caminhos viram absolutos (resolve caminhos
+    curtos do Windows) e precisam existir; arrays float32 16 kHz passam direto.
+    Retorna None se o arquivo não existir.
+    """
+    if not isinstance(audio, (str, os.PathLike)):
+        import numpy as np
+        return np.ascontiguousarray(audio, dtype=np.float32)
+    
+    audio_path = os.path.abspath(audio)
+    if not os.path.exists(audio_path):
+        logger.error(f"[WHISPER] Arquivo não encontrado: {audio_path}")
+        return None
+    return audio_path
 
-        logger.info(f"[WHISPER] Transcrevendo: {audio_path}")
-        logger.info(f"[WHISPER] Tamanho do arquivo: {os.path.getsize(audio_path) / 1024**2:.2f}MB")
+def transcribe_audio_local(audio_path):
+    """
+    Fluxo Serializado: Load -> Transcribe.
+    O modelo fica residente; o registro só o descarrega sob pressão de memória.
+    
+    Args:
+        audio_path: Caminho do áudio ou array float32 16 kHz (ver audio_io.decode_audio_16k)
+    """
+    audio_path = _resolve_audio_input(audio_path)
+    if audio_path is None:
+        return None
+
+    try:
+        cache_key, cached = _cached_transcription(audio_path)
+        if cached is not None:
+            return cached
         
-        # Detecta FP16
-        try:
-            import torch
-            use_fp16 = torch.cuda.is_available()
-        except:
-            use_fp16 = False
-        
-        logger.info(f"[WHISPER] Iniciando transcrição (FP16={use_fp16})...")
-        result = _WHISPER_INSTANCE.transcribe(
-            audio_path, 
-            fp16=use_fp16,
-            verbose=False,
-            language='pt'
-        )
-        logger.info(f"[WHISPER] Transcrição concluída! Texto: {len(result.get('text', ''))} caracteres")
+        with MODEL_REGISTRY.acquire("whisper") as whisper:
+            if whisper is None:
+                return None
+            result = _run_transcription(whisper, audio_path)
+        
+        if cache_key:
+            TRANSCRIPT_CACHE.put(cache_key, result)
         return result
     except Exception as e:
         logger.error(f"[WHISPER] Erro na transcrição: {e}")
         import traceback
         logger.error(f"[WHISPER] Traceback: {traceback.format_exc()}")
         return None
-    finally:
-        unload_whisper_model()
 
-def transcribe_audio_batch(audio_path):
+def transcribe_audio_batch(audio_path, word_timestamps=False, vad=None):
     """
     Transcreve áudio SEM descarregar o modelo.
     Use esta função durante renderização em lote.
-    Chame manually_unload_whisper() ao final do lote.
-    """
-    # Converte para caminho absoluto longo
-    audio_path = os.path.abspath(audio_path)
     
-    if not os.path.exists(audio_path):
-        logger.error(f"[WHISPER] Arquivo não encontrado: {audio_path}")
+    Args:
+        audio_path: Caminho do áudio ou array float32 16 kHz (ver audio_io.decode_audio_16k)
+        word_timestamps: Inclui 'words' (palavra a palavra) em cada segmento
+        vad: Pula silêncio/música antes do Whisper (None = AUTOCORTES_VAD)
+    """
+    audio_path = _resolve_audio_input(audio_path)
+    if audio_path is None:
         return None
 
+    if vad is None:
+        vad = VAD_ENABLED
+    
     try:
-        # Carrega o modelo se ainda não estiver carregado
-        if _WHISPER_INSTANCE is None:
-            load_whisper_model()
+        # Cache persistente (re-execuções do mesmo episódio não rodam o Whisper de novo)
+        cache_key, cached = _cached_transcription(audio_path, word_timestamps, vad)
+        if cached is not None:
+            return cached
         
-        if _WHISPER_INSTANCE is None:
-            return None
-
-        # Limpa cache CUDA antes de transcrever
-        try:
-            import torch
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                logger.info(f"[WHISPER] Cache CUDA limpo. VRAM livre: {torch.cuda.memory_reserved(0) / 1024**3:.2f}GB")
-        except:
-            pass
-
-        logger.info(f"[WHISPER] Transcrevendo: {audio_path}")
-        logger.info(f"[WHISPER] Tamanho do arquivo: {os.path.getsize(audio_path) / 1024**2:.2f}MB")
+        # Carrega o modelo se ainda não estiver carregado
+        with MODEL_REGISTRY.acquire("whisper") as whisper:
+            if whisper is None:
+                return None
+            result = _run_transcription(whisper, audio_path, word_timestamps=word_timestamps, vad=vad)
         
-        # Detecta FP16
-        try:
-            import torch
-            use_fp16 = torch.cuda.is_available()
-        except:
-            use_fp16 = False
-        
-        logger.info(f"[WHISPER] Iniciando transcrição (FP16={use_fp16})...")
-        result = _WHISPER_INSTANCE.transcribe(
-            audio_path, 
-            fp16=use_fp16,
-            verbose=False,  # Desativa logs verbosos do Whisper
-            language='pt'   # Define português para acelerar
-        )
-        logger.info(f"[WHISPER] Transcrição concluída! Texto: {len(result.get('text', ''))} caracteres")
+        if cache_key:
+            TRANSCRIPT_CACHE.put(cache_key, result)
         return result
     except Exception as e:
         logger.error(f"[WHISPER] Erro na transcrição: {e}")
@@ -194,61 +375,267 @@ def transcribe_audio_batch(audio_path):
         return None
     # NÃO descarrega o modelo aqui!
 
+# Transcrição progressiva: tamanho alvo de cada chunk (cortado no silêncio mais próximo)
+STREAM_CHUNK_SECONDS = float(os.environ.get("AUTOCORTES_STREAM_CHUNK_SECONDS", 120))
+
+def transcribe_stream(source, word_timestamps=False, vad=None, chunk_seconds=STREAM_CHUNK_SECONDS, on_chunk=None):
+    """
+    Transcrição progressiva: o ffmpeg lê `source` (de preferência a URL HTTP,
+    em paralelo ao download do vídeo) e cada ~chunk_seconds de áudio é
+    transcrito assim que chega, cortando no ponto mais silencioso. A
+    transcrição fica quase pronta quando o último byte chega.
+    
+    Args:
+        source: URL ou caminho
+        on_chunk: Callback opcional chamado com (offset, resultado) de cada chunk
+    
+    Returns:
+        Resultado costurado (com 'duration' e 'vad' agregados)
+    
+    Raises:
+        RuntimeError: se a decodificação ou a transcrição falhar (com a causa)
+    """
+    import numpy as np
+    import time
+    
+    if vad is None:
+        vad = VAD_ENABLED
+    
+    parts = []
+    vad_parts = []
+    offset = 0.0
+    total_samples = 0
+    start = time.perf_counter()
+    
+    def flush(audio, chunk_offset):
+        with MODEL_REGISTRY.acquire("whisper") as whisper:
+            if whisper is None:
+                raise RuntimeError("Whisper não carregado")
+            result = _run_transcription(whisper, audio, word_timestamps=word_timestamps, vad=vad)
+        if result.get("vad"):
+            vad_parts.append(result["vad"])
+        parts.append((chunk_offset, result))
+        logger.info(
+            f"[WHISPER] Chunk progressivo em {chunk_offset / 60:.1f}min transcrito "
+            f"({len(audio) / SAMPLE_RATE:.0f}s, {time.perf_counter() - start:.0f}s desde o início)"
+        )
+        if on_chunk is not None:
+            on_chunk(chunk_offset, result)
+    
+    try:
+        buffer = []
+        buffered = 0
+        limit = int((chunk_seconds + SILENCE_SEARCH_SECONDS) * SAMPLE_RATE)
+        for block in iter_audio_16k(source):
+            buffer.append(block)
+            buffered += len(block)
+            total_samples += len(block)
+            if buffered < limit:
+                continue
+            
+            audio = np.concatenate(buffer)
+            cut = quietest_point(audio, int(chunk_seconds * SAMPLE_RATE), SAMPLE_RATE)
+            flush(audio[:cut], offset)
+            offset += cut / SAMPLE_RATE
+            buffer = [audio[cut:]]
+            buffered = len(buffer[0])
+        
+        if buffered:
+            flush(np.concatenate(buffer), offset)
+    except Exception as e:
+        logger.error(f"[WHISPER] Transcrição progressiva falhou: {e}")
+        raise RuntimeError(f"Transcrição falhou: {e}") from e
+    
+    result = stitch_results(parts)
+    result["duration"] = total_samples / SAMPLE_RATE
+    if vad_parts:
+        result["vad"] = {
+            "method": vad_parts[0]["method"],
+            "total_seconds": round(sum(v["total_seconds"] for v in vad_parts), 2),
+            "speech_seconds": round(sum(v["speech_seconds"] for v in vad_parts), 2),
+            "skipped_seconds": round(sum(v["skipped_seconds"] for v in vad_parts), 2),
+            "regions": sum(v["regions"] for v in vad_parts),
+        }
+    logger.info(f"[WHISPER] Transcrição progressiva concluída: {len(parts)} chunk(s), {result['duration'] / 60:.1f}min")
+    return result
+
 def manually_unload_whisper():
-    """Descarrega manualmente o modelo Whisper após processamento em lote."""
+    """
+    Descarrega manualmente o modelo Whisper.
+    Normalmente desnecessário: o registro despeja por LRU quando falta memória.
+    """
     unload_whisper_model()
 
+def slice_transcript_text(segments, start, end):
+    """
+    Recorta a transcrição do episódio para o intervalo [start, end].
+    
+    Args:
+        segments: Lista de segmentos do Whisper ({'start', 'end', 'text'})
+        start: Início do corte (segundos)
+        end: Fim do corte (segundos)
+        
+    Returns:
+        Texto dos segmentos que se sobrepõem ao intervalo
+    """
+    textos = [
+        seg.get('text', '').strip()
+        for seg in segments or []
+        if seg.get('end', 0) > start and seg.get('start', 0) < end
+    ]
+    return " ".join(t for t in textos if t)
+
 # ==================== LLAMA 3 8B INSTRUCT (LLM) ====================
 
-def load_llama_model():
-    global _LLAMA_INSTANCE
-    if _LLAMA_INSTANCE is None:
-        if not os.path.exists(MODEL_PATH_LLAMA):
-            logger.error(f"[LLAMA] Modelo não encontrado em: {MODEL_PATH_LLAMA}")
-            return
-        
-        logger.info("[LLAMA] Carregando Llama 3 8B Instruct...")
+# Contexto do Llama (tokens) e custo do KV cache (Llama 3 8B: ~128KB/token em FP16)
+LLAMA_N_CTX = 8192
+LLAMA_KV_MB_PER_TOKEN = 0.125
+
+def _llama_cost_mb():
+    """Estimativa de RAM (MB) do Llama: arquivo GGUF + KV cache."""
+    env_ram = float(os.environ.get("AUTOCORTES_LLAMA_RAM_MB", 0))
+    if env_ram:
+        return env_ram
+    file_mb = os.path.getsize(MODEL_PATH_LLAMA) / (1024**2) if os.path.exists(MODEL_PATH_LLAMA) else 4700
+    return file_mb + LLAMA_N_CTX * LLAMA_KV_MB_PER_TOKEN
+
+# GGUF mapeado em memória (sem cópia para o heap; páginas compartilhadas entre
+# processos) e pré-tocado: a primeira geração não paga page faults do disco
+LLAMA_USE_MMAP = os.environ.get("AUTOCORTES_LLAMA_MMAP", "1") not in ("0", "false", "False")
+LLAMA_PRETOUCH = os.environ.get("AUTOCORTES_LLAMA_PRETOUCH", "1") not in ("0", "false", "False")
+PRETOUCH_BLOCK_BYTES = 16 * 1024 * 1024
+
+def _pretouch_file(path):
+    """Lê o arquivo sequencialmente para trazê-lo ao page cache. Retorna segundos."""
+    import time
+    start = time.perf_counter()
+    buffer = bytearray(PRETOUCH_BLOCK_BYTES)
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        while f.readinto(buffer):
+            pass
+    return time.perf_counter() - start
+
+def _load_llama_instance(n_threads=None):
+    """Loader do registro: carrega o Llama em CPU (None se falhar)."""
+    if not os.path.exists(MODEL_PATH_LLAMA):
+        logger.error(f"[LLAMA] Modelo não encontrado em: {MODEL_PATH_LLAMA}")
+        return None
+    
+    logger.info("[LLAMA] Carregando Llama 3 8B Instruct...")
+    try:
+        from llama_cpp import Llama
+        instance = Llama(
+            model_path=MODEL_PATH_LLAMA,
+            n_ctx=LLAMA_N_CTX,
+            n_gpu_layers=0,  # 0 = CPU apenas (libera VRAM para Whisper e renderização)
+            n_threads=n_threads,
+            use_mmap=LLAMA_USE_MMAP,
+            verbose=False
+        )
+        if LLAMA_USE_MMAP and LLAMA_PRETOUCH:
+            try:
+                logger.info(f"[LLAMA] GGUF pré-tocado em {_pretouch_file(MODEL_PATH_LLAMA):.1f}s.")
+            except OSError as e:
+                logger.warning(f"[LLAMA] Pré-toque do GGUF falhou: {e}")
+        logger.info("[LLAMA] Modelo carregado (CPU).")
+        return instance
+    except ImportError:
+        logger.error("[LLAMA] Biblioteca 'llama-cpp-python' não instalada.")
+    except Exception as e:
+        logger.error(f"[LLAMA] Erro ao carregar: {e}")
+    return None
+
+# Estados do Llama após cada system prompt: só a mensagem do usuário passa pelo prefill
+PROMPT_CACHE = PromptStateCache()
+
+# Respostas do LLM em disco, reaproveitadas entre jobs (mesmo modelo + prompt + amostragem)
+COMPLETION_CACHE = CompletionCache()
+_LLAMA_FINGERPRINT = None
+
+def _llama_fingerprint():
+    """Impressão digital do GGUF (calculada uma vez por processo; '' sem o arquivo)."""
+    global _LLAMA_FINGERPRINT
+    if _LLAMA_FINGERPRINT is None:
         try:
-            from llama_cpp import Llama
-            _LLAMA_INSTANCE = Llama(
-                model_path=MODEL_PATH_LLAMA,
-                n_ctx=8192,
-                n_gpu_layers=0,  # 0 = CPU apenas (libera VRAM para Whisper e renderização)
-                verbose=False
-            )
-            logger.info("[LLAMA] Modelo carregado (CPU).")
-        except ImportError:
-            logger.error("[LLAMA] Biblioteca 'llama-cpp-python' não instalada.")
-            _LLAMA_INSTANCE = None
-        except Exception as e:
-            logger.error(f"[LLAMA] Erro ao carregar: {e}")
-            _LLAMA_INSTANCE = None
+            _LLAMA_FINGERPRINT = fingerprint_file(MODEL_PATH_LLAMA)
+        except OSError:
+            _LLAMA_FINGERPRINT = ""
+    return _LLAMA_FINGERPRINT
+
+def _store_stream(chunks, key):
+    """Repassa o stream e grava a resposta completa no cache ao final."""
+    parts = []
+    finish_reason = None
+    for chunk in chunks:
+        choice = chunk['choices'][0]
+        parts.append(choice.get('delta', {}).get('content') or "")
+        finish_reason = choice.get('finish_reason') or finish_reason
+        yield chunk
+    COMPLETION_CACHE.put(key, "".join(parts), finish_reason)
+
+def _chat_completion(llm, messages, **kwargs):
+    """
+    create_chat_completion com cache persistente de respostas (COMPLETION_CACHE)
+    e prefill do system prompt reaproveitado (PROMPT_CACHE).
+    
+    Com llm=None, o Llama só é adquirido se a resposta não estiver em cache
+    (retorna None se o modelo não carregar). stream=True exige `llm`.
+    """
+    from contextlib import nullcontext
+    stream = kwargs.get("stream", False)
+    key = None
+    if COMPLETION_CACHE.active() and _llama_fingerprint():
+        params = {k: v for k, v in kwargs.items() if k not in ("stream", "grammar")}
+        key = COMPLETION_CACHE.make_key(
+            _llama_fingerprint(), messages, params, grammar_source(kwargs.get("grammar"))
+        )
+        cached = COMPLETION_CACHE.get(key)
+        if cached is not None:
+            return chat_response(*cached, stream=stream)
+    
+    with (MODEL_REGISTRY.acquire("llama") if llm is None else nullcontext(llm)) as llm:
+        if llm is None:
+            return None
+        output = cached_chat_completion(llm, messages, PROMPT_CACHE, **kwargs)
+    
+    if key is None:
+        return output
+    if stream:
+        return _store_stream(output, key)
+    choice = output['choices'][0]
+    COMPLETION_CACHE.put(key, choice['message']['content'], choice.get('finish_reason'))
+    return output
+
+MODEL_REGISTRY.register(
+    "llama", _load_llama_instance, ram_mb=_llama_cost_mb, vram_mb=0,
+    unloader=lambda _: PROMPT_CACHE.clear()
+)
+
+def load_llama_model():
+    """Carrega o Llama via registro de modelos."""
+    return MODEL_REGISTRY.get("llama")
 
 def unload_llama_model():
-    global _LLAMA_INSTANCE
-    if _LLAMA_INSTANCE is not None:
-        logger.info("[LLAMA] Descarregando modelo...")
-        del _LLAMA_INSTANCE
-        _LLAMA_INSTANCE = None
-        _clean_memory()
+    MODEL_REGISTRY.unload("llama")
 
 def generate_viral_title_local(anime_name, dialogue):
     """Gera título viral baseado no diálogo."""
     try:
-        load_llama_model()
-        if _LLAMA_INSTANCE is None:
-            return f"{anime_name} - CENA ÉPICA"
-
         system_prompt = (
             "Você é um especialista em marketing viral. Analise o diálogo e crie 3 títulos curtos (max 5 palavras) "
             "e impactantes para TikTok. Use gatilhos de curiosidade. Responda apenas com os títulos."
         )
         user_prompt = f"Anime: {anime_name}\nDiálogo: \"{dialogue[:1000]}\"\n\nTítulos Virais:"
         
-        output = _LLAMA_INSTANCE.create_chat_completion(
+        output = _chat_completion(
+            None,
             messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             max_tokens=100, temperature=0.7
         )
+        if output is None:
+            return f"{anime_name} - CENA ÉPICA"
         
         full_response = output['choices'][0]['message']['content'].strip()
         titles = [t.strip().replace('"', '').replace('-', '').strip() for t in full_response.split('\n') if t.strip()]
@@ -256,8 +643,6 @@ def generate_viral_title_local(anime_name, dialogue):
     except Exception as e:
         logger.error(f"[DEEPSEEK] Erro título: {e}")
         return f"{anime_name} - CENA DE AÇÃO"
-    finally:
-        unload_llama_model()
 
 # ==================== LIMPEZA DE RESPOSTA LLAMA 3 ====================
 
@@ -288,20 +673,39 @@ def clean_llama_response(raw_text):
     
     return clean_text.strip()
 
+TITLE_STOP_WORDS = ['O', 'A', 'E', 'DE', 'DA', 'DO', 'EM', 'NA', 'NO', 'QUE', 'PARA', 'COM', 'POR', 'SEM', 'É', 'SÃO']
+
+def _keyword_title(anime_name, dialogue):
+    """Título de fallback com as palavras-chave do diálogo."""
+    palavras = dialogue[:300].upper().split()
+    palavras_chave = [p for p in palavras if len(p) > 3 and p not in TITLE_STOP_WORDS][:7]
+    if len(palavras_chave) >= 4:
+        return " ".join(palavras_chave[:7])
+    return " ".join(palavras_chave) + f" EM {anime_name.upper()}"
+
+def _normalize_title(titulo, anime_name):
+    """Maiúsculas, no máximo 80 caracteres e 4-9 palavras."""
+    titulo = titulo.upper()
+    
+    # Limita a 80 caracteres
+    if len(titulo) > 80:
+        titulo = titulo[:80].rsplit(' ', 1)[0].strip()
+    
+    # Valida número de palavras (4-9)
+    palavras = titulo.split()
+    if len(palavras) < 4:
+        titulo = f"{titulo} EM {anime_name.upper()}"
+    elif len(palavras) > 9:
+        titulo = ' '.join(palavras[:9])
+    return titulo
+
 def generate_viral_title_batch(anime_name, dialogue):
     """
     Gera título viral SEM descarregar o modelo.
     Use esta função durante renderização em lote.
-    Chame manually_unload_llama() ao final do lote.
+    Para vários cortes de uma vez, prefira generate_viral_titles (uma chamada).
     """
     try:
-        # Carrega o modelo se ainda não estiver carregado
-        if _LLAMA_INSTANCE is None:
-            load_llama_model()
-        
-        if _LLAMA_INSTANCE is None:
-            return f"{anime_name.upper()} CENA ÉPICA"
-
         # Prompt anti-raciocínio (específico para Llama 3)
         system_prompt = (
             "You are a title generator. "
@@ -318,8 +722,9 @@ def generate_viral_title_batch(anime_name, dialogue):
         
         logger.info(f"[LLAMA] Gerando título para {anime_name}...")
         
-        # Gera título com parâmetros restritivos
-        output = _LLAMA_INSTANCE.create_chat_completion(
+        # Gera título com parâmetros restritivos (o modelo só é adquirido sem acerto no cache)
+        output = _chat_completion(
+            None,
             messages=[
                 {"role": "system", "content": system_prompt}, 
                 {"role": "user", "content": user_prompt}
@@ -327,8 +732,11 @@ def generate_viral_title_batch(anime_name, dialogue):
             max_tokens=30,  # Limita para evitar raciocínio
             temperature=0.7,
             stop=["\n", ".", "Explanation:", "Reasoning:"],  # Para se começar a raciocinar
-            repeat_penalty=1.1  # Evita repetição
+            repeat_penalty=1.1,  # Evita repetição
+            grammar=load_grammar(title_line_gbnf())  # Só letras maiúsculas: sem raciocínio
         )
+        if output is None:
+            return f"{anime_name.upper()} CENA ÉPICA"
         
         raw_response = output['choices'][0]['message']['content'].strip()
         logger.info(f"[LLAMA] Resposta crua: {raw_response[:100]}...")
@@ -339,27 +747,9 @@ def generate_viral_title_batch(anime_name, dialogue):
         # Se após limpeza estiver vazio, usa fallback baseado no diálogo
         if not titulo or len(titulo) < 10:
             logger.warning("[LLAMA] Título vazio após limpeza. Usando fallback.")
-            palavras = dialogue[:300].upper().split()
-            stop_words = ['O', 'A', 'E', 'DE', 'DA', 'DO', 'EM', 'NA', 'NO', 'QUE', 'PARA', 'COM', 'POR', 'SEM', 'É', 'SÃO']
-            palavras_chave = [p for p in palavras if len(p) > 3 and p not in stop_words][:7]
-            if len(palavras_chave) >= 4:
-                titulo = " ".join(palavras_chave[:7])
-            else:
-                titulo = " ".join(palavras_chave) + f" EM {anime_name.upper()}"
-        
-        # Converte para maiúsculas
-        titulo = titulo.upper()
-        
-        # Limita a 80 caracteres
-        if len(titulo) > 80:
-            titulo = titulo[:80].rsplit(' ', 1)[0].strip()
-        
-        # Valida número de palavras (4-9)
-        palavras = titulo.split()
-        if len(palavras) < 4:
-            titulo = f"{titulo} EM {anime_name.upper()}"
-        elif len(palavras) > 9:
-            titulo = ' '.join(palavras[:9])
+            titulo = _keyword_title(anime_name, dialogue)
+        
+        titulo = _normalize_title(titulo, anime_name)
         
         logger.info(f"[LLAMA] Título final: {titulo}")
         return titulo
@@ -370,41 +760,176 @@ def generate_viral_title_batch(anime_name, dialogue):
         logger.error(f"[LLAMA] Traceback: {traceback.format_exc()}")
         # Fallback baseado no diálogo
         try:
-            palavras = dialogue[:300].upper().split()
-            stop_words = ['O', 'A', 'E', 'DE', 'DA', 'DO', 'EM', 'NA', 'NO', 'QUE', 'PARA', 'COM', 'POR', 'SEM', 'É', 'SÃO']
-            palavras_chave = [p for p in palavras if len(p) > 3 and p not in stop_words][:7]
-            if len(palavras_chave) >= 4:
-                return " ".join(palavras_chave[:7])
-            else:
-                return " ".join(palavras_chave) + f" EM {anime_name.upper()}"
+            return _keyword_title(anime_name, dialogue)
         except:
             return f"{anime_name.upper()} CENA ÉPICA"
     # NÃO descarrega o modelo aqui!
 
+# ==================== TÍTULOS EM LOTE ====================
+
+# Cortes por chamada do LLM (o prompt numerado cresce ~100 tokens por corte)
+TITLE_BATCH_SIZE = int(os.environ.get("AUTOCORTES_TITLE_BATCH_SIZE", "8"))
+
+_NUMBERED_LINE = re.compile(r"^\s*\**\s*(\d{1,3})\s*[.):\-]\s*(.+?)\s*$")
+
+def _parse_numbered_titles(raw_text, count):
+    """
+    Lê linhas 'N. TÍTULO' da resposta. Retorna {indice (0-based): título}
+    só com números dentro do lote (a primeira ocorrência vale).
+    """
+    titles = {}
+    for line in raw_text.splitlines():
+        match = _NUMBERED_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if 0 <= index < count and index not in titles:
+            titles[index] = clean_llama_response(match.group(2))
+    return titles
+
+def _valid_title(titulo):
+    """Título aproveitável: ao menos 10 caracteres e 3-12 palavras."""
+    return bool(titulo) and len(titulo) >= 10 and 3 <= len(titulo.split()) <= 12
+
+def _generate_title_group(items):
+    """
+    Uma chamada do LLM para um grupo de (anime_name, dialogue). Retorna {indice: título}.
+    Com gramática, a resposta é uma lista JSON com exatamente um título por corte.
+    """
+    same_anime = len({anime for anime, _ in items}) == 1
+    grammar = load_grammar(titles_gbnf(len(items)))
+    if grammar is not None:
+        system_prompt = (
+            "You are a title generator. "
+            "For EACH numbered clip, write ONE viral TikTok title in Portuguese, uppercase, 4-9 words. "
+            "Respond ONLY with a JSON array of strings, one title per clip, in the same order."
+        )
+        formato = "JSON array"
+    else:
+        system_prompt = (
+            "You are a title generator. "
+            "For EACH numbered clip, write ONE viral TikTok title in Portuguese, uppercase, 4-9 words. "
+            "Respond ONLY with one line per clip in the format 'N. TITLE', keeping the same numbers. "
+            "NO explanations. NO reasoning. NO extra lines."
+        )
+        formato = "format 'N. TITLE'"
+    
+    linhas = [f"Anime: {items[0][0]}\n"] if same_anime else []
+    for n, (anime_name, dialogue) in enumerate(items, start=1):
+        prefixo = "" if same_anime else f"[{anime_name}] "
+        linhas.append(f"{n}. {prefixo}Dialogue: \"{dialogue[:300]}\"")
+    user_prompt = "\n".join(linhas) + f"\n\nWrite {len(items)} titles ({formato}):"
+    
+    output = _chat_completion(
+        None,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        max_tokens=titles_max_tokens(len(items)),
+        temperature=0.7,
+        stop=["Explanation:", "Reasoning:"],
+        repeat_penalty=1.1,
+        grammar=grammar
+    )
+    if output is None:
+        return {}
+    
+    raw_response = output['choices'][0]['message']['content']
+    if grammar is not None:
+        gerados = parse_json_list(raw_response)[:len(items)]
+        return {i: clean_llama_response(t) for i, t in enumerate(gerados) if isinstance(t, str)}
+    return _parse_numbered_titles(raw_response, len(items))
+
+def generate_viral_titles(items, batch_size=None):
+    """
+    Gera títulos para vários cortes em uma única passada do LLM (o prefill
+    do prompt de sistema é pago uma vez por lote, não por corte). A saída
+    numerada é validada item a item; só os que falharem caem para
+    generate_viral_title_batch individual.
+    
+    Args:
+        items: Lista de (anime_name, dialogue)
+        batch_size: Cortes por chamada (padrão AUTOCORTES_TITLE_BATCH_SIZE)
+    
+    Returns:
+        Lista de títulos na mesma ordem de `items`
+    """
+    batch_size = max(1, batch_size or TITLE_BATCH_SIZE)
+    titulos = [None] * len(items)
+    
+    for inicio in range(0, len(items), batch_size):
+        grupo = items[inicio:inicio + batch_size]
+        if len(grupo) == 1:
+            continue
+        try:
+            gerados = _generate_title_group(grupo)
+        except Exception as e:
+            logger.error(f"[LLAMA] Erro nos títulos em lote: {e}")
+            gerados = {}
+        for i, titulo in gerados.items():
+            if _valid_title(titulo):
+                titulos[inicio + i] = _normalize_title(titulo, grupo[i][0])
+    
+    falhas = [i for i, titulo in enumerate(titulos) if titulo is None]
+    if len(items) > 1:
+        logger.info(f"[LLAMA] Títulos em lote: {len(items) - len(falhas)}/{len(items)} válidos")
+    for i in falhas:
+        titulos[i] = generate_viral_title_batch(*items[i])
+    return titulos
+
 def manually_unload_llama():
-    """Descarrega manualmente o modelo DeepSeek após processamento em lote."""
+    """
+    Descarrega manualmente o modelo DeepSeek.
+    Normalmente desnecessário: o registro despeja por LRU quando falta memória.
+    """
     unload_llama_model()
 
-def analyze_viral_segments_deepseek(full_transcript_text, duration_total):
+def analyze_viral_segments_deepseek(full_transcript_text, duration_total, segments=None):
     """
     Analisa a transcrição completa e identifica segmentos virais (60s-180s).
     SEM LIMITAÇÕES - Permite que o DeepSeek trabalhe até o final.
+    
+    Args:
+        full_transcript_text: Texto da transcrição
+        duration_total: Duração do vídeo (segundos)
+        segments: Segmentos do Whisper com timestamps. Se informados, usa a análise
+                  em janelas (map-reduce) sobre o episódio inteiro, sem truncar o texto.
     """
+    if segments:
+        try:
+            return _analyze_viral_segments_windowed(segments, duration_total)
+        except Exception as e:
+            logger.error(f"[DEEPSEEK] Erro na análise em janelas: {e}. Usando análise em passada única...")
+            import traceback
+            logger.error(f"[DEEPSEEK] Traceback: {traceback.format_exc()}")
+            texto = full_transcript_text or " ".join(seg.get('text', '').strip() for seg in segments)
+            return analyze_viral_segments_deepseek(texto, duration_total) or _finalize_segments([], duration_total)
+    
     try:
-        load_llama_model()
-        if _LLAMA_INSTANCE is None:
+        if load_llama_model() is None:
             logger.error("[DEEPSEEK] Modelo não carregado para análise de segmentos.")
             return []
 
         logger.info("[DEEPSEEK] Analisando roteiro para cortes automáticos...")
         logger.info("[DEEPSEEK] Modo SEM LIMITAÇÕES ativado - DeepSeek trabalhará até concluir")
         
-        # Prompt direto
-        system_prompt = (
-            "Você é um editor de vídeo especialista. Analise o roteiro completo e identifique os melhores momentos para clipes virais. "
-            "Retorne APENAS uma lista de timestamps no formato [INICIO-FIM]. "
-            "Exemplo: [0-120], [300-450], [600-750]"
-        )
+        # Prompt direto (com gramática, a resposta só pode ser a lista JSON de segmentos)
+        grammar = load_grammar(segments_gbnf(MAX_VIRAL_SEGMENTS))
+        if grammar is not None:
+            system_prompt = (
+                "Você é um editor de vídeo especialista. Analise o roteiro completo e identifique os melhores momentos para clipes virais. "
+                "Retorne APENAS uma lista JSON de objetos {\"start\", \"end\", \"score\", \"reason\"} (segundos, nota 0-100, motivo curto). "
+                "Exemplo: [{\"start\": 0, \"end\": 120, \"score\": 80, \"reason\": \"luta decisiva\"}]"
+            )
+            formato = "como lista JSON"
+        else:
+            system_prompt = (
+                "Você é um editor de vídeo especialista. Analise o roteiro completo e identifique os melhores momentos para clipes virais. "
+                "Retorne APENAS uma lista de timestamps no formato [INICIO-FIM]. "
+                "Exemplo: [0-120], [300-450], [600-750]"
+            )
+            formato = "no formato [INICIO-FIM], separados por vírgula"
         
         # Envia a transcrição COMPLETA (sem limitar a 8000 caracteres)
         user_prompt = (
@@ -429,7 +954,7 @@ def analyze_viral_segments_deepseek(full_transcript_text, duration_total):
             f"Duração total do vídeo: {duration_total} segundos.\n\n"
             f"Identifique 3-5 momentos virais (cada um com 60-180 segundos de duração).\n\n"
             f"Roteiro (primeiros {len(transcript_to_send)} caracteres):\n{transcript_to_send}\n\n"
-            f"Retorne APENAS os timestamps no formato [INICIO-FIM], separados por vírgula:"
+            f"Retorne APENAS os timestamps {formato}:"
         )
         
         logger.info(f"[DEEPSEEK] Processando {len(transcript_to_send)} caracteres...")
@@ -439,66 +964,81 @@ def analyze_viral_segments_deepseek(full_transcript_text, duration_total):
         import time
         start_time = time.time()
         
-        # Com streaming para mostrar progresso
-        try:
-            logger.info(f"[DEEPSEEK] ⏳ Gerando resposta (streaming ativado)...")
+        with MODEL_REGISTRY.acquire("llama") as llm:
+            if llm is None:
+                logger.error("[DEEPSEEK] Modelo não carregado para análise de segmentos.")
+                return []
             
-            response_text = ""
-            token_count = 0
+            # Com streaming para mostrar progresso
+            try:
+                logger.info(f"[DEEPSEEK] ⏳ Gerando resposta (streaming ativado)...")
             
-            # Cria stream
-            stream = _LLAMA_INSTANCE.create_chat_completion(
-                messages=[
-                    {"role": "system", "content": system_prompt}, 
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.3,
-                stream=True  # Ativa streaming
-            )
+                response_text = ""
+                token_count = 0
+            
+                # Cria stream
+                stream = _chat_completion(
+                    llm,
+                    messages=[
+                        {"role": "system", "content": system_prompt}, 
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=500,
+                    temperature=0.3,
+                    grammar=grammar,
+                    stream=True  # Ativa streaming
+                )
             
-            # Processa tokens em tempo real
-            for chunk in stream:
-                if 'choices' in chunk and len(chunk['choices']) > 0:
-                    delta = chunk['choices'][0].get('delta', {})
-                    if 'content' in delta:
-                        token_text = delta['content']
-                        response_text += token_text
-                        token_count += 1
+                # Processa tokens em tempo real
+                for chunk in stream:
+                    if 'choices' in chunk and len(chunk['choices']) > 0:
+                        delta = chunk['choices'][0].get('delta', {})
+                        if 'content' in delta:
+                            token_text = delta['content']
+                            response_text += token_text
+                            token_count += 1
                         
-                        # Log a cada 10 tokens
-                        if token_count % 10 == 0:
-                            elapsed = time.time() - start_time
-                            logger.info(f"[DEEPSEEK] 📝 {token_count} tokens gerados ({elapsed:.1f}s)...")
+                            # Log a cada 10 tokens
+                            if token_count % 10 == 0:
+                                elapsed = time.time() - start_time
+                                logger.info(f"[DEEPSEEK] 📝 {token_count} tokens gerados ({elapsed:.1f}s)...")
             
-            elapsed_total = time.time() - start_time
-            logger.info(f"[DEEPSEEK] ✅ Resposta completa! {token_count} tokens em {elapsed_total:.1f}s")
+                elapsed_total = time.time() - start_time
+                logger.info(f"[DEEPSEEK] ✅ Resposta completa! {token_count} tokens em {elapsed_total:.1f}s")
             
-            response = response_text.strip()
+                response = response_text.strip()
             
-        except Exception as stream_error:
-            # Fallback para modo não-streaming se falhar
-            logger.warning(f"[DEEPSEEK] Streaming falhou: {stream_error}. Usando modo padrão...")
+            except Exception as stream_error:
+                # Fallback para modo não-streaming se falhar
+                logger.warning(f"[DEEPSEEK] Streaming falhou: {stream_error}. Usando modo padrão...")
             
-            output = _LLAMA_INSTANCE.create_chat_completion(
-                messages=[
-                    {"role": "system", "content": system_prompt}, 
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.3
-            )
+                output = _chat_completion(
+                    llm,
+                    messages=[
+                        {"role": "system", "content": system_prompt}, 
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=500,
+                    temperature=0.3,
+                    grammar=grammar
+                )
             
-            response = output['choices'][0]['message']['content'].strip()
-            elapsed_total = time.time() - start_time
-            logger.info(f"[DEEPSEEK] Resposta recebida em {elapsed_total:.1f}s")
+                response = output['choices'][0]['message']['content'].strip()
+                elapsed_total = time.time() - start_time
+                logger.info(f"[DEEPSEEK] Resposta recebida em {elapsed_total:.1f}s")
         
         logger.info(f"[DEEPSEEK] Resposta completa recebida ({len(response)} caracteres)")
         logger.info(f"[DEEPSEEK] Primeiros 500 caracteres: {response[:500]}...")
         
         # Parser robusto de timestamps
         segments = []
-        matches = re.findall(r'\[(\d+)-(\d+)\]', response)
+        if grammar is not None:
+            matches = [
+                (item['start'], item['end']) for item in parse_json_list(response)
+                if isinstance(item, dict) and 'start' in item and 'end' in item
+            ]
+        else:
+            matches = re.findall(r'\[(\d+)-(\d+)\]', response)
         
         if not matches:
             logger.warning("[DEEPSEEK] Nenhum timestamp no formato [X-Y] encontrado. Tentando padrão alternativo...")
@@ -524,38 +1064,330 @@ def analyze_viral_segments_deepseek(full_transcript_text, duration_total):
         else:
             logger.warning("[DEEPSEEK] Nenhum timestamp válido encontrado na resposta")
         
-        # Fallback automático se necessário
-        if not segments and duration_total > 60:
-            logger.info("[DEEPSEEK] Criando segmentos automáticos como fallback...")
-            num_segments = min(5, int(duration_total / 120))
-            segment_duration = duration_total / num_segments if num_segments > 0 else 120
-            
-            for i in range(num_segments):
-                start = int(i * segment_duration)
-                end = int(min(start + 120, duration_total))
-                if end - start >= 60:
-                    segments.append({'start': start, 'end': end})
-                    logger.info(f"[DEEPSEEK] ✓ Segmento automático: {start}s-{end}s")
-        
-        # Remove duplicatas (mesmo start e end)
-        unique_segments = []
-        seen = set()
-        for seg in segments:
-            key = (seg['start'], seg['end'])
-            if key not in seen:
-                seen.add(key)
-                unique_segments.append(seg)
-        
-        # Limita a 5 segmentos (pega os primeiros)
-        if len(unique_segments) > 5:
-            logger.warning(f"[DEEPSEEK] {len(unique_segments)} segmentos encontrados. Limitando a 5.")
-            unique_segments = unique_segments[:5]
-        
-        logger.info(f"[DEEPSEEK] Total de {len(unique_segments)} segmentos identificados")
-        return unique_segments
+        return _finalize_segments(segments, duration_total)
     except Exception as e:
         logger.error(f"[DEEPSEEK] Erro na análise de segmentos: {e}")
         import traceback
         logger.error(f"[DEEPSEEK] Traceback: {traceback.format_exc()}")
         return []
     # NÃO descarrega o modelo aqui - será reutilizado para gerar títulos
+
+def _finalize_segments(segments, duration_total):
+    """Fallback automático, remoção de duplicatas e limite de segmentos."""
+    # Fallback automático se necessário
+    if not segments and duration_total > 60:
+        logger.info("[DEEPSEEK] Criando segmentos automáticos como fallback...")
+        num_segments = min(5, int(duration_total / 120))
+        segment_duration = duration_total / num_segments if num_segments > 0 else 120
+        
+        for i in range(num_segments):
+            start = int(i * segment_duration)
+            end = int(min(start + 120, duration_total))
+            if end - start >= 60:
+                segments.append({'start': start, 'end': end})
+                logger.info(f"[DEEPSEEK] ✓ Segmento automático: {start}s-{end}s")
+    
+    # Remove duplicatas (mesmo start e end)
+    unique_segments = []
+    seen = set()
+    for seg in segments:
+        key = (seg['start'], seg['end'])
+        if key not in seen:
+            seen.add(key)
+            unique_segments.append(seg)
+    
+    # Limita a 5 segmentos (pega os primeiros)
+    if len(unique_segments) > 5:
+        logger.warning(f"[DEEPSEEK] {len(unique_segments)} segmentos encontrados. Limitando a 5.")
+        unique_segments = unique_segments[:5]
+    
+    logger.info(f"[DEEPSEEK] Total de {len(unique_segments)} segmentos identificados")
+    return unique_segments
+
+# ==================== ANÁLISE EM JANELAS (MAP-REDUCE) ====================
+
+# Orçamento de contexto de cada janela (prompt fixo + resposta ficam fora do roteiro)
+SEGMENT_ANALYSIS_MAX_TOKENS = 300
+SEGMENT_PROMPT_OVERHEAD_TOKENS = 400
+CHARS_PER_TOKEN = 3.5  # Estimativa conservadora para português
+
+# Sobreposição entre janelas = duração máxima de um corte (todo corte cabe inteiro em alguma janela)
+WINDOW_OVERLAP_SECONDS = 180
+MIN_SEGMENT_SECONDS = 60
+MAX_SEGMENT_SECONDS = 180
+MAX_VIRAL_SEGMENTS = 5
+
+# Processos paralelos para as janelas (cada um carrega seu próprio Llama)
+LLM_ANALYSIS_WORKERS = int(os.environ.get("AUTOCORTES_LLM_WORKERS", "1"))
+LLAMA_MIN_THREADS_PER_WORKER = 4
+
+# Instância do Llama dentro de cada processo do pool
+_WORKER_LLAMA = None
+
+def _window_char_budget():
+    """Quantos caracteres de roteiro cabem em uma janela do n_ctx."""
+    tokens = LLAMA_N_CTX - SEGMENT_PROMPT_OVERHEAD_TOKENS - SEGMENT_ANALYSIS_MAX_TOKENS
+    return int(tokens * CHARS_PER_TOKEN)
+
+def build_transcript_windows(segments, max_chars=None, overlap_seconds=WINDOW_OVERLAP_SECONDS, compact=False):
+    """
+    Divide os segmentos do Whisper em janelas sobrepostas que cabem no n_ctx.
+    
+    Cada linha do roteiro leva seu timestamp ([INICIO-FIM] texto), para que o modelo
+    não precise adivinhar os tempos. Com `compact` (segmentos de compress_transcript),
+    só o início: [INICIO] texto.
+    
+    Returns:
+        Lista de {'start', 'end', 'text', 'compact'}
+    """
+    max_chars = max_chars or _window_char_budget()
+    format_line = compact_line if compact else raw_line
+    lines = [
+        (float(seg['start']), float(seg['end']), format_line(seg))
+        for seg in segments
+        if seg.get('text', '').strip()
+    ]
+    
+    windows = []
+    i = 0
+    while i < len(lines):
+        chars = 0
+        j = i
+        while j < len(lines) and (j == i or chars + len(lines[j][2]) + 1 <= max_chars):
+            chars += len(lines[j][2]) + 1
+            j += 1
+        
+        windows.append({
+            'start': lines[i][0],
+            'end': lines[j - 1][1],
+            'text': "\n".join(line[2] for line in lines[i:j]),
+            'compact': compact
+        })
+        
+        if j >= len(lines):
+            break
+        
+        # Próxima janela recua até cobrir overlap_seconds (no máximo metade da janela atual)
+        k = j
+        while k - 1 > i + (j - i) // 2 and lines[j - 1][1] - lines[k - 1][0] < overlap_seconds:
+            k -= 1
+        i = k
+    
+    return windows
+
+# Momentos pedidos por janela (limite também imposto pela gramática)
+SEGMENTS_PER_WINDOW = 3
+
+def _window_candidate(s, e, score, window, duration_total, reason=None):
+    """Candidato válido dentro da janela (ou None)."""
+    duration = e - s
+    if not (MIN_SEGMENT_SECONDS <= duration <= MAX_SEGMENT_SECONDS):
+        logger.warning(f"[DEEPSEEK] ✗ Candidato ignorado (duração {duration}s fora do range 60-180s): {s}-{e}")
+        return None
+    if s >= duration_total or s < window['start'] - 5 or s > window['end']:
+        return None
+    if score is None or score == "":
+        score = 50
+    try:
+        score = max(0, min(int(score), 100))
+    except (TypeError, ValueError):
+        logger.warning(f"[DEEPSEEK] ✗ Candidato ignorado (nota inválida {score!r}): {s}-{e}")
+        return None
+    candidate = {
+        'start': s,
+        'end': min(e, int(duration_total)),
+        'score': score
+    }
+    if reason:
+        candidate['reason'] = reason.strip()
+    return candidate
+
+def _parse_scored_candidates(response, window, duration_total):
+    """Extrai candidatos '[INICIO-FIM] NOTA' válidos dentro da janela."""
+    candidates = []
+    for start, end, score in re.findall(r'\[(\d+)\s*-\s*(\d+)\]\s*[-:=]?\s*(\d{1,3})?', response):
+        candidate = _window_candidate(int(start), int(end), score, window, duration_total)
+        if candidate:
+            candidates.append(candidate)
+    return candidates
+
+def _parse_json_candidates(response, window, duration_total):
+    """Extrai candidatos da lista JSON [{start, end, score, reason}] (saída com gramática)."""
+    candidates = []
+    for item in parse_json_list(response):
+        try:
+            s, e = int(item['start']), int(item['end'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        candidate = _window_candidate(s, e, item.get('score'), window, duration_total, item.get('reason'))
+        if candidate:
+            candidates.append(candidate)
+    return candidates
+
+def _score_window(llm, window, duration_total):
+    """
+    Etapa map: pede ao modelo os melhores momentos de uma janela do roteiro.
+    Com gramática, a resposta só pode ser a lista JSON de {start, end, score, reason}.
+    """
+    grammar = load_grammar(segments_gbnf(SEGMENTS_PER_WINDOW))
+    marcacao = (
+        "[INICIO] em segundos; a linha vai até o início da seguinte" if window.get('compact')
+        else "[INICIO-FIM] em segundos"
+    )
+    if grammar is not None:
+        system_prompt = (
+            f"Você é um editor de vídeo especialista. Analise o trecho do roteiro (cada linha começa com "
+            f"{marcacao}) e identifique os melhores momentos para clipes virais. "
+            "Responda APENAS com uma lista JSON de objetos {\"start\", \"end\", \"score\", \"reason\"}: "
+            "start/end em segundos, score de 0 a 100 e reason com até 8 palavras. "
+            "Exemplo: [{\"start\": 300, \"end\": 420, \"score\": 85, \"reason\": \"revelação do vilão\"}]"
+        )
+        formato = "lista JSON"
+    else:
+        system_prompt = (
+            f"Você é um editor de vídeo especialista. Analise o trecho do roteiro (cada linha começa com "
+            f"{marcacao}) e identifique os melhores momentos para clipes virais. "
+            "Responda APENAS com linhas no formato [INICIO-FIM] NOTA, onde NOTA vai de 0 a 100. "
+            "Exemplo: [300-420] 85"
+        )
+        formato = "[INICIO-FIM] NOTA, um por linha"
+    user_prompt = (
+        f"Trecho de {int(window['start'])}s a {int(window['end'])}s (vídeo de {int(duration_total)}s).\n\n"
+        f"Identifique até {SEGMENTS_PER_WINDOW} momentos virais (cada um com 60-180 segundos de duração), "
+        f"usando os timestamps do roteiro.\n\n"
+        f"Roteiro:\n{window['text']}\n\n"
+        f"Resposta ({formato}):"
+    )
+    
+    import time
+    start_time = time.time()
+    output = _chat_completion(
+        llm,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        max_tokens=SEGMENT_ANALYSIS_MAX_TOKENS,
+        temperature=0.3,
+        grammar=grammar
+    )
+    response = output['choices'][0]['message']['content'].strip()
+    if grammar is not None:
+        candidates = _parse_json_candidates(response, window, duration_total)
+    else:
+        candidates = _parse_scored_candidates(response, window, duration_total)
+    logger.info(
+        f"[DEEPSEEK] Janela {int(window['start'])}s-{int(window['end'])}s: "
+        f"{len(candidates)} candidatos em {time.time() - start_time:.1f}s"
+    )
+    return candidates
+
+def _reduce_candidates(candidates, max_segments=MAX_VIRAL_SEGMENTS):
+    """
+    Etapa reduce: ordena por nota e descarta candidatos que se sobrepõem (>50% do menor)
+    a um já escolhido (janelas sobrepostas geram o mesmo momento mais de uma vez).
+    """
+    selected = []
+    for cand in sorted(candidates, key=lambda c: c['score'], reverse=True):
+        overlaps = False
+        for chosen in selected:
+            inter = min(cand['end'], chosen['end']) - max(cand['start'], chosen['start'])
+            shorter = min(cand['end'] - cand['start'], chosen['end'] - chosen['start'])
+            if inter > 0.5 * shorter:
+                overlaps = True
+                break
+        if not overlaps:
+            selected.append(cand)
+        if len(selected) >= max_segments:
+            break
+    return sorted(selected, key=lambda c: c['start'])
+
+def _init_analysis_worker(n_threads, llm_cache_bypass=False):
+    """Initializer do pool: cada processo carrega seu próprio Llama."""
+    global _WORKER_LLAMA
+    set_bypass(llm_cache_bypass)
+    _WORKER_LLAMA = _load_llama_instance(n_threads=n_threads)
+
+def _analysis_worker(window, duration_total):
+    """Analisa uma janela dentro de um processo do pool."""
+    if _WORKER_LLAMA is None:
+        return []
+    return _score_window(_WORKER_LLAMA, window, duration_total)
+
+def _analyze_windows_in_pool(windows, duration_total, workers):
+    """
+    Pool de processos só durante o map: cada processo carrega seu Llama e a
+    RAM dessas cópias fica reservada no registro até o pool ser encerrado.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    with MODEL_REGISTRY.reserve("llama-pool", ram_mb=_llama_cost_mb() * workers):
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_analysis_worker,
+            initargs=(n_threads, bypassed())
+        ) as pool:
+            return list(pool.map(_analysis_worker, windows, [duration_total] * len(windows)))
+
+def _analysis_worker_count(num_windows):
+    """Processos paralelos limitados por configuração, núcleos e RAM livre no orçamento."""
+    by_cores = (os.cpu_count() or 1) // LLAMA_MIN_THREADS_PER_WORKER
+    ram_used, _ = MODEL_REGISTRY.usage()
+    by_ram = int((MODEL_REGISTRY.ram_budget_mb - ram_used) // _llama_cost_mb()) if MODEL_REGISTRY.ram_budget_mb else by_cores
+    return max(1, min(LLM_ANALYSIS_WORKERS, num_windows, by_cores, by_ram))
+
+def _analyze_viral_segments_windowed(segments, duration_total):
+    """
+    Map-reduce sobre o episódio inteiro: janelas sobrepostas do roteiro com
+    timestamps são avaliadas de forma independente (em paralelo quando houver
+    núcleos/RAM) e os candidatos são mesclados e ranqueados.
+    """
+    if TRANSCRIPT_COMPRESSION:
+        segments, report = compress_transcript(segments)
+        raw_tokens, compact_tokens = report['tokens_est']
+        logger.info(
+            f"[DEEPSEEK] Roteiro comprimido: {report['lines'][0]} -> {report['lines'][1]} linhas, "
+            f"~{raw_tokens} -> ~{compact_tokens} tokens (-{report['reduction']:.0%})"
+        )
+        try:
+            from ..metrics import count
+            count("transcript_tokens_raw", raw_tokens)
+            count("transcript_tokens_compact", compact_tokens)
+        except ImportError:
+            pass  # Fora do handler (ex.: AnimeCut): só o log
+    
+    windows = build_transcript_windows(segments, compact=TRANSCRIPT_COMPRESSION)
+    if not windows:
+        logger.warning("[DEEPSEEK] Transcrição vazia. Nada para analisar.")
+        return _finalize_segments([], duration_total)
+    
+    workers = _analysis_worker_count(len(windows))
+    logger.info(f"[DEEPSEEK] Análise em janelas: {len(windows)} janela(s), {workers} processo(s)")
+    
+    # Com 1 processo (padrão) a análise fica no processo atual, com o Llama do registro
+    results = None
+    if workers > 1:
+        try:
+            results = _analyze_windows_in_pool(windows, duration_total, workers)
+        except Exception as e:
+            logger.warning(f"[DEEPSEEK] Pool de processos falhou ({e}). Analisando em sequência...")
+            results = None
+    
+    if results is None:
+        with MODEL_REGISTRY.acquire("llama") as llm:
+            if llm is None:
+                logger.error("[DEEPSEEK] Modelo não carregado para análise de segmentos.")
+                return []
+            results = [_score_window(llm, window, duration_total) for window in windows]
+    
+    candidates = [cand for window_result in results for cand in window_result]
+    logger.info(f"[DEEPSEEK] {len(candidates)} candidatos nas janelas. Mesclando...")
+    
+    selected = _reduce_candidates(candidates)
+    for seg in selected:
+        logger.info(f"[DEEPSEEK] ✓ Segmento: {seg['start']}s-{seg['end']}s (nota {seg['score']})")
+    
+    return _finalize_segments(selected, duration_total)
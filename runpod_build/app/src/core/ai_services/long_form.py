@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+TRANSCRIÇÃO LONGA (CHUNKS EM PARALELO)
+Divide o áudio de um filme/episódio longo em N pedaços nos pontos de silêncio,
+transcreve cada pedaço em um processo separado (cada um com seu próprio modelo)
+e costura os segmentos/palavras de volta com o deslocamento correto.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Abaixo desta duração a transcrição é feita em uma única chamada
+LONGFORM_MIN_SECONDS = float(os.environ.get("AUTOCORTES_LONGFORM_MIN_SECONDS", 600))
+
+# Processos de STT em paralelo na CPU (opt-in). Cada processo carrega outra
+# cópia do modelo a cada job; 0/1 = chamada única com o modelo residente
+STT_WORKERS = int(os.environ.get("AUTOCORTES_STT_WORKERS", "0"))
+STT_MIN_THREADS_PER_WORKER = 2
+
+# Busca do ponto de corte: janela de ±30s em volta da fronteira ideal, quadros de 100ms
+SILENCE_SEARCH_SECONDS = 30.0
+SILENCE_FRAME_SECONDS = 0.1
+SILENCE_SMOOTH_FRAMES = 5
+
+_WORKER_STT = None
+
+# ==================== DIVISÃO NOS SILÊNCIOS ====================
+
+def quietest_point(audio, center, sr=SAMPLE_RATE):
+    """Amostra mais silenciosa (RMS suavizado) em volta de `center`."""
+    import numpy as np
+
+    frame = int(sr * SILENCE_FRAME_SECONDS)
+    radius = int(sr * SILENCE_SEARCH_SECONDS)
+    lo = max(0, center - radius)
+    hi = min(len(audio), center + radius)
+
+    n_frames = (hi - lo) // frame
+    if n_frames < SILENCE_SMOOTH_FRAMES:
+        return center
+
+    frames = audio[lo:lo + n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    smooth = np.convolve(rms, np.ones(SILENCE_SMOOTH_FRAMES) / SILENCE_SMOOTH_FRAMES, mode="same")
+    return lo + int(np.argmin(smooth)) * frame + frame // 2
+
+def split_at_silence(audio, num_chunks, sr=SAMPLE_RATE):
+    """
+    Divide o áudio em `num_chunks` pedaços de tamanho parecido, cortando no
+    trecho mais silencioso perto de cada fronteira.
+
+    Returns:
+        Lista de (offset_segundos, array)
+    """
+    total = len(audio)
+    if num_chunks <= 1 or total == 0:
+        return [(0.0, audio)]
+
+    bounds = [0]
+    for i in range(1, num_chunks):
+        cut = quietest_point(audio, total * i // num_chunks, sr)
+        if cut > bounds[-1]:
+            bounds.append(cut)
+    bounds.append(total)
+
+    return [(start / sr, audio[start:end]) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+# ==================== COSTURA ====================
+
+def _shift(item, offset):
+    shifted = dict(item)
+    shifted["start"] = item["start"] + offset
+    shifted["end"] = item["end"] + offset
+    return shifted
+
+def stitch_results(parts, language="pt"):
+    """
+    Junta resultados de chunks em um único resultado no formato do backend.
+
+    Args:
+        parts: Lista de (offset_segundos, resultado do backend)
+    """
+    segments = []
+    for offset, result in sorted(parts, key=lambda p: p[0]):
+        for seg in (result or {}).get("segments", []):
+            item = _shift(seg, offset)
+            if "words" in seg:
+                item["words"] = [_shift(w, offset) for w in seg["words"]]
+            segments.append(item)
+
+    detected = next((r.get("language") for _, r in parts if r and r.get("language")), language)
+    return {
+        "text": "".join(s["text"] for s in segments),
+        "language": detected,
+        "segments": segments,
+    }
+
+# ==================== POOL DE PROCESSOS ====================
+
+def _init_stt_worker(backend, model_size, compute_type, cpu_threads):
+    """Initializer do pool: cada processo carrega seu próprio modelo em CPU."""
+    global _WORKER_STT
+    from .stt_backend import create_stt_backend
+
+    try:
+        import torch
+        torch.set_num_threads(cpu_threads)
+    except ImportError:
+        pass
+
+    _WORKER_STT = create_stt_backend(
+        backend,
+        model_size=model_size,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads
+    )
+
+def _stt_worker(chunk, offset, language, word_timestamps):
+    """Transcreve um chunk dentro de um processo do pool."""
+    result = _WORKER_STT.transcribe(chunk, language=language, word_timestamps=word_timestamps)
+    return offset, result
+
+def transcribe_chunks_parallel(audio, workers, backend, model_size, compute_type="auto",
+                               language="pt", word_timestamps=False, sr=SAMPLE_RATE):
+    """
+    Transcreve um áudio longo em `workers` processos e costura o resultado.
+
+    Raises:
+        Exception: se o pool falhar (o chamador cai para a chamada única)
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = split_at_silence(audio, workers, sr)
+    cpu_threads = max(1, (os.cpu_count() or 1) // len(chunks))
+    logger.info(
+        f"[WHISPER] Modo longo: {len(audio) / sr / 60:.1f}min em {len(chunks)} chunk(s), "
+        f"{cpu_threads} thread(s) por processo"
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=len(chunks),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_stt_worker,
+        initargs=(backend, model_size, compute_type, cpu_threads)
+    ) as pool:
+        futures = [
+            pool.submit(_stt_worker, chunk, offset, language, word_timestamps)
+            for offset, chunk in chunks
+        ]
+        parts = [f.result() for f in futures]
+
+    return stitch_results(parts, language)
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+REGISTRO DE MODELOS COM ORÇAMENTO DE MEMÓRIA
+Cada modelo declara seu custo de RAM/VRAM. Os chamadores usam `acquire()` e o
+registro só descarrega modelos (LRU, que não estejam em uso) quando o orçamento
+configurado seria excedido. Em workers aquecidos, Whisper e Llama ficam
+residentes entre jobs.
+
+Modelos exclusivos (padrão) têm um lock próprio: jobs concorrentes no mesmo
+worker usam a mesma instância um de cada vez, sem bloquear os outros modelos.
+A carga também roda fora do lock do registro: Whisper e Llama podem carregar
+em paralelo (aquecimento no boot) e quem pede um modelo espera só por ele.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Fração da memória física usada como orçamento padrão
+DEFAULT_RAM_FRACTION = 0.8
+DEFAULT_VRAM_FRACTION = 0.9
+
+def detect_total_ram_mb():
+    """RAM física total em MB (0 se não for possível detectar)."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 ** 2)
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+def detect_total_vram_mb():
+    """VRAM total da GPU 0 em MB (0 sem GPU)."""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return torch.cuda.get_device_properties(0).total_memory / (1024 ** 2)
+    except ImportError:
+        pass
+    return 0
+
+def detect_available_ram_mb():
+    """RAM disponível agora em MB (MemAvailable; 0 se não for possível detectar)."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 ** 2)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0
+
+def _budget_from_env(var_name, total_mb, fraction):
+    """Lê o orçamento (MB) da variável de ambiente; sem ela, usa uma fração do total."""
+    value = os.environ.get(var_name)
+    if value:
+        return float(value)
+    return total_mb * fraction
+
+class _ModelEntry:
+    """Estado de um modelo registrado."""
+
+    def __init__(self, name, loader, ram_mb, vram_mb, unloader, exclusive):
+        self.name = name
+        self.loader = loader
+        self.ram_mb = ram_mb
+        self.vram_mb = vram_mb
+        self.unloader = unloader
+        # Reentrante: uma thread que já usa o modelo pode chamar acquire() de novo
+        self.use_lock = threading.RLock() if exclusive else None
+        # Serializa a carga deste modelo (sem travar o registro)
+        self.load_lock = threading.Lock()
+        self.loading = False
+        self.instance = None
+        self.in_use = 0
+        self.load_seconds = None
+        self.load_count = 0
+
+    def cost(self):
+        ram = self.ram_mb() if callable(self.ram_mb) else self.ram_mb
+        vram = self.vram_mb() if callable(self.vram_mb) else self.vram_mb
+        return float(ram or 0), float(vram or 0)
+
+class ModelRegistry:
+    """
+    Registro de modelos com despejo LRU limitado por orçamento de RAM/VRAM.
+
+    Uso:
+        registry.register("whisper", loader, ram_mb=1500, vram_mb=0)
+        with registry.acquire("whisper") as model:
+            if model is not None:
+                model.transcribe(...)
+    """
+
+    def __init__(self, ram_budget_mb=None, vram_budget_mb=None, on_evict=None):
+        if ram_budget_mb is None:
+            ram_budget_mb = _budget_from_env("AUTOCORTES_RAM_BUDGET_MB", detect_total_ram_mb(), DEFAULT_RAM_FRACTION)
+        if vram_budget_mb is None:
+            vram_budget_mb = _budget_from_env("AUTOCORTES_VRAM_BUDGET_MB", detect_total_vram_mb(), DEFAULT_VRAM_FRACTION)
+
+        self.ram_budget_mb = ram_budget_mb
+        self.vram_budget_mb = vram_budget_mb
+        self.on_evict = on_evict
+        self._entries = {}
+        self._lru = OrderedDict()  # nome -> None, do menos para o mais recente
+        self._reservations = {}  # token -> (rótulo, ram_mb, vram_mb)
+        self._lock = threading.RLock()
+
+    # ---------- Registro ----------
+
+    def register(self, name, loader, ram_mb=0, vram_mb=0, unloader=None, exclusive=True):
+        """
+        Registra um modelo.
+
+        Args:
+            name: Nome do modelo ("whisper", "llama"...)
+            loader: Função sem argumentos que retorna a instância (ou None se falhar)
+            ram_mb, vram_mb: Custo declarado (número ou função que retorna o número)
+            unloader: Função opcional chamada com a instância ao descarregar
+            exclusive: Só uma thread usa a instância por vez (Whisper/llama.cpp não são thread-safe)
+        """
+        with self._lock:
+            self._entries[name] = _ModelEntry(name, loader, ram_mb, vram_mb, unloader, exclusive)
+
+    def is_loaded(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry is not None and entry.instance is not None
+
+    def usage(self):
+        """Retorna (ram_mb, vram_mb) dos modelos carregados (ou carregando) e das reservas."""
+        with self._lock:
+            ram = vram = 0.0
+            for entry in self._entries.values():
+                if entry.instance is not None or entry.loading:
+                    r, v = entry.cost()
+                    ram += r
+                    vram += v
+            for _, r, v in self._reservations.values():
+                ram += r
+                vram += v
+            return ram, vram
+
+    def stats(self):
+        """Resumo do registro (para logs/métricas)."""
+        with self._lock:
+            ram, vram = self.usage()
+            return {
+                "ram_budget_mb": round(self.ram_budget_mb),
+                "vram_budget_mb": round(self.vram_budget_mb),
+                "ram_used_mb": round(ram),
+                "vram_used_mb": round(vram),
+                "reservations": [label for label, _, _ in self._reservations.values()],
+                "models": {
+                    name: {
+                        "loaded": entry.instance is not None,
+                        "in_use": entry.in_use,
+                        "load_seconds": entry.load_seconds,
+                        "load_count": entry.load_count,
+                    }
+                    for name, entry in self._entries.items()
+                },
+            }
+
+    # ---------- Carga / Despejo ----------
+
+    def _evict_for(self, name, ram_needed, vram_needed):
+        """Despeja modelos LRU ociosos até caber no orçamento (se possível)."""
+        ram_used, vram_used = self.usage()
+
+        def exceeds():
+            ram_over = self.ram_budget_mb and ram_used + ram_needed > self.ram_budget_mb
+            vram_over = self.vram_budget_mb and vram_needed and vram_used + vram_needed > self.vram_budget_mb
+            return ram_over or vram_over
+
+        for victim in list(self._lru):
+            if not exceeds():
+                break
+            entry = self._entries[victim]
+            if victim == name or entry.in_use or entry.instance is None:
+                continue
+            r, v = entry.cost()
+            logger.info(f"[REGISTRY] Orçamento excedido. Despejando '{victim}' (LRU, {r:.0f}MB RAM / {v:.0f}MB VRAM).")
+            self._unload_entry(entry)
+            ram_used -= r
+            vram_used -= v
+
+        if exceeds():
+            logger.warning(
+                f"[REGISTRY] '{name}' excede o orçamento mesmo após despejo "
+                f"(RAM {ram_used + ram_needed:.0f}/{self.ram_budget_mb:.0f}MB, "
+                f"VRAM {vram_used + vram_needed:.0f}/{self.vram_budget_mb:.0f}MB). Carregando assim mesmo."
+            )
+
+    def _unload_entry(self, entry):
+        instance = entry.instance
+        entry.instance = None
+        self._lru.pop(entry.name, None)
+        if entry.unloader is not None and instance is not None:
+            try:
+                entry.unloader(instance)
+            except Exception as e:
+                logger.warning(f"[REGISTRY] Erro ao descarregar '{entry.name}': {e}")
+        del instance
+        if self.on_evict is not None:
+            self.on_evict()
+
+    def _touch(self, name):
+        self._lru.pop(name, None)
+        self._lru[name] = None
+
+    def get(self, name):
+        """
+        Retorna a instância do modelo, carregando se necessário (None se falhar).
+        A carga roda fora do lock do registro; quem pede o mesmo modelo durante
+        a carga espera por ela (load_lock), os demais modelos seguem livres.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                raise KeyError(f"Modelo não registrado: {name}")
+            if entry.instance is not None:
+                self._touch(name)
+                return entry.instance
+
+        with entry.load_lock:
+            with self._lock:
+                if entry.instance is not None:
+                    self._touch(name)
+                    return entry.instance
+                ram_needed, vram_needed = entry.cost()
+                self._evict_for(name, ram_needed, vram_needed)
+                entry.loading = True
+
+            start = time.perf_counter()
+            try:
+                instance = entry.loader()
+            finally:
+                with self._lock:
+                    entry.loading = False
+
+            with self._lock:
+                if instance is None:
+                    return None
+                entry.instance = instance
+                entry.load_seconds = round(time.perf_counter() - start, 3)
+                entry.load_count += 1
+                logger.info(f"[REGISTRY] '{name}' carregado em {entry.load_seconds:.1f}s.")
+                self._touch(name)
+                return instance
+
+    def unload(self, name):
+        """Descarrega o modelo explicitamente (ignorado se estiver em uso)."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.instance is None:
+                return
+            if entry.in_use:
+                logger.warning(f"[REGISTRY] '{name}' em uso. Descarregamento adiado.")
+                return
+            logger.info(f"[REGISTRY] Descarregando '{name}'...")
+            self._unload_entry(entry)
+
+    @contextmanager
+    def reserve(self, label, ram_mb=0, vram_mb=0):
+        """
+        Reserva memória fora dos modelos registrados enquanto durar o bloco
+        (ex.: processos filhos com cópias próprias do modelo). A reserva entra
+        em usage(), então outros jobs e o despejo a enxergam; modelos ociosos
+        são despejados (LRU) para que ela caiba no orçamento.
+        """
+        token = object()
+        with self._lock:
+            self._evict_for(label, ram_mb, vram_mb)
+            self._reservations[token] = (label, float(ram_mb or 0), float(vram_mb or 0))
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reservations.pop(token, None)
+
+    @contextmanager
+    def acquire(self, name):
+        """
+        Context manager que entrega o modelo (ou None se não carregar) e o
+        protege de despejo enquanto estiver em uso. Em modelos exclusivos,
+        espera o lock do modelo (fora do lock do registro, para não travar
+        os demais modelos).
+        """
+        while True:
+            instance = self.get(name)
+            with self._lock:
+                entry = self._entries[name]
+                if instance is None or entry.instance is instance:
+                    if instance is not None:
+                        entry.in_use += 1
+                    break
+            # Despejado entre a carga e o uso: carrega de novo
+        
+        use_lock = entry.use_lock if instance is not None else None
+        if use_lock is not None:
+            use_lock.acquire()
+        try:
+            yield instance
+        finally:
+            if use_lock is not None:
+                use_lock.release()
+            if instance is not None:
+                with self._lock:
+                    entry.in_use -= 1
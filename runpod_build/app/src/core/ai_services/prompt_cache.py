@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+CACHE DE PREFIXO DO PROMPT (ESTADO KV DO LLAMA)
+Títulos, análise de segmentos e o título legado mandam sempre o mesmo system
+prompt. Em CPU, o prefill desse prefixo domina o tempo até o primeiro token.
+
+O estado do Llama logo após o system prompt (KV cache + tokens) é salvo por
+hash do prefixo. Na próxima chamada com o mesmo prefixo o estado é restaurado
+e o llama.cpp só avalia a parte variável (mensagem do usuário), já que reutiliza
+o maior prefixo comum de tokens.
+
+Os estados ficam em RAM, em LRU limitado por AUTOCORTES_PROMPT_CACHE_MB. Com
+pouca RAM livre (< AUTOCORTES_PROMPT_CACHE_MIN_FREE_MB) o cache é esvaziado e
+não guarda nada novo. Só vale para modelos com o template de chat do Llama 3;
+nos outros casos (ou em qualquer erro) cai em create_chat_completion.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from .model_registry import detect_available_ram_mb
+
+logger = logging.getLogger(__name__)
+
+# Template de chat do Llama 3 (o BOS vem do tokenize com add_bos=True)
+LLAMA3_HEADER = "<|start_header_id|>{role}<|end_header_id|>\n\n"
+LLAMA3_EOT = "<|eot_id|>"
+
+def _is_llama3(llm):
+    """True se o GGUF usa o template de chat do Llama 3."""
+    metadata = getattr(llm, "metadata", None) or {}
+    return "<|start_header_id|>" in metadata.get("tokenizer.chat_template", "")
+
+def _turn(role, content):
+    return LLAMA3_HEADER.format(role=role) + content + LLAMA3_EOT
+
+def _state_nbytes(state):
+    """Tamanho aproximado de um LlamaState em RAM."""
+    size = getattr(state, "llama_state_size", 0) or 0
+    for attr in ("scores", "input_ids"):
+        size += getattr(getattr(state, attr, None), "nbytes", 0) or 0
+    return size
+
+class PromptStateCache:
+    """Estados do Llama após o system prompt, em LRU limitado por bytes."""
+
+    def __init__(self, max_mb=None, min_free_mb=None):
+        if max_mb is None:
+            max_mb = float(os.environ.get("AUTOCORTES_PROMPT_CACHE_MB", 1024))
+        if min_free_mb is None:
+            min_free_mb = float(os.environ.get("AUTOCORTES_PROMPT_CACHE_MIN_FREE_MB", 2048))
+
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.min_free_mb = min_free_mb
+        self.hits = 0
+        self.misses = 0
+        self._states = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, llm, prefix):
+        """Chave = modelo + contexto + texto do prefixo."""
+        payload = f"{getattr(llm, 'model_path', '')}|{getattr(llm, 'n_ctx', lambda: 0)()}|{prefix}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            item = self._states.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._states.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, state):
+        size = _state_nbytes(state)
+        if size > self.max_bytes:
+            return
+        if self._ram_tight():
+            self.clear()
+            logger.info("[PROMPTCACHE] Pouca RAM livre: cache de prefixo esvaziado.")
+            return
+        with self._lock:
+            old = self._states.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._states[key] = (state, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._states) > 1:
+                _, (_, evicted) = self._states.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._states),
+                "mb": round(self._bytes / (1024 ** 2), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _ram_tight(self):
+        available = detect_available_ram_mb()
+        return bool(available) and available < self.min_free_mb
+
+def _as_chat(result, stream):
+    """Converte a saída de create_completion para o formato de chat."""
+    if not stream:
+        choice = result["choices"][0]
+        return {
+            **result,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": choice["text"]},
+                "finish_reason": choice.get("finish_reason"),
+            }],
+        }
+
+    def chunks():
+        for chunk in result:
+            choice = chunk["choices"][0]
+            yield {
+                **chunk,
+                "object": "chat.completion.chunk",
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": choice["text"]},
+                    "finish_reason": choice.get("finish_reason"),
+                }],
+            }
+    return chunks()
+
+def cached_chat_completion(llm, messages, cache, **kwargs):
+    """
+    create_chat_completion com o estado do system prompt reaproveitado.
+    Mesma assinatura e mesmo formato de retorno (inclusive com stream=True).
+    """
+    if (not cache.enabled or not messages or messages[0]["role"] != "system"
+            or not _is_llama3(llm)):
+        return llm.create_chat_completion(messages=messages, **kwargs)
+
+    try:
+        prefix = _turn("system", messages[0]["content"])
+        rest = "".join(_turn(m["role"], m["content"]) for m in messages[1:])
+        rest += LLAMA3_HEADER.format(role="assistant")
+        prefix_tokens = llm.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+        rest_tokens = llm.tokenize(rest.encode("utf-8"), add_bos=False, special=True)
+
+        key = cache.key(llm, prefix)
+        state = cache.get(key)
+        if state is not None:
+            llm.load_state(state)
+        else:
+            llm.reset()
+            llm.eval(prefix_tokens)
+            cache.put(key, llm.save_state())
+    except Exception as e:
+        logger.warning(f"[PROMPTCACHE] Falha ao restaurar prefixo ({e}). Usando chat padrão.")
+        return llm.create_chat_completion(messages=messages, **kwargs)
+
+    stop = kwargs.pop("stop", None) or []
+    if isinstance(stop, str):
+        stop = [stop]
+    result = llm.create_completion(
+        prompt=prefix_tokens + rest_tokens,
+        stop=list(stop) + [LLAMA3_EOT],
+        **kwargs
+    )
+    return _as_chat(result, kwargs.get("stream", False))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+SAÍDA ESTRUTURADA DO LLAMA (GRAMÁTICA GBNF)
+Em vez de deixar o modelo escrever livremente e raspar timestamps com regex,
+a decodificação é restrita por gramática do llama.cpp: o modelo só consegue
+emitir uma lista JSON válida de segmentos ({start, end, score, reason}) ou de
+títulos. Menos tokens gerados, nenhuma explicação no meio e quase nenhum caso
+de resposta sem segmentos (que caía nos cortes automáticos).
+
+As gramáticas são escritas à mão (sem {m,n} nem maxItems) para funcionar em
+todas as versões de llama-cpp-python >= 0.2. AUTOCORTES_LLM_GRAMMAR=0 volta
+ao texto livre; sem suporte a gramática, idem.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+GRAMMAR_ENABLED = os.environ.get("AUTOCORTES_LLM_GRAMMAR", "1") not in ("0", "false", "False")
+
+_COMMON_RULES = r'''
+ws ::= [ \n]?
+int ::= [0-9] ([0-9] ([0-9] ([0-9] [0-9]?)?)?)?
+string ::= "\"" [^"\\\n]* "\""
+'''
+
+# Letras de título: maiúsculas (com acentos do português), dígitos e pontuação curta
+_TITLE_RULE = r'''
+title-char ::= [A-Z0-9ÀÁÂÃÇÉÊÍÓÔÕÚÜ !?,']
+'''
+
+# Tokens por título na lista JSON: 4-9 palavras em maiúsculas com acentos
+# (~2 caracteres por token, até ~70 caracteres) + aspas, vírgula e espaço
+TITLE_ITEM_TOKENS = 40
+
+def _bounded_list(rule, max_items):
+    """'rule ("," ws rule (...)?)?' com no máximo max_items elementos."""
+    tail = ""
+    for _ in range(max(1, max_items) - 1):
+        tail = f' ("," ws {rule}{tail})?'
+    return f"{rule}{tail}"
+
+def segments_gbnf(max_items):
+    """Lista JSON de até max_items objetos {start, end, score, reason}."""
+    return (
+        f'root ::= "[" ws ({_bounded_list("segment", max_items)})? ws "]"\n'
+        r'segment ::= "{" ws "\"start\":" ws int "," ws "\"end\":" ws int "," ws '
+        r'"\"score\":" ws int "," ws "\"reason\":" ws string ws "}"'
+        + _COMMON_RULES
+    )
+
+def titles_gbnf(count):
+    """Lista JSON com exatamente `count` títulos em maiúsculas."""
+    items = ' "," ws '.join(["title"] * max(1, count))
+    return (
+        f'root ::= "[" ws {items} ws "]"\n'
+        r'title ::= "\"" title-char+ "\""'
+        + _COMMON_RULES + _TITLE_RULE
+    )
+
+def titles_max_tokens(count):
+    """max_tokens para a lista de `count` títulos (sobra para não cortar o último)."""
+    return TITLE_ITEM_TOKENS * max(1, count) + 8
+
+def title_line_gbnf():
+    """Um único título em maiúsculas, sem aspas nem explicação."""
+    return "root ::= title-char+" + _COMMON_RULES + _TITLE_RULE
+
+_GRAMMARS = {}
+_SOURCES = {}
+_GRAMMARS_LOCK = threading.Lock()
+
+def load_grammar(gbnf):
+    """LlamaGrammar compilada (em cache por texto), ou None se indisponível/desativada."""
+    if not GRAMMAR_ENABLED:
+        return None
+    with _GRAMMARS_LOCK:
+        if gbnf in _GRAMMARS:
+            return _GRAMMARS[gbnf]
+        grammar = None
+        try:
+            from llama_cpp import LlamaGrammar
+            grammar = LlamaGrammar.from_string(gbnf, verbose=False)
+        except Exception as e:
+            logger.warning(f"[GRAMMAR] Gramática indisponível ({e}). Usando texto livre.")
+        _GRAMMARS[gbnf] = grammar
+        if grammar is not None:
+            _SOURCES[id(grammar)] = gbnf
+        return grammar
+
+def grammar_source(grammar):
+    """Texto GBNF de uma gramática de load_grammar (entra na chave do cache de completions)."""
+    return _SOURCES.get(id(grammar)) if grammar is not None else None
+
+def _complete_items(text):
+    """Elementos completos (objetos, strings, números) de uma lista JSON truncada."""
+    pos = text.find("[")
+    if pos < 0:
+        return []
+    decoder = json.JSONDecoder()
+    items = []
+    pos += 1
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        try:
+            item, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            return items
+        items.append(item)
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if text[pos:pos + 1] != ",":
+            return items
+        pos += 1
+
+def parse_json_list(text):
+    """
+    Lista JSON da resposta. Se a geração foi cortada por max_tokens, recupera
+    os elementos completos que já saíram (objetos ou títulos entre aspas).
+    """
+    text = (text or "").strip()
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, list) else []
+    except ValueError:
+        pass
+    items = _complete_items(text)
+    if items:
+        return items
+    for match in re.finditer(r'\{[^{}]*\}', text):
+        try:
+            items.append(json.loads(match.group(0)))
+        except ValueError:
+            continue
+    return items
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+BACKENDS DE STT (SPEECH-TO-TEXT)
+Interface única para openai-whisper e faster-whisper (CTranslate2).
+
+Ambos retornam o mesmo formato do openai-whisper:
+    {"text": str, "language": str, "segments": [{"start", "end", "text", "words"?}]}
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKEND_OPENAI_WHISPER = "openai-whisper"
+BACKEND_FASTER_WHISPER = "faster-whisper"
+
+# Tipos de computação suportados pelo CTranslate2
+FASTER_WHISPER_COMPUTE_TYPES = ("float16", "int8", "int8_float16", "float32")
+
+def detect_device():
+    """Retorna 'cuda' se houver GPU disponível, senão 'cpu'."""
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+def resolve_compute_type(compute_type, device):
+    """
+    Resolve o compute_type do faster-whisper.
+    'auto' = float16 na GPU e int8 na CPU (float16 não roda em CPU).
+    """
+    if compute_type in (None, "", "auto"):
+        return "float16" if device == "cuda" else "int8"
+
+    if compute_type not in FASTER_WHISPER_COMPUTE_TYPES:
+        raise ValueError(f"compute_type inválido: {compute_type} (use {', '.join(FASTER_WHISPER_COMPUTE_TYPES)})")
+
+    if device == "cpu" and compute_type in ("float16", "int8_float16"):
+        logger.warning(f"[STT] compute_type '{compute_type}' não suportado em CPU. Usando int8.")
+        return "int8"
+
+    return compute_type
+
+class OpenAIWhisperBackend:
+    """Backend openai-whisper (PyTorch)."""
+
+    name = BACKEND_OPENAI_WHISPER
+
+    def __init__(self, model_size="medium", device=None):
+        import whisper
+
+        self.device = device or detect_device()
+        self.model_size = model_size
+        self.compute_type = "float16" if self.device == "cuda" else "float32"
+        self.model = whisper.load_model(model_size, device=self.device)
+
+    def transcribe(self, audio, language="pt", word_timestamps=False, **options):
+        """Transcreve um caminho de arquivo ou array float32 16 kHz."""
+        result = self.model.transcribe(
+            audio,
+            fp16=self.device == "cuda",
+            verbose=False,
+            language=language,
+            word_timestamps=word_timestamps,
+            **options
+        )
+
+        segments = []
+        for seg in result.get("segments", []):
+            item = {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+            if word_timestamps:
+                item["words"] = [
+                    {"word": w["word"], "start": float(w["start"]), "end": float(w["end"])}
+                    for w in seg.get("words", [])
+                ]
+            segments.append(item)
+
+        return {
+            "text": result.get("text", ""),
+            "language": result.get("language", language),
+            "segments": segments,
+        }
+
+class FasterWhisperBackend:
+    """Backend faster-whisper (CTranslate2) com float16/int8/int8_float16."""
+
+    name = BACKEND_FASTER_WHISPER
+
+    def __init__(self, model_size="medium", device=None, compute_type="auto", cpu_threads=0):
+        from faster_whisper import WhisperModel
+
+        self.device = device or detect_device()
+        self.model_size = model_size
+        self.compute_type = resolve_compute_type(compute_type, self.device)
+        self.model = WhisperModel(
+            model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=cpu_threads
+        )
+        self._batched = None
+
+    def transcribe(self, audio, language="pt", word_timestamps=False, **options):
+        """Transcreve um caminho de arquivo ou array float32 16 kHz."""
+        segments_iter, info = self.model.transcribe(
+            audio,
+            language=language,
+            word_timestamps=word_timestamps,
+            **options
+        )
+        return self._collect(segments_iter, info, language, word_timestamps)
+
+    def transcribe_batched(self, audio, language="pt", word_timestamps=False, batch_size=16, **options):
+        """
+        Transcrição em lote (BatchedInferencePipeline): o áudio é dividido em
+        trechos de fala pelo VAD e os trechos são decodificados juntos na GPU.
+        """
+        from faster_whisper import BatchedInferencePipeline
+
+        if self._batched is None:
+            self._batched = BatchedInferencePipeline(model=self.model)
+
+        segments_iter, info = self._batched.transcribe(
+            audio,
+            language=language,
+            word_timestamps=word_timestamps,
+            batch_size=batch_size,
+            **options
+        )
+        return self._collect(segments_iter, info, language, word_timestamps)
+
+    def _collect(self, segments_iter, info, language, word_timestamps):
+        segments = []
+        for seg in segments_iter:
+            item = {"start": float(seg.start), "end": float(seg.end), "text": seg.text}
+            if word_timestamps:
+                item["words"] = [
+                    {"word": w.word, "start": float(w.start), "end": float(w.end)}
+                    for w in (seg.words or [])
+                ]
+            segments.append(item)
+
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "language": getattr(info, "language", language),
+            "segments": segments,
+        }
+
+def create_stt_backend(backend=BACKEND_OPENAI_WHISPER, model_size="medium", device=None, compute_type="auto", cpu_threads=0):
+    """
+    Cria o backend de STT configurado.
+
+    Args:
+        backend: 'openai-whisper' ou 'faster-whisper'
+        model_size: Tamanho do modelo Whisper (tiny, base, small, medium, large-v3...)
+        device: 'cuda', 'cpu' ou None (detecta)
+        compute_type: Apenas faster-whisper ('auto', 'float16', 'int8', 'int8_float16')
+        cpu_threads: Apenas faster-whisper (0 = padrão do CTranslate2)
+    """
+    device = device or detect_device()
+
+    if backend == BACKEND_FASTER_WHISPER:
+        try:
+            return FasterWhisperBackend(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        except Exception as e:
+            if device != "cuda":
+                raise
+            logger.warning(f"[STT] faster-whisper falhou na GPU ({e}). Fallback para CPU (int8)...")
+            return FasterWhisperBackend(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+
+    if backend == BACKEND_OPENAI_WHISPER:
+        return OpenAIWhisperBackend(model_size, device=device)
+
+    raise ValueError(f"Backend de STT desconhecido: {backend}")
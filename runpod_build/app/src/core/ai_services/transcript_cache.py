@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+CACHE DE TRANSCRIÇÕES (ENDEREÇADO POR CONTEÚDO)
+Chave = impressão digital rápida do áudio + modelo + idioma + opções de decodificação.
+O resultado completo (texto, segmentos, palavras) fica em disco como JSON gzip,
+com limite de tamanho e despejo LRU (pelo horário de último acesso).
+"""
+
+import os
+import json
+import gzip
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "autocortes")
+
+# Amostragem do fingerprint: N blocos de 64KB espalhados pelo arquivo
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_BLOCK = 64 * 1024
+
+def get_cache_root():
+    """Diretório base dos caches (AUTOCORTES_CACHE_DIR)."""
+    return os.environ.get("AUTOCORTES_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+def fingerprint_file(path, samples=FINGERPRINT_SAMPLES, block=FINGERPRINT_BLOCK):
+    """
+    Impressão digital rápida de um arquivo: tamanho + blocos amostrados
+    (início, fim e pontos intermediários). Lê no máximo samples * block bytes.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(size).encode())
+
+    with open(path, "rb") as f:
+        if size <= samples * block:
+            digest.update(f.read())
+        else:
+            step = (size - block) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(block))
+
+    return digest.hexdigest()
+
+def fingerprint_array(array, samples=FINGERPRINT_SAMPLES, block=FINGERPRINT_BLOCK):
+    """Impressão digital de um array NumPy (áudio já decodificado)."""
+    data = memoryview(array).cast("B")
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{array.dtype}:{array.shape}".encode())
+
+    if len(data) <= samples * block:
+        digest.update(data)
+    else:
+        step = (len(data) - block) // (samples - 1)
+        for i in range(samples):
+            digest.update(data[i * step:i * step + block])
+
+    return digest.hexdigest()
+
+def fingerprint_audio(audio):
+    """Impressão digital de um caminho de arquivo ou array de áudio."""
+    if isinstance(audio, (str, os.PathLike)):
+        return fingerprint_file(audio)
+    return fingerprint_array(audio)
+
+def _round_floats(obj, digits=3):
+    """Arredonda timestamps para deixar o JSON compacto."""
+    if isinstance(obj, float):
+        return round(obj, digits)
+    if isinstance(obj, dict):
+        return {k: _round_floats(v, digits) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_round_floats(v, digits) for v in obj]
+    return obj
+
+class TranscriptCache:
+    """Cache em disco de resultados do Whisper com limite de tamanho (LRU)."""
+
+    def __init__(self, cache_dir=None, max_mb=None):
+        if max_mb is None:
+            max_mb = float(os.environ.get("AUTOCORTES_TRANSCRIPT_CACHE_MB", 512))
+
+        self.cache_dir = cache_dir or os.path.join(get_cache_root(), "transcripts")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def make_key(self, fingerprint, model, language, options=None):
+        """Chave do cache: fingerprint + modelo + idioma + opções de decodificação."""
+        payload = json.dumps(
+            {"fp": fingerprint, "model": model, "language": language, "options": options or {}},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, key):
+        """Retorna o resultado em cache (ou None) e marca o acesso para o LRU."""
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path, None)
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"[CACHE] Entrada corrompida removida ({e}): {path}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, key, result):
+        """Grava o resultado (escrita atômica) e aplica o limite de tamanho."""
+        if not self.enabled or not result:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(_round_floats(result), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"[CACHE] Falha ao gravar transcrição: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        """Remove as entradas menos acessadas até caber em max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith(".json.gz"):
+                        continue
+                    full = os.path.join(root, name)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, full))
+                    total += st.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, full in sorted(entries):
+                try:
+                    os.remove(full)
+                    total -= size
+                except OSError:
+                    continue
+                if total <= self.max_bytes:
+                    break
+            logger.info(f"[CACHE] Transcrições despejadas (LRU). Tamanho atual: {total / 1024**2:.1f}MB")
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+COMPRESSÃO DO ROTEIRO ANTES DA ANÁLISE DO LLM
+O texto cru do Whisper é verboso: hesitações, gagueiras, linhas repetidas
+(alucinações) e um timestamp [INICIO-FIM] por frase curta. Em CPU cada token
+do roteiro custa prefill; a forma compacta faz um episódio de ~24 min caber
+em uma única janela do n_ctx (8192).
+
+Etapas:
+  1. remove hesitações ("hum", "hã") e palavras repetidas em sequência ("não não não")
+  2. descarta alucinações conhecidas e linhas idênticas a uma recente
+  3. junta segmentos curtos vizinhos (até MERGE_SECONDS por linha)
+  4. limita o tamanho de cada linha
+A marcação de tempo vira só o segundo de início ([123]); o fim de uma linha
+é o início da próxima.
+"""
+
+import os
+import re
+
+TRANSCRIPT_COMPRESSION = os.environ.get("AUTOCORTES_TRANSCRIPT_COMPRESSION", "1") not in ("0", "false", "False")
+
+# Junta segmentos enquanto a linha tiver até MERGE_SECONDS e a pausa for curta
+MERGE_SECONDS = float(os.environ.get("AUTOCORTES_TRANSCRIPT_MERGE_SECONDS", "20"))
+MERGE_MAX_GAP_SECONDS = 2.0
+LINE_MAX_CHARS = int(os.environ.get("AUTOCORTES_TRANSCRIPT_LINE_CHARS", "240"))
+
+# Linha idêntica a outra dita há menos de REPEAT_SECONDS é descartada (loop de alucinação)
+REPEAT_SECONDS = 30.0
+
+# Mesma estimativa da análise em janelas (português)
+CHARS_PER_TOKEN = 3.5
+
+# Só hesitações sem sentido em português: "um" é artigo, "ah"/"oh"/"ué"/"aham"
+# carregam reação ou resposta e ficam no texto
+FILLERS = {
+    "hum", "humm", "hmm", "hm", "hã", "hãã", "ãh", "ahn", "ahm", "éh", "ehh", "uhm",
+}
+
+# Frases que o Whisper inventa em silêncio/música
+HALLUCINATIONS = (
+    "amara.org", "legendas pela comunidade", "obrigado por assistir",
+    "inscreva-se no canal", "legenda adriana zanotto", "thanks for watching",
+)
+
+_PUNCT = ".,!?…;:-\"'«»()"
+
+def _bare(word):
+    return word.strip(_PUNCT).lower()
+
+def clean_text(text):
+    """Remove hesitações, gagueiras e pontuação repetida."""
+    words = []
+    last = None
+    for word in text.split():
+        bare = _bare(word)
+        if bare in FILLERS or (bare and bare == last):
+            continue
+        words.append(word)
+        last = bare
+    text = " ".join(words)
+    text = re.sub(r"([!?,])\1+", r"\1", text)
+    return text.strip(" ,;-")
+
+def _repeat_key(text):
+    return re.sub(r"\W+", "", text.lower())
+
+def _cap_line(text, max_chars=LINE_MAX_CHARS):
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0].rstrip(_PUNCT) + "…"
+
+def raw_line(seg):
+    """Linha no formato original da análise em janelas ([INICIO-FIM] texto)."""
+    return f"[{int(seg['start'])}-{int(seg['end'])}] {seg['text'].strip()}"
+
+def compact_line(seg):
+    """Linha compacta ([INICIO] texto)."""
+    return f"[{int(seg['start'])}] {seg['text']}"
+
+def compress_transcript(segments):
+    """
+    Segmentos do Whisper -> segmentos compactos {'start', 'end', 'text'}.
+
+    Returns:
+        (segmentos compactos, relatório com linhas/caracteres/tokens antes e depois)
+    """
+    last_seen = {}
+    merged = []
+    raw_chars = raw_lines = 0
+    for seg in segments:
+        text = seg.get('text', '').strip()
+        if not text:
+            continue
+        raw_lines += 1
+        raw_chars += len(raw_line(seg)) + 1
+
+        start, end = float(seg['start']), float(seg['end'])
+        text = clean_text(text)
+        key = _repeat_key(text)
+        if not key or any(h in text.lower() for h in HALLUCINATIONS):
+            continue
+        repeated = start - last_seen.get(key, float("-inf")) < REPEAT_SECONDS
+        last_seen[key] = start
+        if repeated:
+            continue
+
+        if merged:
+            current = merged[-1]
+            if (start - current['end'] <= MERGE_MAX_GAP_SECONDS
+                    and end - current['start'] <= MERGE_SECONDS
+                    and len(current['text']) + len(text) + 1 <= LINE_MAX_CHARS):
+                current['end'] = end
+                current['text'] += " " + text
+                continue
+        merged.append({'start': start, 'end': end, 'text': text})
+
+    for seg in merged:
+        seg['text'] = _cap_line(seg['text'])
+
+    compact_chars = sum(len(compact_line(seg)) + 1 for seg in merged)
+    report = {
+        "lines": [raw_lines, len(merged)],
+        "chars": [raw_chars, compact_chars],
+        "tokens_est": [round(raw_chars / CHARS_PER_TOKEN), round(compact_chars / CHARS_PER_TOKEN)],
+        "reduction": round(1 - compact_chars / raw_chars, 3) if raw_chars else 0.0,
+    }
+    return merged, report
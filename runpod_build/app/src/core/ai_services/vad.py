@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+VAD (DETECÇÃO DE FALA) ANTES DO WHISPER
+Encontra as regiões com fala, entrega ao Whisper apenas essas regiões
+concatenadas e depois devolve os timestamps para a linha do tempo original.
+
+Usa o Silero VAD do faster-whisper quando instalado (distingue fala de música);
+sem ele, cai para um VAD de energia (pula silêncio, mas não música).
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+VAD_ENABLED = os.environ.get("AUTOCORTES_VAD", "1") not in ("0", "false", "False")
+
+# Parâmetros comuns
+VAD_MIN_SILENCE_SECONDS = float(os.environ.get("AUTOCORTES_VAD_MIN_SILENCE", 1.0))
+VAD_PAD_SECONDS = 0.2
+VAD_MIN_SPEECH_SECONDS = 0.25
+
+# VAD de energia: quadros de 30ms, limiar relativo ao ruído de fundo
+ENERGY_FRAME_SECONDS = 0.03
+ENERGY_NOISE_PERCENTILE = 10
+ENERGY_THRESHOLD_RATIO = 3.0
+ENERGY_MIN_RMS = 0.005
+
+def _silero_regions(audio, sr):
+    """Regiões de fala (segundos) pelo Silero VAD do faster-whisper."""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    options = VadOptions(
+        min_silence_duration_ms=int(VAD_MIN_SILENCE_SECONDS * 1000),
+        speech_pad_ms=int(VAD_PAD_SECONDS * 1000),
+        min_speech_duration_ms=int(VAD_MIN_SPEECH_SECONDS * 1000),
+    )
+    return [(ts["start"] / sr, ts["end"] / sr) for ts in get_speech_timestamps(audio, options)]
+
+def _energy_regions(audio, sr):
+    """Regiões de fala (segundos) por energia RMS com limiar adaptativo."""
+    import numpy as np
+
+    frame = int(sr * ENERGY_FRAME_SECONDS)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+
+    rms = np.empty(n_frames, dtype=np.float32)
+    block = 10000  # quadros por bloco (evita uma cópia do áudio inteiro)
+    for i in range(0, n_frames, block):
+        j = min(n_frames, i + block)
+        frames = audio[i * frame:j * frame].reshape(j - i, frame)
+        rms[i:j] = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+
+    noise_floor = float(np.percentile(rms, ENERGY_NOISE_PERCENTILE))
+    # Limitado a metade da mediana: com fundo musical alto (ou sinal constante),
+    # o limiar não pode engolir a fala
+    threshold = max(ENERGY_MIN_RMS, min(noise_floor * ENERGY_THRESHOLD_RATIO, 0.5 * float(np.median(rms))))
+    active = rms > threshold
+
+    regions = []
+    start = None
+    for idx, is_active in enumerate(active):
+        if is_active and start is None:
+            start = idx
+        elif not is_active and start is not None:
+            regions.append((start * ENERGY_FRAME_SECONDS, idx * ENERGY_FRAME_SECONDS))
+            start = None
+    if start is not None:
+        regions.append((start * ENERGY_FRAME_SECONDS, n_frames * ENERGY_FRAME_SECONDS))
+
+    return regions
+
+def _merge_regions(regions, duration):
+    """Aplica padding, junta regiões separadas por pouco silêncio e descarta as curtas."""
+    merged = []
+    for start, end in sorted(regions):
+        start = max(0.0, start - VAD_PAD_SECONDS)
+        end = min(duration, end + VAD_PAD_SECONDS)
+        if merged and start - merged[-1][1] < VAD_MIN_SILENCE_SECONDS:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return [(s, e) for s, e in merged if e - s >= VAD_MIN_SPEECH_SECONDS]
+
+def detect_speech_regions(audio, sr=SAMPLE_RATE):
+    """
+    Detecta as regiões com fala.
+
+    Returns:
+        (lista de (inicio, fim) em segundos, método usado: 'silero' ou 'energy')
+    """
+    duration = len(audio) / sr
+    try:
+        return _merge_regions(_silero_regions(audio, sr), duration), "silero"
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"[VAD] Silero falhou ({e}). Usando VAD de energia...")
+    return _merge_regions(_energy_regions(audio, sr), duration), "energy"
+
+def apply_vad(audio, sr=SAMPLE_RATE):
+    """
+    Mantém só as regiões com fala.
+
+    Returns:
+        (áudio concatenado, spans [(inicio_original, inicio_concatenado, duracao)], estatísticas)
+    """
+    import numpy as np
+
+    total = len(audio) / sr
+    regions, method = detect_speech_regions(audio, sr)
+
+    pieces = []
+    spans = []
+    cursor = 0.0
+    for start, end in regions:
+        a, b = int(start * sr), int(end * sr)
+        if b <= a:
+            continue
+        pieces.append(audio[a:b])
+        spans.append((a / sr, cursor, (b - a) / sr))
+        cursor += (b - a) / sr
+
+    speech_audio = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    stats = {
+        "method": method,
+        "total_seconds": round(total, 2),
+        "speech_seconds": round(cursor, 2),
+        "skipped_seconds": round(total - cursor, 2),
+        "regions": len(spans),
+    }
+    logger.info(
+        f"[VAD] {method}: {len(spans)} região(ões) de fala, "
+        f"{stats['skipped_seconds']:.0f}s de {total:.0f}s pulados"
+    )
+    return speech_audio, spans, stats
+
+def _to_original(t, spans, is_end=False):
+    """Converte um tempo da linha concatenada para a linha do tempo original."""
+    for orig_start, concat_start, length in reversed(spans):
+        # Um fim exatamente na junção pertence à região anterior
+        if t > concat_start or (t == concat_start and not is_end):
+            return orig_start + min(t - concat_start, length)
+    return spans[0][0] if spans else t
+
+def remap_timestamps(result, spans):
+    """Devolve segmentos e palavras do resultado para a linha do tempo original."""
+    if not result or not spans:
+        return result
+
+    for seg in result.get("segments", []):
+        seg["start"] = _to_original(seg["start"], spans)
+        seg["end"] = _to_original(seg["end"], spans, is_end=True)
+        for word in seg.get("words", []):
+            word["start"] = _to_original(word["start"], spans)
+            word["end"] = _to_original(word["end"], spans, is_end=True)
+    return result
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+DOWNLOADER DE VÍDEOS (HTTP)
+Download em faixas paralelas (Range) quando o servidor suporta, com sessão
+HTTP compartilhada (pool de conexões + retries), buffers de 1-4MB e verificação
+de tamanho. Um cache LRU em disco (URL + ETag/Content-Length) faz jobs
+repetidos (retry, outro estilo) pularem o download do mesmo episódio.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "autocortes")
+
+# Faixas paralelas
+DOWNLOAD_WORKERS = int(os.environ.get("AUTOCORTES_DOWNLOAD_WORKERS", "8"))
+MIN_PART_BYTES = 8 * 1024 * 1024
+MIN_PARALLEL_BYTES = 16 * 1024 * 1024
+PART_RETRIES = 3
+
+# Buffers de leitura/escrita
+STREAM_BUFFER_BYTES = 1024 * 1024
+FILE_BUFFER_BYTES = 4 * 1024 * 1024
+
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+# Arquivos do cache em uso por jobs (contagem de referências): o LRU não os remove
+_IN_USE = {}
+_IN_USE_LOCK = threading.Lock()
+
+def get_session():
+    """Sessão HTTP compartilhada (keep-alive, pool do tamanho dos workers, retries)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=("HEAD", "GET"))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(DOWNLOAD_WORKERS, 4), max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSION = session
+        return _SESSION
+
+def get_download_cache_dir():
+    """Diretório do cache de vídeos (AUTOCORTES_CACHE_DIR/downloads)."""
+    return os.path.join(os.environ.get("AUTOCORTES_CACHE_DIR", DEFAULT_CACHE_DIR), "downloads")
+
+def _cache_max_bytes():
+    """Limite do cache (AUTOCORTES_DOWNLOAD_CACHE_MB, padrão 20GB; 0 = desativado)."""
+    return int(float(os.environ.get("AUTOCORTES_DOWNLOAD_CACHE_MB", 20480)) * 1024 * 1024)
+
+# ==================== METADADOS ====================
+
+def probe_url(url):
+    """
+    Lê tamanho, ETag e suporte a Range do recurso.
+
+    Returns:
+        dict com size (ou None), etag (ou None), ranges (bool)
+    """
+    session = get_session()
+    size = etag = None
+    ranges = False
+    try:
+        resp = session.head(url, allow_redirects=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        if resp.ok:
+            size = int(resp.headers["Content-Length"]) if resp.headers.get("Content-Length") else None
+            etag = resp.headers.get("ETag")
+            ranges = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+    except Exception as e:
+        logger.warning(f"[DOWNLOAD] HEAD falhou ({e}). Testando com GET parcial...")
+
+    if size is None or not ranges:
+        # Alguns servidores (URLs pré-assinadas) não respondem HEAD: testa Range 0-0
+        try:
+            with session.get(url, headers={"Range": "bytes=0-0"}, stream=True,
+                             timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+                if resp.status_code == 206:
+                    total = resp.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+                    if total.isdigit():
+                        size = int(total)
+                        ranges = True
+                    etag = etag or resp.headers.get("ETag")
+        except Exception:
+            pass
+
+    return {"size": size, "etag": etag, "ranges": ranges}
+
+def cache_key(url, meta):
+    """
+    Chave do cache: com ETag, URL sem query (URLs pré-assinadas mudam a
+    assinatura) + ETag; sem ETag, URL completa + Content-Length.
+    """
+    if meta.get("etag"):
+        parts = urlsplit(url)
+        base = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+        payload = f"{base}|{meta['etag']}"
+    else:
+        payload = f"{url}|{meta.get('size')}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+# ==================== DOWNLOAD ====================
+
+def _download_single(url, dest_path):
+    """Download em um único stream (servidor sem Range ou arquivo pequeno)."""
+    session = get_session()
+    written = 0
+    with session.get(url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+        resp.raise_for_status()
+        with open(dest_path, "wb", buffering=FILE_BUFFER_BYTES) as f:
+            for chunk in resp.iter_content(chunk_size=STREAM_BUFFER_BYTES):
+                f.write(chunk)
+                written += len(chunk)
+    return written
+
+def _download_part(url, dest_path, start, end):
+    """Baixa a faixa [start, end] e grava no offset correspondente."""
+    session = get_session()
+    expected = end - start + 1
+
+    for attempt in range(1, PART_RETRIES + 1):
+        written = 0
+        try:
+            with session.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True,
+                             timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+                if resp.status_code != 206:
+                    raise RuntimeError(f"servidor respondeu {resp.status_code} a uma requisição Range")
+                with open(dest_path, "r+b", buffering=FILE_BUFFER_BYTES) as f:
+                    f.seek(start)
+                    for chunk in resp.iter_content(chunk_size=STREAM_BUFFER_BYTES):
+                        f.write(chunk[:expected - written])
+                        written += len(chunk)
+                        if written >= expected:
+                            break
+            if written >= expected:
+                return expected
+            raise RuntimeError(f"faixa incompleta ({written}/{expected} bytes)")
+        except Exception as e:
+            if attempt == PART_RETRIES:
+                raise
+            logger.warning(f"[DOWNLOAD] Faixa {start}-{end} falhou ({e}). Tentativa {attempt + 1}/{PART_RETRIES}...")
+
+def _download_ranges(url, dest_path, size, workers):
+    """Download em faixas paralelas num arquivo pré-alocado."""
+    part = max(MIN_PART_BYTES, -(-size // workers))
+    ranges = [(start, min(start + part, size) - 1) for start in range(0, size, part)]
+
+    with open(dest_path, "wb") as f:
+        f.truncate(size)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        futures = [pool.submit(_download_part, url, dest_path, start, end) for start, end in ranges]
+        return sum(f.result() for f in futures)
+
+def download_file(url, dest_path, meta=None, workers=None):
+    """
+    Baixa `url` para `dest_path` (faixas paralelas quando possível).
+
+    Raises:
+        RuntimeError: se o tamanho final não bater com o Content-Length
+    """
+    meta = meta or probe_url(url)
+    workers = workers or DOWNLOAD_WORKERS
+    size = meta.get("size")
+
+    start = time.perf_counter()
+    if meta.get("ranges") and size and size >= MIN_PARALLEL_BYTES and workers > 1:
+        try:
+            _download_ranges(url, dest_path, size, workers)
+            mode = f"{workers} faixas"
+        except Exception as e:
+            logger.warning(f"[DOWNLOAD] Download em faixas falhou ({e}). Usando stream único...")
+            _download_single(url, dest_path)
+            mode = "stream único"
+    else:
+        _download_single(url, dest_path)
+        mode = "stream único"
+
+    final_size = os.path.getsize(dest_path)
+    if size is not None and final_size != size:
+        os.remove(dest_path)
+        raise RuntimeError(f"Download incompleto: {final_size} de {size} bytes")
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"[DOWNLOAD] {final_size / 1024**2:.1f}MB em {elapsed:.1f}s "
+        f"({final_size / 1024**2 / max(elapsed, 1e-6):.1f}MB/s, {mode})"
+    )
+    return dest_path
+
+# ==================== CACHE LRU ====================
+
+def _acquire(path):
+    with _IN_USE_LOCK:
+        _IN_USE[path] = _IN_USE.get(path, 0) + 1
+
+def _release(path):
+    with _IN_USE_LOCK:
+        count = _IN_USE.get(path, 0) - 1
+        if count > 0:
+            _IN_USE[path] = count
+        else:
+            _IN_USE.pop(path, None)
+
+def in_use(path):
+    """True se algum job ainda não liberou o arquivo (discard_download)."""
+    with _IN_USE_LOCK:
+        return path in _IN_USE
+
+def _evict_cache(cache_dir, max_bytes, keep=None):
+    """Remove os vídeos menos usados até caber em max_bytes (nunca os que estão em uso)."""
+    entries = []
+    total = 0
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if name.endswith(".tmp") or not os.path.isfile(full):
+            continue
+        st = os.stat(full)
+        entries.append((st.st_mtime, st.st_size, full))
+        total += st.st_size
+
+    for _, size, full in sorted(entries):
+        if total <= max_bytes:
+            break
+        if full == keep:
+            continue
+        # Checagem e remoção sob o lock: nenhum job adquire o arquivo no meio
+        with _IN_USE_LOCK:
+            if full in _IN_USE:
+                continue
+            try:
+                os.remove(full)
+            except OSError:
+                continue
+        total -= size
+        logger.info(f"[DOWNLOAD] Cache: removido (LRU) {os.path.basename(full)}")
+
+def cached_path(url, suffix=".mp4", meta=None):
+    """Caminho do vídeo no cache, se já estiver baixado (senão None)."""
+    if _cache_max_bytes() <= 0:
+        return None
+    meta = meta or probe_url(url)
+    if meta.get("size") is None and not meta.get("etag"):
+        return None
+    path = os.path.join(get_download_cache_dir(), f"{cache_key(url, meta)}{suffix}")
+    if os.path.exists(path) and (meta.get("size") is None or os.path.getsize(path) == meta["size"]):
+        return path
+    return None
+
+def download(url, suffix=".mp4"):
+    """
+    Baixa o vídeo (ou reaproveita do cache) e retorna o caminho local.
+    Depois do uso, chame discard_download(path): arquivos do cache ficam,
+    mas só voltam a ser candidatos ao LRU quando todos os jobs os liberam.
+    """
+    import tempfile
+
+    meta = probe_url(url)
+    max_bytes = _cache_max_bytes()
+
+    if max_bytes <= 0 or (meta.get("size") is None and not meta.get("etag")):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            return download_file(url, path, meta)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+    cache_dir = get_download_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{cache_key(url, meta)}{suffix}")
+
+    # Marca o uso antes de checar o cache: outro job não o despeja no meio
+    _acquire(path)
+    if cached_path(url, suffix, meta):
+        os.utime(path, None)
+        logger.info(f"[DOWNLOAD] Cache hit: {os.path.basename(path)} ({os.path.getsize(path) / 1024**2:.1f}MB)")
+        return path
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        download_file(url, tmp_path, meta)
+        os.replace(tmp_path, path)
+    except Exception:
+        _release(path)
+        raise
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    _evict_cache(cache_dir, max_bytes, keep=path)
+    return path
+
+def discard_download(path):
+    """Remove o arquivo baixado; se ele pertencer ao cache, só libera o uso."""
+    cache_dir = os.path.abspath(get_download_cache_dir())
+    if os.path.abspath(path).startswith(cache_dir + os.sep):
+        _release(path)
+        return
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+CACHE DE JOBS POR ESTÁGIO (ENDEREÇADO POR CONTEÚDO)
+Jobs idênticos (retries, envios duplicados, testes A/B de estilo) reaproveitam
+o trabalho já feito. Cada estágio tem sua entrada, com chave encadeada:
+
+    transcript = fingerprint do vídeo + modelo/backend/opções do STT
+    segments   = transcript + modo
+    titles     = segments + nome do anime + usar_ia
+    clips      = titles + config de estilo normalizada
+
+Um job reaproveita o maior prefixo de estágios em cache e recalcula só o que
+mudou (ex.: outro estilo de legenda só renderiza de novo). Entradas ficam em
+AUTOCORTES_CACHE_DIR/jobs, com limite de tamanho (LRU) e idade máxima.
+"""
+
+import os
+import json
+import gzip
+import time
+import shutil
+import hashlib
+import logging
+import threading
+
+from .ai_services.transcript_cache import get_cache_root, fingerprint_file
+
+logger = logging.getLogger(__name__)
+
+# Chaves da config que afetam os títulos; o resto afeta só a renderização
+TITLE_CONFIG_KEYS = ("usar_ia",)
+
+def _digest(*parts):
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def normalize_config(config):
+    """
+    Config canônica para a chave: ordem das chaves, None, caixa das cores e
+    precisão de floats não mudam o resultado. O template entra por conteúdo
+    (tamanho + mtime), não só pelo caminho.
+    """
+    normalized = {}
+    for key, value in (config or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, str) and value.startswith("#"):
+            value = value.lower()
+        elif isinstance(value, float):
+            value = round(value, 4)
+            if value.is_integer():
+                value = int(value)
+        normalized[key] = value
+
+    template = normalized.get("template_path")
+    if template and os.path.isfile(template):
+        st = os.stat(template)
+        normalized["template_path"] = f"{template}|{st.st_size}|{int(st.st_mtime)}"
+    return normalized
+
+class JobCache:
+    """Cache em disco dos estágios de um job, com limite de tamanho e idade."""
+
+    def __init__(self, cache_dir=None, max_mb=None, max_age_hours=None):
+        if max_mb is None:
+            max_mb = float(os.environ.get("AUTOCORTES_JOB_CACHE_MB", 10240))
+        if max_age_hours is None:
+            max_age_hours = float(os.environ.get("AUTOCORTES_JOB_CACHE_MAX_AGE_HOURS", 72))
+
+        self.cache_dir = cache_dir or os.path.join(get_cache_root(), "jobs")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def stage_keys(self, fingerprint, mode, config, anime_name=None, cuts=None, stt=None):
+        """
+        Chaves encadeadas de cada estágio: a chave de um estágio inclui a do
+        anterior, então um acerto implica que todo o prefixo é o mesmo.
+        No modo manual, os cortes pedidos entram no lugar dos segmentos.
+        `stt` (modelo, backend, VAD, word_timestamps) separa transcrições
+        feitas com outro STT do mesmo vídeo.
+        """
+        config = normalize_config(config)
+        title_config = {k: v for k, v in config.items() if k in TITLE_CONFIG_KEYS}
+        render_config = {k: v for k, v in config.items() if k not in TITLE_CONFIG_KEYS}
+
+        keys = {"transcript": _digest("transcript", fingerprint, stt)}
+        keys["segments"] = _digest("segments", keys["transcript"], mode, cuts)
+        keys["titles"] = _digest("titles", keys["segments"], anime_name, title_config)
+        keys["clips"] = _digest("clips", keys["titles"], render_config)
+        return keys
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        """Dados do estágio em cache (ou None); marca o acesso para o LRU."""
+        if not self.enabled:
+            return None
+
+        entry = self.entry_dir(key)
+        meta_path = os.path.join(entry, "data.json.gz")
+        try:
+            if time.time() - os.path.getmtime(entry) > self.max_age_seconds:
+                self._remove(entry)
+                return None
+            with gzip.open(meta_path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(entry, None)
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"[JOBCACHE] Entrada corrompida removida ({e}): {entry}")
+            self._remove(entry)
+            return None
+
+    def put(self, key, data, files=None):
+        """
+        Grava o estágio (diretório temporário + rename atômico). `files`
+        ({nome: caminho}) são copiados para a entrada (hardlink quando possível).
+        """
+        if not self.enabled:
+            return
+
+        entry = self.entry_dir(key)
+        tmp_entry = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp_entry, exist_ok=True)
+            for name, path in (files or {}).items():
+                dest = os.path.join(tmp_entry, name)
+                try:
+                    os.link(path, dest)
+                except OSError:
+                    shutil.copyfile(path, dest)
+            with gzip.open(os.path.join(tmp_entry, "data.json.gz"), "wt", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            self._remove(entry)
+            os.replace(tmp_entry, entry)
+        except Exception as e:
+            logger.warning(f"[JOBCACHE] Falha ao gravar estágio: {e}")
+            self._remove(tmp_entry)
+            return
+
+        self._evict(keep=entry)
+
+    def file_path(self, key, name):
+        """Caminho de um arquivo guardado na entrada do estágio."""
+        return os.path.join(self.entry_dir(key), name)
+
+    def _remove(self, entry):
+        shutil.rmtree(entry, ignore_errors=True)
+
+    def _evict(self, keep=None):
+        """Remove entradas vencidas e, depois, as menos acessadas até caber em max_bytes."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for root, dirs, _ in os.walk(self.cache_dir):
+                if root != self.cache_dir:
+                    for name in dirs:
+                        full = os.path.join(root, name)
+                        if name.endswith(".tmp"):
+                            continue
+                        try:
+                            mtime = os.path.getmtime(full)
+                            size = sum(
+                                os.path.getsize(os.path.join(full, f)) for f in os.listdir(full)
+                            )
+                        except OSError:
+                            continue
+                        if now - mtime > self.max_age_seconds and full != keep:
+                            self._remove(full)
+                            continue
+                        entries.append((mtime, size, full))
+                        total += size
+                    dirs[:] = []
+
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if full == keep:
+                    continue
+                self._remove(full)
+                total -= size
+                logger.info(f"[JOBCACHE] Removido (LRU): {os.path.basename(full)[:12]}")
+
+class JobStages:
+    """
+    Estágios de um job: consulta em ordem e para no primeiro erro de cache
+    (maior prefixo reaproveitável). `report` registra hit/miss por estágio.
+    """
+
+    def __init__(self, cache, keys):
+        self.cache = cache
+        self.keys = keys
+        self.report = {}
+        self._missed = False
+
+    def get(self, stage):
+        data = None
+        if not self._missed:
+            data = self.cache.get(self.keys[stage])
+        self._missed = data is None
+        self.report[stage] = "miss" if data is None else "hit"
+        return data
+
+    def put(self, stage, data, files=None):
+        self.cache.put(self.keys[stage], data, files)
+
+    def file_path(self, stage, name):
+        return self.cache.file_path(self.keys[stage], name)
+
+    def invalidate(self, stage):
+        """Marca um estágio lido como inválido (ex.: arquivo faltando)."""
+        self._missed = True
+        self.report[stage] = "miss"
+
+    @property
+    def enabled(self):
+        return self.cache.enabled
+
+_JOB_CACHE = None
+
+def get_job_cache():
+    """Instância compartilhada do cache de jobs."""
+    global _JOB_CACHE
+    if _JOB_CACHE is None:
+        _JOB_CACHE = JobCache()
+    return _JOB_CACHE
+
+def open_job(video_path, mode, config, anime_name=None, cuts=None, stt=None):
+    """
+    Estágios do job para o vídeo baixado (fingerprint amostrado do arquivo).
+    `stt`: configuração da transcrição (local_ai_service.stt_settings()).
+    """
+    cache = get_job_cache()
+    fingerprint = fingerprint_file(video_path) if cache.enabled else ""
+    return JobStages(cache, cache.stage_keys(fingerprint, mode, config, anime_name, cuts, stt))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+MÉTRICAS POR JOB
+Cada estágio de um job (download, extração de áudio, transcrição, LLM,
+renderização e upload de cada corte) registra tempo de parede, tempo de CPU,
+pico de RSS e, com GPU, pico de VRAM. Também registra se cada modelo estava
+quente (já carregado) ou frio (carregado durante o job) e contadores soltos
+(ex.: acertos do cache do LLM). O bloco `metrics` vai em todas as respostas
+do handler.
+
+O job corrente é propagado por contextvars (asyncio.to_thread copia o
+contexto; pools de threads usam run_in_context). CPU, RSS e VRAM são do
+processo inteiro: com jobs ou cortes simultâneos, estágios sobrepostos
+dividem os mesmos números.
+
+Uso:
+    metrics = start_job()
+    with stage("render", clip=1):
+        ...
+    resposta["metrics"] = metrics.report()
+"""
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de amostragem de RSS/VRAM durante um estágio
+SAMPLE_INTERVAL_SECONDS = 0.05
+
+_CURRENT = contextvars.ContextVar("autocortes_job_metrics", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_mb():
+    """RSS atual do processo em MB (0 se não for possível medir)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 ** 2)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 ** 2)
+    except Exception:
+        return 0.0
+
+def _vram_reader():
+    """Função que lê a VRAM em uso no device (MB), ou None sem GPU/torch."""
+    try:
+        import torch
+        if not torch.cuda.is_available():
+            return None
+    except Exception:
+        return None
+
+    def read():
+        # Uso do device inteiro (inclui CTranslate2/llama.cpp, não só o alocador do torch)
+        free, total = torch.cuda.mem_get_info()
+        return (total - free) / (1024 ** 2)
+    return read
+
+def _cpu_seconds():
+    """CPU do processo + dos filhos já aguardados (ffmpeg)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+class _Sampler:
+    """Thread que acompanha o pico de RSS/VRAM enquanto o estágio roda."""
+
+    def __init__(self, read_vram):
+        self.read_vram = read_vram
+        self.peak_rss = rss_mb()
+        self.peak_vram = self._vram()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def _vram(self):
+        if self.read_vram is None:
+            return None
+        try:
+            return self.read_vram()
+        except Exception:
+            self.read_vram = None
+            return None
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, rss_mb())
+        vram = self._vram()
+        if vram is not None:
+            self.peak_vram = max(self.peak_vram or 0.0, vram)
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL_SECONDS):
+            self._sample()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self._sample()
+
+class JobMetrics:
+    """Estágios e estado dos modelos de um job."""
+
+    _read_vram = None
+    _vram_checked = False
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.models = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        if not JobMetrics._vram_checked:
+            JobMetrics._read_vram = _vram_reader()
+            JobMetrics._vram_checked = True
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Mede um estágio; o registro é gravado mesmo se o estágio falhar."""
+        record = {"stage": name, **labels}
+        sampler = _Sampler(JobMetrics._read_vram)
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        try:
+            yield record
+        except Exception:
+            record["failed"] = True
+            raise
+        finally:
+            sampler.stop()
+            record["wall_s"] = round(time.perf_counter() - wall_start, 3)
+            record["cpu_s"] = round(_cpu_seconds() - cpu_start, 3)
+            record["peak_rss_mb"] = round(sampler.peak_rss)
+            if sampler.peak_vram is not None:
+                record["peak_vram_mb"] = round(sampler.peak_vram)
+            with self._lock:
+                self.stages.append(record)
+
+    def model(self, name, state, wait_s=0.0):
+        """Registra o primeiro uso do modelo no job: 'warm' ou 'cold'."""
+        with self._lock:
+            self.models.setdefault(name, {"state": state, "wait_s": round(wait_s, 3)})
+
+    def count(self, name, amount=1):
+        """Soma `amount` ao contador `name`."""
+        with self._lock:
+            self.counters[name] = round(self.counters.get(name, 0) + amount, 3)
+
+    def report(self):
+        """Bloco `metrics` da resposta."""
+        with self._lock:
+            stages = list(self.stages)
+            models = dict(self.models)
+            counters = dict(self.counters)
+        totals = {}
+        for record in stages:
+            totals[record["stage"]] = round(totals.get(record["stage"], 0.0) + record["wall_s"], 3)
+        return {
+            "total_s": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+            "stage_totals_s": totals,
+            "models": models,
+            "counters": counters,
+            "peak_rss_mb": round(max([rss_mb()] + [r["peak_rss_mb"] for r in stages])),
+        }
+
+def start_job():
+    """Cria as métricas do job e as torna correntes neste contexto."""
+    metrics = JobMetrics()
+    _CURRENT.set(metrics)
+    return metrics
+
+def current():
+    """Métricas do job corrente (ou None fora de um job)."""
+    return _CURRENT.get()
+
+@contextmanager
+def stage(name, **labels):
+    """Mede um estágio do job corrente (sem job corrente, não mede nada)."""
+    metrics = _CURRENT.get()
+    if metrics is None:
+        yield None
+        return
+    with metrics.stage(name, **labels) as record:
+        yield record
+
+def record_model(name, state, wait_s=0.0):
+    """Registra o estado (warm/cold) de um modelo no job corrente."""
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        metrics.model(name, state, wait_s)
+
+def count(name, amount=1):
+    """Soma a um contador do job corrente (sem job corrente, não faz nada)."""
+    metrics = _CURRENT.get()
+    if metrics is not None:
+        metrics.count(name, amount)
+
+def run_in_context(func, *args, **kwargs):
+    """
+    Para pools de threads: submit(run_in_context(func, ...)) devolve uma
+    função que roda func no contexto atual (mantém o job corrente).
+    """
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(func, *args, **kwargs)
@@ -46,13 +46,13 @@ try:
     from ai_services.local_ai_service import (
         transcribe_audio_local, 
         transcribe_audio_batch,
-        manually_unload_whisper,
         generate_viral_title_local,
         generate_viral_title_batch,
-        manually_unload_llama,
         analyze_viral_segments_deepseek,
+        slice_transcript_text,
         is_running_in_colab
     )
+    from ai_services.audio_io import decode_audio_16k, EpisodeAudio
     AI_AVAILABLE = True
 except ImportError as e:
     AI_AVAILABLE = False
@@ -67,6 +67,16 @@ except ImportError:
     sys.path.append(os.path.dirname(__file__))
     from utils_title import criar_titulo_pil
 
+FFMPEG_ENGINE_AVAILABLE = False
+try:
+    try:
+        from modules.AnimeCut.ffmpeg_engine import renderizar_corte_ffmpeg
+    except ImportError:
+        from ffmpeg_engine import renderizar_corte_ffmpeg
+    FFMPEG_ENGINE_AVAILABLE = True
+except Exception as e:
+    logger.warning(f"[FFMPEG] Motor ffmpeg indisponível: {e}")
+
 # ==================== CAMINHOS DINÂMICOS ====================
 
 def get_font_directory():
@@ -87,6 +97,78 @@ FONT_DIR = get_font_directory()
 
 # ==================== ENGINE DE RENDERIZAÇÃO ====================
 
+def gerar_titulo_corte(video_path, inicio, fim, config, status_text=None):
+    """
+    Gera o título viral do corte (Whisper + DeepSeek).
+    Compartilhado pelos motores MoviePy e ffmpeg.
+    
+    Se config["transcricao_segmentos"] tiver os segmentos do episódio inteiro,
+    o diálogo é recortado deles; o Whisper só roda de novo quando não há transcrição,
+    lendo uma fatia do memmap do episódio (config["audio_episodio"]).
+    """
+    if not (config.get("usar_ia") and AI_AVAILABLE):
+        return None
+    
+    if status_text is not None:
+        status_text.text("Gerando Título Viral (DeepSeek)...")
+    
+    titulo_viral = None
+    try:
+        segmentos_episodio = config.get("transcricao_segmentos")
+        
+        if segmentos_episodio:
+            # Reaproveita a transcrição do episódio (sem nova passada do Whisper)
+            duracao_corte = min(fim - inicio, 300)
+            dialogo_text = slice_transcript_text(segmentos_episodio, inicio, inicio + duracao_corte)
+            logger.info(f"[TITULO] Diálogo recortado da transcrição do episódio ({len(dialogo_text)} caracteres)")
+        else:
+            duracao_corte = min(fim - inicio, 300)
+            audio_episodio = config.get("audio_episodio")
+            if audio_episodio and os.path.exists(audio_episodio):
+                # Fatia do memmap do episódio (sem decodificar de novo)
+                audio_corte = EpisodeAudio(audio_episodio).slice(inicio, inicio + duracao_corte)
+            else:
+                # Áudio do corte direto em memória (16 kHz mono), sem WAV temporário
+                audio_corte = decode_audio_16k(video_path, start=inicio, duration=duracao_corte)
+            
+            dialogo_res = transcribe_audio_batch(audio_corte)
+            dialogo_text = dialogo_res['text'] if isinstance(dialogo_res, dict) else dialogo_res
+        
+        if dialogo_text:
+            titulo_viral = generate_viral_title_batch(config.get("nome_anime", "Anime"), dialogo_text)
+            
+            # Limpa memória após gerar título para evitar degradação
+            gc.collect()
+    except Exception as e:
+        print(f"Erro IA Título: {e}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+    
+    return titulo_viral
+
+def _processar_corte_ffmpeg(video_path, inicio, fim, output_dir, numero_corte, config, titulo_viral, status_text):
+    """
+    Renderiza o corte com o motor ffmpeg (filter graph único).
+    Retorna None se falhar, para que o chamador use o motor MoviePy.
+    """
+    if not FFMPEG_ENGINE_AVAILABLE:
+        logger.warning("[FFMPEG] Motor ffmpeg indisponível. Usando MoviePy...")
+        return None
+    
+    filename = f"Corte_{numero_corte:03d}_{int(time.time())}.mp4"
+    output_path = os.path.join(output_dir, filename)
+    
+    status_text.text("Renderizando com ffmpeg (Filter Graph)...")
+    try:
+        renderizar_corte_ffmpeg(video_path, inicio, fim, output_path, config, titulo=titulo_viral)
+        return output_path
+    except Exception as e:
+        logger.warning(f"[FFMPEG] Falhou ({e}). Usando MoviePy...")
+        status_text.warning("⚠ Motor ffmpeg falhou. Usando MoviePy...")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+
 def processar_corte_anime_engine(
     video_path, inicio, fim, 
     output_dir, numero_corte,
@@ -94,6 +176,9 @@ def processar_corte_anime_engine(
 ):
     """
     Motor de renderização V5.0 (NVENC + Anti-Shadowban + DeepSeek).
+    
+    config["render_engine"] = "ffmpeg" renderiza com um único filter graph do ffmpeg
+    (frames não passam pelo Python) e cai para o MoviePy se falhar.
     """
     status_text = st.empty()
     progress_bar = st.progress(0)
@@ -101,6 +186,20 @@ def processar_corte_anime_engine(
     try:
         status_text.text(f"Iniciando corte {numero_corte}...")
         
+        # --- IA (Título) ---
+        titulo_viral = gerar_titulo_corte(video_path, inicio, fim, config, status_text)
+        
+        # --- MOTOR FFMPEG (opcional) ---
+        if config.get("render_engine", "moviepy") == "ffmpeg":
+            output_path = _processar_corte_ffmpeg(
+                video_path, inicio, fim, output_dir, numero_corte, config, titulo_viral, status_text
+            )
+            if output_path:
+                progress_bar.progress(100)
+                status_text.success(f"Salvo: {os.path.basename(output_path)}")
+                gc.collect()
+                return output_path
+        
         with VideoFileClip(video_path) as video:
             duracao_corte = min(fim - inicio, 300)
             clip = video.subclip(inicio, min(inicio + duracao_corte, video.duration))
@@ -110,37 +209,6 @@ def processar_corte_anime_engine(
                 status_text.text("Aplicando Anti-Shadowban (Speed Ramp)...")
                 clip = clip.fx(speedx, 1.05)
             
-            # --- IA (Título) ---
-            titulo_viral = None
-            if config.get("usar_ia") and AI_AVAILABLE:
-                status_text.text("Gerando Título Viral (DeepSeek)...")
-                try:
-                    fd, temp_audio = tempfile.mkstemp(suffix=".wav")
-                    os.close(fd)
-                    
-                    # Converte para caminho absoluto
-                    temp_audio = os.path.abspath(temp_audio)
-                    
-                    clip.audio.write_audiofile(temp_audio, logger=None)
-                    
-                    dialogo_res = transcribe_audio_batch(temp_audio)
-                    dialogo_text = dialogo_res['text'] if isinstance(dialogo_res, dict) else dialogo_res
-                    
-                    if dialogo_text:
-                        titulo_viral = generate_viral_title_batch(config.get("nome_anime", "Anime"), dialogo_text)
-                        
-                        # Limpa memória após gerar título para evitar degradação
-                        gc.collect()
-                    
-                    # Remove arquivo temporário se existir
-                    if os.path.exists(temp_audio):
-                        os.remove(temp_audio)
-                except Exception as e:
-                    print(f"Erro IA Título: {e}")
-                    import traceback
-                    print(f"Traceback: {traceback.format_exc()}")
-
-            
             # --- COMPOSIÇÃO ---
             target_w, target_h = 1080, 1920
             
@@ -296,6 +364,10 @@ def main():
     if 'cortes' not in st.session_state:
         st.session_state.cortes = []
     
+    # Transcrição do episódio inteiro (reutilizada nos títulos de cada corte)
+    if 'transcricao' not in st.session_state:
+        st.session_state.transcricao = {"video_id": None, "segments": []}
+    
     # --- SIDEBAR ---
     with st.sidebar:
         st.header("Configurações")
@@ -420,6 +492,14 @@ def main():
         st.markdown("---")
         anti_shadowban = st.checkbox("🛡️ Ativar Anti-Shadowban", value=True)
         
+        motor_render = st.radio(
+            "Motor de Renderização",
+            ["FFmpeg (Filter Graph)", "MoviePy (Compatível)"],
+            disabled=not FFMPEG_ENGINE_AVAILABLE,
+            index=0 if FFMPEG_ENGINE_AVAILABLE else 1,
+            help="FFmpeg compõe tudo em um único processo (mais rápido). Se falhar, usa MoviePy."
+        )
+        
         # Checkbox de IA desabilitado se não disponível
         usar_ia = st.checkbox("Gerar Títulos com IA", value=AI_AVAILABLE, disabled=not AI_AVAILABLE)
         if not AI_AVAILABLE:
@@ -433,6 +513,11 @@ def main():
         tfile.write(uploaded_video.read())
         video_path = tfile.name
         
+        # Descarta transcrição de outro episódio
+        video_id = f"{uploaded_video.name}:{uploaded_video.size}"
+        if st.session_state.transcricao.get("video_id") != video_id:
+            st.session_state.transcricao = {"video_id": video_id, "segments": []}
+        
         try:
             clip_info = VideoFileClip(video_path)
             duration = clip_info.duration
@@ -467,12 +552,8 @@ def main():
                             status_text.info("🎵 **Etapa 1/3:** Extraindo áudio do vídeo...")
                             progress_bar.progress(5)
                             
-                            fd, temp_audio_full = tempfile.mkstemp(suffix=".wav")
-                            os.close(fd)
-                            temp_audio_full = os.path.abspath(temp_audio_full)
-                            
-                            with VideoFileClip(video_path) as v:
-                                v.audio.write_audiofile(temp_audio_full, logger=None)
+                            # Decodifica UMA vez para o memmap 16 kHz do episódio (reaproveitado pelos cortes)
+                            audio_episodio = EpisodeAudio.from_media(video_path)
                             
                             progress_bar.progress(20)
                             status_text.success("✅ Áudio extraído com sucesso!")
@@ -482,9 +563,19 @@ def main():
                             status_text.info("🎤 **Etapa 2/3:** Transcrevendo áudio (pode levar 1-2 minutos)...")
                             progress_bar.progress(25)
                             
-                            res_whisper = transcribe_audio_local(temp_audio_full)
+                            try:
+                                res_whisper = transcribe_audio_local(audio_episodio.samples)
+                            finally:
+                                # Só a transcrição usa o memmap: remove já do diretório de trabalho
+                                audio_episodio.close(remove=True)
                             
                             if res_whisper:
+                                # Guarda os segmentos (com timestamps) para os títulos de cada corte
+                                st.session_state.transcricao = {
+                                    "video_id": video_id,
+                                    "segments": res_whisper.get('segments', [])
+                                }
+                                
                                 progress_bar.progress(60)
                                 status_text.success(f"✅ Transcrição concluída! {len(res_whisper.get('text', ''))} caracteres processados.")
                                 time.sleep(0.5)
@@ -529,7 +620,10 @@ def main():
                                 
                                 try:
                                     # Chama DeepSeek (pode demorar)
-                                    segments = analyze_viral_segments_deepseek(res_whisper['text'], duration)
+                                    segments = analyze_viral_segments_deepseek(
+                                        res_whisper['text'], duration,
+                                        segments=res_whisper.get('segments')
+                                    )
                                 finally:
                                     # Para thread de progresso
                                     analysis_done.set()
@@ -543,23 +637,20 @@ def main():
                                     st.success(f"✅ DeepSeek identificou {len(segments)} momentos virais!")
                                     st.info("📋 Role para baixo para ver a lista de cortes e iniciar a renderização.")
                                     
-                                    # LIMPEZA COMPLETA antes de renderização
+                                    # LIMPEZA antes de renderização
+                                    # (Whisper/DeepSeek ficam residentes; o registro de modelos
+                                    # só os despeja se o orçamento de memória for excedido)
                                     status_text.info("🧹 Liberando recursos antes da renderização...")
                                     
-                                    # 1. Descarrega modelos de IA
-                                    if AI_AVAILABLE:
-                                        manually_unload_whisper()  # Descarrega Whisper (GPU)
-                                        manually_unload_llama()    # Descarrega DeepSeek (CPU)
-                                    
-                                    # 2. Limpa RAM
+                                    # 1. Limpa RAM
                                     gc.collect()
                                     
-                                    # 3. Limpa VRAM
+                                    # 2. Limpa VRAM
                                     if torch.cuda.is_available():
                                         torch.cuda.empty_cache()
                                         torch.cuda.synchronize()
                                     
-                                    # 4. Pausa para SO liberar recursos
+                                    # 3. Pausa para SO liberar recursos
                                     time.sleep(2)
                                     
                                     status_text.success("✅ Recursos liberados! Pronto para renderização.")
@@ -579,11 +670,6 @@ def main():
                             progress_bar.progress(0)
                             status_text.error(f"❌ Erro durante o processamento: {str(e)}")
                             st.error(f"Erro: {e}")
-                        
-                        finally:
-                            # Remove arquivo temporário
-                            if 'temp_audio_full' in locals() and os.path.exists(temp_audio_full):
-                                os.remove(temp_audio_full)
 
             # --- LISTA E RENDERIZAÇÃO ---
             if st.session_state.cortes:
@@ -593,23 +679,19 @@ def main():
                 st.table(df_data)
                 
                 if st.button("🚀 INICIAR RENDERIZAÇÃO EM MASSA (NVENC)", type="primary"):
-                    # LIMPEZA COMPLETA antes de iniciar renderização
+                    # LIMPEZA antes de iniciar renderização
+                    # (modelos de IA ficam residentes para os títulos; despejo por LRU sob pressão)
                     st.info("🧹 Liberando recursos antes de iniciar...")
                     
-                    # 1. Descarrega modelos de IA
-                    if AI_AVAILABLE:
-                        manually_unload_whisper()  # Descarrega Whisper (GPU)
-                        manually_unload_llama()    # Descarrega DeepSeek (CPU)
-                    
-                    # 2. Limpa RAM
+                    # 1. Limpa RAM
                     gc.collect()
                     
-                    # 3. Limpa VRAM
+                    # 2. Limpa VRAM
                     if torch.cuda.is_available():
                         torch.cuda.empty_cache()
                         torch.cuda.synchronize()
                     
-                    # 4. Pausa para SO liberar recursos
+                    # 3. Pausa para SO liberar recursos
                     time.sleep(2)
                     
                     st.success("✅ Recursos liberados! Iniciando renderização...")
@@ -628,9 +710,22 @@ def main():
                         "stroke_color": stroke_color,
                         "stroke_width": stroke_width,
                         "pos_vertical": pos_vertical,
-                        "template_path": template_path
+                        "template_path": template_path,
+                        "render_engine": "ffmpeg" if motor_render.startswith("FFmpeg") else "moviepy",
+                        "transcricao_segmentos": st.session_state.transcricao.get("segments", []),
+                        "audio_episodio": None
                     }
                     
+                    # Sem transcrição do episódio: decodifica o áudio UMA vez e cada
+                    # corte lê sua fatia do memmap (em vez de decodificar por corte)
+                    episodio = None
+                    if usar_ia and AI_AVAILABLE and not config["transcricao_segmentos"]:
+                        try:
+                            episodio = EpisodeAudio.from_media(video_path)
+                            config["audio_episodio"] = episodio.path
+                        except Exception as e:
+                            logger.warning(f"[AUDIO] Memmap do episódio indisponível ({e}). Decodificando por corte...")
+                    
                     results = []
                     
                     # Feedback visual para renderização
@@ -642,61 +737,60 @@ def main():
                     
                     total_clips = len(st.session_state.cortes)
                     
-                    for i, corte in enumerate(st.session_state.cortes):
-                        clip_num = i + 1
+                    try:
+                        for i, corte in enumerate(st.session_state.cortes):
+                            clip_num = i + 1
                         
-                        # MEMORY WALL: Limpa memória ANTES de cada clip
-                        gc.collect()
-                        if torch.cuda.is_available():
-                            torch.cuda.empty_cache()
-                        time.sleep(0.5)  # Pequena pausa para o SO liberar recursos
+                            # MEMORY WALL: Limpa memória ANTES de cada clip
+                            gc.collect()
+                            if torch.cuda.is_available():
+                                torch.cuda.empty_cache()
+                            time.sleep(0.5)  # Pequena pausa para o SO liberar recursos
                         
-                        # Atualiza status do clip atual
-                        status_render.info(f"🎥 **Processando Clip {clip_num}/{total_clips}** ({corte['start']:.1f}s - {corte['end']:.1f}s)")
+                            # Atualiza status do clip atual
+                            status_render.info(f"🎥 **Processando Clip {clip_num}/{total_clips}** ({corte['start']:.1f}s - {corte['end']:.1f}s)")
                         
-                        # Mostra sub-etapas
-                        with clip_status.container():
-                            st.write(f"**Clip {clip_num}:**")
-                            sub_col1, sub_col2, sub_col3 = st.columns(3)
-                            with sub_col1:
-                                st.caption("⏳ Extraindo...")
-                            with sub_col2:
-                                if usar_ia:
-                                    st.caption("⏳ Gerando título...")
-                            with sub_col3:
-                                st.caption("⏳ Renderizando...")
-                        
-                        # Feedback: Iniciando renderização
-                        st.toast(f"Iniciando renderização do Corte {clip_num}...", icon="🎬")
-                        
-                        # Processa o clip
-                        res = processar_corte_anime_engine(
-                            video_path, corte['start'], corte['end'],
-                            output_dir, clip_num, config
-                        )
-                        
-                        if res:
-                            results.append(res)
-                            # Atualiza para concluído
+                            # Mostra sub-etapas
                             with clip_status.container():
                                 st.write(f"**Clip {clip_num}:**")
                                 sub_col1, sub_col2, sub_col3 = st.columns(3)
                                 with sub_col1:
-                                    st.caption("✅ Extraído")
+                                    st.caption("⏳ Extraindo...")
                                 with sub_col2:
                                     if usar_ia:
-                                        st.caption("✅ Título gerado")
+                                        st.caption("⏳ Gerando título...")
                                 with sub_col3:
-                                    st.caption("✅ Renderizado")
+                                    st.caption("⏳ Renderizando...")
                         
-                        # Atualiza barra de progresso
-                        progress_bar_render.progress((clip_num) / total_clips)
-                    
-                    # Descarrega os modelos após processar todos os clips
-                    if usar_ia and AI_AVAILABLE:
-                        status_render.info("🧹 Liberando recursos...")
-                        manually_unload_whisper()  # Descarrega Whisper
-                        manually_unload_llama()    # Descarrega DeepSeek
+                            # Feedback: Iniciando renderização
+                            st.toast(f"Iniciando renderização do Corte {clip_num}...", icon="🎬")
+                        
+                            # Processa o clip
+                            res = processar_corte_anime_engine(
+                                video_path, corte['start'], corte['end'],
+                                output_dir, clip_num, config
+                            )
+                        
+                            if res:
+                                results.append(res)
+                                # Atualiza para concluído
+                                with clip_status.container():
+                                    st.write(f"**Clip {clip_num}:**")
+                                    sub_col1, sub_col2, sub_col3 = st.columns(3)
+                                    with sub_col1:
+                                        st.caption("✅ Extraído")
+                                    with sub_col2:
+                                        if usar_ia:
+                                            st.caption("✅ Título gerado")
+                                    with sub_col3:
+                                        st.caption("✅ Renderizado")
+                        
+                            # Atualiza barra de progresso
+                            progress_bar_render.progress((clip_num) / total_clips)
+                    finally:
+                        # Remove o memmap do episódio do diretório de trabalho
+                        if episodio is not None:
+                            episodio.close(remove=True)
                     
                     # Finalização
                     progress_bar_render.progress(100)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+MOTOR FFMPEG (FILTER GRAPH) - AnimeCut
+Renderiza um corte inteiro em uma única chamada do ffmpeg: seek do subclip,
+escala/pad para 1080x1920, overlay do template e do título (PNG), speed ramp
+anti-shadowban (setpts/atempo) e filtros de ruído/contraste.
+
+Ao contrário do CompositeVideoClip do MoviePy, os frames nunca passam pelo Python.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import subprocess
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+try:
+    from modules.AnimeCut.utils_title import salvar_titulo_png
+except ImportError:
+    sys.path.append(os.path.dirname(__file__))
+    from utils_title import salvar_titulo_png
+
+# Localização do ffmpeg compartilhada com a decodificação de áudio (core)
+try:
+    from core.ai_services.audio_io import get_ffmpeg_binary
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'core'))
+    from ai_services.audio_io import get_ffmpeg_binary
+
+# ==================== CONSTANTES ====================
+
+TARGET_W, TARGET_H = 1080, 1920
+
+# Mesma cor do ColorClip usado no motor MoviePy (20, 10, 40)
+COR_FUNDO_PADRAO = "0x140a28"
+
+# Limite de duração de um corte (igual ao motor MoviePy)
+DURACAO_MAXIMA_CORTE = 300
+
+# Anti-shadowban
+VELOCIDADE_ANTI_SHADOWBAN = 1.05
+FILTRO_ANTI_SHADOWBAN = "noise=alls=1:allf=t,eq=contrast=1.02"
+
+# Parâmetros de encoder (espelham os do motor MoviePy)
+PARAMS_NVENC = [
+    '-c:v', 'h264_nvenc',
+    '-preset', 'fast',
+    '-profile:v', 'high',
+    '-level', '4.1',
+    '-rc:v', 'vbr',
+    '-cq:v', '23',
+    '-b:v', '5M',
+    '-maxrate:v', '8M',
+    '-bufsize:v', '10M',
+]
+
+PARAMS_LIBX264 = [
+    '-c:v', 'libx264',
+    '-preset', 'ultrafast',
+    '-profile:v', 'high',
+    '-level', '4.1',
+    '-crf', '23',
+]
+
+PARAMS_AUDIO = ['-c:a', 'aac', '-b:a', '192k']
+
+# ==================== BINÁRIOS ====================
+
+def probe_video(video_path):
+    """
+    Lê duração, resolução, FPS e presença de áudio do vídeo.
+    Usa ffprobe; se não estiver disponível, cai para o MoviePy.
+
+    Returns:
+        dict com duration, width, height, fps, has_audio
+    """
+    ffprobe_bin = shutil.which("ffprobe")
+    if ffprobe_bin:
+        cmd = [
+            ffprobe_bin, '-v', 'error',
+            '-show_entries', 'format=duration:stream=codec_type,width,height,avg_frame_rate',
+            '-of', 'json', video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode == 0:
+            data = json.loads(result.stdout or "{}")
+            streams = data.get("streams", [])
+            video_stream = next((s for s in streams if s.get("codec_type") == "video"), {})
+
+            fps = 30.0
+            rate = video_stream.get("avg_frame_rate", "0/0")
+            try:
+                num, den = rate.split("/")
+                if float(den) > 0 and float(num) > 0:
+                    fps = float(num) / float(den)
+            except ValueError:
+                pass
+
+            return {
+                "duration": float(data.get("format", {}).get("duration", 0.0)),
+                "width": int(video_stream.get("width", 0)),
+                "height": int(video_stream.get("height", 0)),
+                "fps": fps,
+                "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+            }
+        logger.warning(f"[FFMPEG] ffprobe falhou ({result.stderr.strip()[:200]}). Usando MoviePy...")
+
+    from moviepy.editor import VideoFileClip
+    with VideoFileClip(video_path) as video:
+        return {
+            "duration": float(video.duration),
+            "width": int(video.w),
+            "height": int(video.h),
+            "fps": float(video.fps or 30.0),
+            "has_audio": video.audio is not None,
+        }
+
+# ==================== FILTER GRAPH ====================
+
+def montar_filter_complex(config, tem_audio=True, tem_titulo=False, fps=30.0):
+    """
+    Traduz o dict `config` do AnimeCut em um filter_complex do ffmpeg.
+
+    Entradas esperadas: [0] vídeo (já com seek), [1] fundo (template ou cor),
+    [2] PNG do título (opcional).
+
+    Returns:
+        (filter_complex, label_video, label_audio ou None)
+    """
+    anti_shadowban = bool(config.get("anti_shadowban"))
+    pos_y = int(TARGET_H * config.get("pos_vertical", 0.15))
+
+    filtros = []
+
+    # Fundo (template esticado para 1080x1920, como no PIL resize do motor MoviePy)
+    filtros.append(f"[1:v]scale={TARGET_W}:{TARGET_H},setsar=1,fps={fps:.3f}[bg]")
+
+    # Vídeo: largura 1080 (mesmo "fit" do motor MoviePy), centralizado verticalmente
+    cadeia_video = "[0:v]setpts=PTS-STARTPTS"
+    if anti_shadowban:
+        cadeia_video += f",setpts=PTS/{VELOCIDADE_ANTI_SHADOWBAN}"
+    cadeia_video += f",scale={TARGET_W}:-2,setsar=1[vid]"
+    filtros.append(cadeia_video)
+    filtros.append("[bg][vid]overlay=(W-w)/2:(H-h)/2:shortest=1[base]")
+
+    label_atual = "base"
+
+    # Título (PNG transparente com a largura do vídeo)
+    if tem_titulo:
+        filtros.append(f"[{label_atual}][2:v]overlay=0:{pos_y}:shortest=1[tit]")
+        label_atual = "tit"
+
+    # Anti-shadowban: ruído + contraste
+    cadeia_final = f"[{label_atual}]"
+    if anti_shadowban:
+        cadeia_final += f"{FILTRO_ANTI_SHADOWBAN},"
+    cadeia_final += "format=yuv420p[vout]"
+    filtros.append(cadeia_final)
+
+    label_audio = None
+    if tem_audio:
+        cadeia_audio = "[0:a]asetpts=PTS-STARTPTS"
+        if anti_shadowban:
+            cadeia_audio += f",atempo={VELOCIDADE_ANTI_SHADOWBAN}"
+        filtros.append(cadeia_audio + "[aout]")
+        label_audio = "[aout]"
+
+    return ";".join(filtros), "[vout]", label_audio
+
+def montar_comando_ffmpeg(video_path, inicio, duracao, output_path, config,
+                          titulo_png=None, info=None, encoder="nvenc"):
+    """
+    Monta a linha de comando completa do ffmpeg para um corte.
+
+    Args:
+        video_path: Vídeo de origem
+        inicio: Início do corte (segundos)
+        duracao: Duração do corte na origem (segundos)
+        output_path: MP4 de saída
+        config: Configuração de estilo do AnimeCut
+        titulo_png: PNG do título (None = sem título)
+        info: Resultado de probe_video() (evita um novo probe)
+        encoder: "nvenc" ou "libx264"
+    """
+    info = info or probe_video(video_path)
+    fps = info.get("fps") or 30.0
+
+    duracao_saida = duracao
+    if config.get("anti_shadowban"):
+        duracao_saida = duracao / VELOCIDADE_ANTI_SHADOWBAN
+
+    cmd = [get_ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error']
+
+    # [0] Vídeo com seek rápido (input seeking)
+    cmd += ['-ss', f"{inicio:.3f}", '-t', f"{duracao:.3f}", '-i', video_path]
+
+    # [1] Fundo
+    template_path = config.get("template_path")
+    if template_path and os.path.exists(template_path):
+        cmd += ['-loop', '1', '-framerate', f"{fps:.3f}", '-i', template_path]
+    else:
+        cmd += ['-f', 'lavfi', '-i', f"color=c={COR_FUNDO_PADRAO}:s={TARGET_W}x{TARGET_H}:r={fps:.3f}"]
+
+    # [2] Título
+    if titulo_png:
+        cmd += ['-loop', '1', '-framerate', f"{fps:.3f}", '-i', titulo_png]
+
+    filter_complex, label_video, label_audio = montar_filter_complex(
+        config,
+        tem_audio=info.get("has_audio", True),
+        tem_titulo=bool(titulo_png),
+        fps=fps
+    )
+
+    cmd += ['-filter_complex', filter_complex, '-map', label_video]
+    if label_audio:
+        cmd += ['-map', label_audio] + PARAMS_AUDIO
+
+    cmd += PARAMS_NVENC if encoder == "nvenc" else PARAMS_LIBX264
+    cmd += ['-movflags', '+faststart', '-t', f"{duracao_saida:.3f}", output_path]
+    return cmd
+
+# ==================== RENDERIZAÇÃO ====================
+
+def renderizar_corte_ffmpeg(video_path, inicio, fim, output_path, config, titulo=None, info=None):
+    """
+    Renderiza um corte com um único processo ffmpeg (NVENC com fallback para libx264).
+
+    Args:
+        video_path: Vídeo de origem
+        inicio, fim: Intervalo do corte (segundos)
+        output_path: MP4 de saída
+        config: Configuração de estilo do AnimeCut (mesmas chaves do motor MoviePy)
+        titulo: Título viral já gerado (None = sem título)
+        info: Resultado de probe_video() (opcional)
+
+    Returns:
+        output_path
+
+    Raises:
+        RuntimeError: se ambos os encoders falharem
+    """
+    info = info or probe_video(video_path)
+
+    fim = min(fim, info["duration"]) if info.get("duration") else fim
+    duracao = min(fim - inicio, DURACAO_MAXIMA_CORTE)
+    if duracao <= 0:
+        raise ValueError(f"Intervalo inválido: {inicio}-{fim}")
+
+    titulo_png = None
+    try:
+        if titulo:
+            fd, titulo_png = tempfile.mkstemp(suffix=".png")
+            os.close(fd)
+            salvar_titulo_png(
+                titulo, titulo_png, TARGET_W, TARGET_H,
+                font_filename=config.get("font_filename", "arial.ttf"),
+                font_size=config.get("font_size", None),
+                text_color=config.get("text_color", "#FFFFFF"),
+                stroke_color=config.get("stroke_color", "#000000"),
+                stroke_width=config.get("stroke_width", 6)
+            )
+
+        erro = ""
+        for encoder in ("nvenc", "libx264"):
+            cmd = montar_comando_ffmpeg(
+                video_path, inicio, duracao, output_path, config,
+                titulo_png=titulo_png, info=info, encoder=encoder
+            )
+            logger.info(f"[FFMPEG] Renderizando ({encoder}): {os.path.basename(output_path)}")
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode == 0 and os.path.exists(output_path):
+                logger.info(f"[FFMPEG] Sucesso ({encoder}).")
+                return output_path
+
+            erro = result.stderr.strip()
+            logger.warning(f"[FFMPEG] Encoder {encoder} falhou: {erro[-500:]}")
+
+        raise RuntimeError(f"ffmpeg falhou: {erro[-500:]}")
+    finally:
+        if titulo_png and os.path.exists(titulo_png):
+            os.remove(titulo_png)
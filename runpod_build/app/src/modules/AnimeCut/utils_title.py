@@ -42,28 +42,20 @@ def hex_to_rgb(hex_color):
         except:
             return (255, 255, 255)  # Branco como fallback
 
-def criar_titulo_pil(texto, largura_video, altura_video, duracao, 
-                     font_filename="arial.ttf", 
-                     font_size=None,
-                     text_color="#FFFFFF", 
-                     stroke_color="#000000", 
-                     stroke_width=6,
-                     pos_vertical=0.5):
+def renderizar_titulo_imagem(texto, largura_video, altura_video,
+                             font_filename="arial.ttf",
+                             font_size=None,
+                             text_color="#FFFFFF",
+                             stroke_color="#000000",
+                             stroke_width=6):
     """
-    Renderiza título com configurações dinâmicas de fonte e cor.
-    Compatível com Windows e Google Colab.
+    Desenha o título (máximo 2 linhas, com contorno) em um canvas RGBA transparente.
     
-    Args:
-        texto: Texto do título
-        largura_video: Largura do vídeo em pixels
-        altura_video: Altura do vídeo em pixels
-        duracao: Duração do clip em segundos
-        font_filename: Nome do arquivo de fonte (ex: "Impact.ttf")
-        font_size: Tamanho da fonte (None = automático)
-        text_color: Cor do texto em HEX (ex: "#FFD700") ou RGB tuple
-        stroke_color: Cor do contorno em HEX (ex: "#000000") ou RGB tuple
-        stroke_width: Largura do contorno em pixels
-        pos_vertical: Posição vertical (0.0 = topo, 1.0 = base)
+    O canvas tem a largura do vídeo e 30% da altura; o posicionamento vertical
+    fica a cargo de quem compõe (MoviePy ou overlay do ffmpeg).
+    
+    Returns:
+        PIL.Image em modo RGBA
     """
     
     # Converte cores para RGB se necessário
@@ -158,7 +150,65 @@ def criar_titulo_pil(texto, largura_video, altura_video, duracao,
         except:
             w, h = draw.textsize(linha, font=font)
         y += h + 15
-        
+    
+    return img
+
+def salvar_titulo_png(texto, caminho_png, largura_video, altura_video,
+                      font_filename="arial.ttf",
+                      font_size=None,
+                      text_color="#FFFFFF",
+                      stroke_color="#000000",
+                      stroke_width=6):
+    """
+    Salva o título como PNG transparente (usado pelo motor ffmpeg, que faz o overlay
+    sem passar os frames pelo Python).
+    
+    Returns:
+        Caminho do PNG gerado
+    """
+    img = renderizar_titulo_imagem(
+        texto, largura_video, altura_video,
+        font_filename=font_filename,
+        font_size=font_size,
+        text_color=text_color,
+        stroke_color=stroke_color,
+        stroke_width=stroke_width
+    )
+    img.save(caminho_png, format="PNG")
+    return caminho_png
+
+def criar_titulo_pil(texto, largura_video, altura_video, duracao, 
+                     font_filename="arial.ttf", 
+                     font_size=None,
+                     text_color="#FFFFFF", 
+                     stroke_color="#000000", 
+                     stroke_width=6,
+                     pos_vertical=0.5):
+    """
+    Renderiza título com configurações dinâmicas de fonte e cor.
+    Compatível com Windows e Google Colab.
+    
+    Args:
+        texto: Texto do título
+        largura_video: Largura do vídeo em pixels
+        altura_video: Altura do vídeo em pixels
+        duracao: Duração do clip em segundos
+        font_filename: Nome do arquivo de fonte (ex: "Impact.ttf")
+        font_size: Tamanho da fonte (None = automático)
+        text_color: Cor do texto em HEX (ex: "#FFD700") ou RGB tuple
+        stroke_color: Cor do contorno em HEX (ex: "#000000") ou RGB tuple
+        stroke_width: Largura do contorno em pixels
+        pos_vertical: Posição vertical (0.0 = topo, 1.0 = base)
+    """
+    img = renderizar_titulo_imagem(
+        texto, largura_video, altura_video,
+        font_filename=font_filename,
+        font_size=font_size,
+        text_color=text_color,
+        stroke_color=stroke_color,
+        stroke_width=stroke_width
+    )
+    
     # Converte para MoviePy ImageClip
     numpy_img = np.array(img)
     clip = ImageClip(numpy_img).set_duration(duracao)
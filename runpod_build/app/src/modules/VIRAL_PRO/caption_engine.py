@@ -1,28 +1,35 @@
 import os
+import sys
 import time
-from faster_whisper import WhisperModel
 from moviepy.editor import *
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 
+# Adiciona src ao path para usar o backend de STT compartilhado
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.ai_services.local_ai_service import load_whisper_model, transcribe_audio_batch
+from core.ai_services.audio_io import clip_audio_16k
+
 class CaptionEngine:
-    def __init__(self, model_size="medium", device="cuda"):
-        print(f"🧠 Carregando modelo Whisper ({model_size}) em {device}...")
-        try:
-            self.model = WhisperModel(model_size, device=device, compute_type="float16" if device=="cuda" else "int8")
-        except:
-            print("⚠️ GPU falhou, usando CPU...")
-            self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
+    def __init__(self, model_size=None, device=None):
+        # O modelo é o backend compartilhado do local_ai_service
+        # (AUTOCORTES_WHISPER_MODEL / AUTOCORTES_STT_BACKEND / AUTOCORTES_STT_COMPUTE_TYPE).
+        if model_size or device:
+            print("⚠️ model_size/device ignorados: usando o backend Whisper compartilhado.")
+        # Sem referência própria: a instância fica só no registro, que pode despejá-la
+        print("🧠 Carregando modelo Whisper (backend compartilhado)...")
+        load_whisper_model()
 
-    def transcribe(self, audio_path):
-        segments, info = self.model.transcribe(audio_path, word_timestamps=True, language="pt")
+    def transcribe(self, audio):
+        # audio: caminho ou array float32 16 kHz
+        result = transcribe_audio_batch(audio, word_timestamps=True)
         final_segments = []
-        for segment in segments:
-            for word in segment.words:
+        for segment in (result or {}).get("segments", []):
+            for word in segment.get("words", []):
                 final_segments.append({
-                    "word": word.word.strip(),
-                    "start": word.start,
-                    "end": word.end
+                    "word": word["word"].strip(),
+                    "start": word["start"],
+                    "end": word["end"]
                 })
         return final_segments
 
@@ -52,17 +59,13 @@ class CaptionEngine:
         return np.array(img)
 
     def generate_viral_video(self, video_clip, output_path, font_style="Arial", position_y="center", highlight_color=True):
-        temp_audio = f"temp_audio_{int(time.time())}.wav"
-        video_clip.audio.write_audiofile(temp_audio, verbose=False, logger=None)
-        
         try:
-            words_data = self.transcribe(temp_audio)
+            # Áudio do clip direto em memória (16 kHz mono), sem WAV temporário
+            words_data = self.transcribe(clip_audio_16k(video_clip.audio))
         except Exception as e:
             print(f"Erro na transcrição: {e}")
             words_data = [] # Continua sem legenda se falhar
         
-        if os.path.exists(temp_audio): os.remove(temp_audio)
-        
         text_clips = []
         font_size = 70
         fonts = {"Arial": "arial.ttf", "Impact": "impact.ttf", "Roboto": "arialbd.ttf"}
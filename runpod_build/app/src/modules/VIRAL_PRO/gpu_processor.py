@@ -20,10 +20,13 @@ try:
     import moviepy.editor as mp
     from moviepy.video.fx.all import crop
     import mediapipe as mp_face_detection
-    from faster_whisper import WhisperModel
     
-    # Importa serviço local de IA (Llama 3) para geração de títulos
-    from core.ai_services.local_ai_service import generate_viral_title_local, load_llama_model, unload_llama_model
+    # Importa serviço local de IA (Llama 3 para títulos, backend STT compartilhado para legendas)
+    from core.ai_services.local_ai_service import (
+        generate_viral_title_local, load_llama_model, unload_llama_model,
+        get_whisper_backend, transcribe_audio_batch
+    )
+    from core.ai_services.audio_io import EpisodeAudio
     
     LIBS_AVAILABLE = True
 except ImportError as e:
@@ -47,7 +50,7 @@ class ViralProcessor:
         self.status_callback(formatted_msg)
 
     def _init_models(self):
-        """Inicializa MediaPipe e Whisper na GPU."""
+        """Inicializa MediaPipe e o backend de STT compartilhado."""
         self._log("Inicializando modelos de IA na GPU...")
         
         # MediaPipe Face Detection
@@ -56,13 +59,13 @@ class ViralProcessor:
             min_detection_confidence=0.6
         )
         
-        # Whisper (Tentativa de carregar na GPU)
-        try:
-            self._log("Carregando Whisper (CUDA)...")
-            self.whisper = WhisperModel("medium", device="cuda", compute_type="float16")
-        except Exception:
-            self._log("[AVISO] CUDA não detectado. Fallback para CPU (Lento).")
-            self.whisper = WhisperModel("medium", device="cpu", compute_type="int8")
+        # Whisper: instância única do local_ai_service (sem segunda cópia em memória)
+        self._log("Carregando Whisper (backend compartilhado)...")
+        backend = get_whisper_backend()
+        if backend is not None:
+            self._log(f"Whisper pronto ({backend.name}, {backend.device}, {backend.compute_type}).")
+        else:
+            self._log("[AVISO] Whisper indisponível. Legendas serão ignoradas.")
 
     def detect_face_center(self, frame):
         """Detecta o centro do rosto principal no frame."""
@@ -115,10 +118,17 @@ class ViralProcessor:
 
         return crop(clip, x1=x1, y1=0, width=target_width, height=h)
 
-    def generate_subtitles(self, audio_path):
-        """Transcreve áudio e gera estrutura de legendas."""
-        segments, _ = self.whisper.transcribe(audio_path, language="pt")
-        return [{"start": s.start, "end": s.end, "text": s.text.strip()} for s in segments]
+    def generate_subtitles(self, audio, vad=None):
+        """
+        Transcreve áudio (só as regiões com fala, via VAD) e gera estrutura de legendas.
+        `audio` pode ser um caminho ou um array float32 16 kHz.
+        """
+        result = transcribe_audio_batch(audio, vad=vad)
+        if not result:
+            return []
+        if result.get("vad"):
+            self._log(f"VAD: {result['vad']['skipped_seconds']:.0f}s sem fala pulados de {result['vad']['total_seconds']:.0f}s")
+        return [{"start": s["start"], "end": s["end"], "text": s["text"].strip()} for s in result["segments"]]
 
     def process_video(self, video_path, num_clips=1, clip_duration=60, start_min=0):
         """Pipeline principal de processamento."""
@@ -127,6 +137,7 @@ class ViralProcessor:
             return []
 
         generated_files = []
+        episode_audio = None
         
         try:
             full_clip = mp.VideoFileClip(video_path)
@@ -135,6 +146,9 @@ class ViralProcessor:
             
             self._log(f"Iniciando processamento: {os.path.basename(video_path)}")
             
+            # Áudio do vídeo decodificado UMA vez (memmap 16 kHz); cada clipe lê uma fatia
+            episode_audio = EpisodeAudio.from_media(video_path)
+            
             for i in range(num_clips):
                 clip_start = start_sec + (i * clip_duration)
                 if clip_start >= video_duration:
@@ -158,11 +172,7 @@ class ViralProcessor:
 
                 # 3. Áudio e Legendas
                 self._log("[EMOJI]️ Transcrevendo Áudio (Whisper GPU)...")
-                temp_audio = f"temp_audio_{i}.wav"
-                current_clip.audio.write_audiofile(temp_audio, logger=None)
-                
-                subtitles = self.generate_subtitles(temp_audio)
-                if os.path.exists(temp_audio): os.remove(temp_audio)
+                subtitles = self.generate_subtitles(episode_audio.slice(clip_start, clip_end))
 
                 # 4. Geração de Título Viral (Gemini)
                 self._log("✨ Gerando Título Viral (Gemini AI)...")
@@ -241,6 +251,10 @@ class ViralProcessor:
         except Exception as e:
             self._log(f"[ERRO] Erro Fatal no Pipeline: {traceback.format_exc()}")
             return []
+        finally:
+            # Memmap do episódio (tamanho do áudio inteiro) sai do scratch mesmo com erro
+            if episode_audio is not None:
+                episode_audio.close(remove=True)
 
 # Teste direto
 if __name__ == "__main__":
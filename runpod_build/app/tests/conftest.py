@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Configuração do pytest: handler.py e src/ importáveis como no container."""
+
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+sys.path.insert(0, str(APP_DIR / "src"))
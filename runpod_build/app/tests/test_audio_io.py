@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""EpisodeAudio: fatias sem cópia, loudness e remoção do memmap."""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.ai_services.audio_io import EpisodeAudio
+
+
+@pytest.fixture
+def episodio(tmp_path):
+    path = tmp_path / "ep_16000.f32"
+    samples = np.zeros(10 * 100, dtype=np.float32)
+    samples[200:400] = 0.5  # segundos 2-4 com sinal constante
+    samples.tofile(path)
+    return EpisodeAudio(str(path), sr=100)
+
+
+def test_slice_em_segundos(episodio):
+    assert episodio.duration == 10
+    assert len(episodio.slice(2, 4)) == 200
+    assert len(episodio.slice(8)) == 200
+    assert len(episodio.slice(9, 20)) == 100
+    assert len(episodio.slice(5, 3)) == 0
+
+
+def test_loudness(episodio):
+    assert episodio.loudness(2, 4) == pytest.approx(20 * np.log10(0.5))
+    assert episodio.loudness(0, 2) == float("-inf")
+    assert episodio.loudness(2, 6) == pytest.approx(20 * np.log10(0.5 * 0.5 ** 0.5))
+    assert episodio.loudness(20, 30) == float("-inf")
+
+
+def test_with_remove_o_arquivo(episodio):
+    with episodio as ep:
+        assert ep.slice(2, 3).max() == pytest.approx(0.5)
+    assert not os.path.exists(episodio.path)
+
+
+def test_close_sem_remove_mantem_para_reuso(episodio):
+    episodio.close()
+    assert os.path.exists(episodio.path)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""concurrency_modifier: o limite acompanha a RAM livre (sobe e desce)."""
+
+import pytest
+
+pytest.importorskip("runpod")
+pytest.importorskip("torch")
+
+import handler
+
+
+@pytest.fixture
+def headroom(monkeypatch):
+    monkeypatch.setattr(handler, "MAX_CONCURRENCY", 4)
+    monkeypatch.setattr(handler, "JOB_RAM_HEADROOM_MB", 2048)
+
+
+def test_pouca_ram_reduz_o_limite(monkeypatch, headroom):
+    monkeypatch.setattr(handler, "detect_available_ram_mb", lambda: 3000)
+    assert handler.concurrency_modifier(4) == 1
+
+
+def test_ram_sobrando_respeita_o_teto(monkeypatch, headroom):
+    monkeypatch.setattr(handler, "detect_available_ram_mb", lambda: 64000)
+    assert handler.concurrency_modifier(1) == 4
+
+
+def test_ram_intermediaria(monkeypatch, headroom):
+    monkeypatch.setattr(handler, "detect_available_ram_mb", lambda: 5000)
+    assert handler.concurrency_modifier(4) == 2
+
+
+def test_nunca_abaixo_de_um(monkeypatch, headroom):
+    monkeypatch.setattr(handler, "detect_available_ram_mb", lambda: 100)
+    assert handler.concurrency_modifier(3) == 1
+
+
+def test_ram_desconhecida_usa_o_teto(monkeypatch, headroom):
+    monkeypatch.setattr(handler, "detect_available_ram_mb", lambda: 0)
+    assert handler.concurrency_modifier(2) == 4
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Downloader contra um servidor HTTP local: faixas, cache por ETag e fallback."""
+
+import os
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from core import downloader
+
+PAYLOAD = os.urandom(downloader.MIN_PARALLEL_BYTES + 3 * 1024 * 1024 + 17)
+MD5 = hashlib.md5(PAYLOAD).hexdigest()
+
+
+def _md5(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    ranges = True
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status, length, extra=()):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", f'"{self.path.split("?")[0]}"')
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        for name, value in extra:
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, len(PAYLOAD))
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        self.requests.append(header)
+        if self.path.startswith("/broken/"):
+            self.send_error(403)
+            return
+        if self.ranges and header:
+            start, end = header.split("=", 1)[1].split("-")
+            start, end = int(start), min(int(end), len(PAYLOAD) - 1)
+            self._headers(206, end - start + 1, [("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")])
+            self.wfile.write(PAYLOAD[start:end + 1])
+        else:
+            self._headers(200, len(PAYLOAD))
+            self.wfile.write(PAYLOAD)
+
+
+def _serve(ranges):
+    handler = type("Handler", (_Handler,), {"ranges": ranges, "requests": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOCORTES_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("AUTOCORTES_DOWNLOAD_CACHE_MB", "1024")
+    monkeypatch.setattr(downloader, "DOWNLOAD_WORKERS", 4)
+    return tmp_path
+
+
+@pytest.fixture
+def ranged_server():
+    server, handler = _serve(ranges=True)
+    yield f"http://127.0.0.1:{server.server_port}", handler
+    server.shutdown()
+
+
+@pytest.fixture
+def plain_server():
+    server, handler = _serve(ranges=False)
+    yield f"http://127.0.0.1:{server.server_port}", handler
+    server.shutdown()
+
+
+def test_download_em_faixas_confere_md5(cache_dir, ranged_server):
+    base, handler = ranged_server
+    path = downloader.download(f"{base}/ep1.mp4?sig=a")
+    try:
+        assert _md5(path) == MD5
+        parts = [r for r in handler.requests if r and r != "bytes=0-0"]
+        assert len(parts) > 1
+    finally:
+        downloader.discard_download(path)
+
+
+def test_cache_ignora_a_query_com_etag(cache_dir, ranged_server):
+    base, handler = ranged_server
+    first = downloader.download(f"{base}/ep1.mp4?sig=a")
+    downloader.discard_download(first)
+    gets = len(handler.requests)
+
+    second = downloader.download(f"{base}/ep1.mp4?sig=b&expires=2")
+    downloader.discard_download(second)
+    assert second == first
+    assert len(handler.requests) == gets
+    assert os.path.exists(first)
+
+
+def test_servidor_sem_range_usa_stream_unico(cache_dir, plain_server):
+    base, handler = plain_server
+    path = downloader.download(f"{base}/ep2.mp4")
+    try:
+        assert _md5(path) == MD5
+        assert all(r in (None, "bytes=0-0") for r in handler.requests)
+    finally:
+        downloader.discard_download(path)
+
+
+def test_lru_nao_remove_arquivo_em_uso(cache_dir, ranged_server, monkeypatch):
+    base, _ = ranged_server
+    # Cabe um episódio só: o download de outro despeja o anterior, se estiver livre
+    monkeypatch.setenv("AUTOCORTES_DOWNLOAD_CACHE_MB", str(len(PAYLOAD) * 1.5 / 1024**2))
+
+    busy = downloader.download(f"{base}/ep1.mp4")
+    other = downloader.download(f"{base}/ep2.mp4")
+    assert os.path.exists(busy) and downloader.in_use(busy)
+
+    downloader.discard_download(busy)
+    downloader.discard_download(other)
+    assert not downloader.in_use(busy)
+    third = downloader.download(f"{base}/ep3.mp4")
+    downloader.discard_download(third)
+    assert not os.path.exists(busy)
+
+
+
+def test_falha_sem_cache_nao_deixa_temporario(cache_dir, ranged_server, monkeypatch, tmp_path):
+    base, _ = ranged_server
+    monkeypatch.setenv("AUTOCORTES_DOWNLOAD_CACHE_MB", "0")
+    scratch = tmp_path / "tmp"
+    scratch.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(scratch))
+    with pytest.raises(Exception):
+        downloader.download(f"{base}/broken/ep4.mp4")
+    assert list(scratch.iterdir()) == []
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""Chaves do cache de jobs: a transcrição depende do STT, não só do vídeo."""
+
+from core.job_cache import JobCache
+
+STT = {"model": "faster_whisper:medium:int8", "language": "pt", "word_timestamps": False, "vad": True}
+
+
+def _keys(stt, **kwargs):
+    return JobCache(cache_dir="unused").stage_keys("fp", "auto", {"font_size": 70}, "Anime", stt=stt, **kwargs)
+
+
+def test_mesmo_stt_mesma_chave():
+    assert _keys(dict(STT)) == _keys(dict(STT))
+
+
+def test_outro_stt_invalida_toda_a_cadeia():
+    base = _keys(STT)
+    for change in ({"model": "openai_whisper:large-v3:default"}, {"vad": False}, {"word_timestamps": True}):
+        other = _keys({**STT, **change})
+        assert all(other[stage] != base[stage] for stage in base)
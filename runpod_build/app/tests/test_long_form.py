@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Modo longo: divisão nos silêncios e costura dos chunks."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.ai_services.long_form import SAMPLE_RATE, split_at_silence, stitch_results
+
+
+def _audio_com_pausa(seconds=100, pause_at=47):
+    """Ruído com 1s de silêncio começando em `pause_at`."""
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, seconds * SAMPLE_RATE).astype(np.float32)
+    audio[pause_at * SAMPLE_RATE:(pause_at + 1) * SAMPLE_RATE] = 0
+    return audio
+
+
+def test_corta_no_silencio_perto_da_fronteira():
+    audio = _audio_com_pausa()
+    chunks = split_at_silence(audio, 2)
+    assert len(chunks) == 2
+    (first_offset, first), (second_offset, second) = chunks
+    assert first_offset == 0.0
+    assert 47 <= second_offset <= 48
+    assert len(first) + len(second) == len(audio)
+
+
+def test_um_chunk_ou_audio_vazio():
+    audio = _audio_com_pausa(10, 5)
+    assert split_at_silence(audio, 1)[0][1] is audio
+    assert len(split_at_silence(np.zeros(0, dtype=np.float32), 4)) == 1
+
+
+def test_costura_desloca_segmentos_e_palavras():
+    parts = [
+        (60.0, {"language": "pt", "segments": [
+            {"start": 1.0, "end": 2.0, "text": " tchau", "words": [{"word": " tchau", "start": 1.0, "end": 2.0}]},
+        ]}),
+        (0.0, {"language": "pt", "segments": [{"start": 0.5, "end": 1.5, "text": " oi"}]}),
+        (120.0, None),
+    ]
+    result = stitch_results(parts)
+    assert result["text"] == " oi tchau"
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [(0.5, 1.5), (61.0, 62.0)]
+    assert result["segments"][1]["words"][0]["start"] == 61.0
+    assert parts[0][1]["segments"][0]["start"] == 1.0  # entrada não é alterada
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""ModelRegistry: orçamento, despejo LRU, acquire e reservas."""
+
+from core.ai_services.model_registry import ModelRegistry
+
+
+def _registry(ram_budget_mb=1000):
+    unloaded = []
+    registry = ModelRegistry(ram_budget_mb=ram_budget_mb, vram_budget_mb=0)
+    for name in ("whisper", "llama"):
+        registry.register(name, lambda name=name: object(), ram_mb=600,
+                          unloader=lambda instance, name=name: unloaded.append(name))
+    return registry, unloaded
+
+
+def test_reserva_entra_no_uso_e_despeja_ocioso():
+    registry, unloaded = _registry()
+    registry.get("llama")
+    with registry.reserve("llama-pool", ram_mb=800):
+        assert unloaded == ["llama"]
+        assert registry.usage() == (800.0, 0.0)
+        assert registry.stats()["reservations"] == ["llama-pool"]
+    assert registry.usage() == (0.0, 0.0)
+
+
+def test_reserva_nao_despeja_modelo_em_uso():
+    registry, unloaded = _registry()
+    with registry.acquire("llama") as llm:
+        with registry.reserve("llama-pool", ram_mb=800):
+            assert llm is not None and registry.is_loaded("llama")
+            assert unloaded == []
+
+
+def test_lru_despeja_o_menos_usado_quando_estoura():
+    registry, unloaded = _registry(ram_budget_mb=1300)
+    registry.register("vad", lambda: object(), ram_mb=300)
+    registry.get("vad")
+    registry.get("whisper")
+    registry.get("llama")    # 300 + 600 + 600 > 1300: sai só o LRU ocioso (vad)
+    assert not registry.is_loaded("vad")
+    assert registry.is_loaded("whisper") and registry.is_loaded("llama")
+    assert registry.usage() == (1200.0, 0.0)
+
+    registry.get("whisper")  # whisper vira o mais recente
+    registry.register("grande", lambda: object(), ram_mb=700)
+    registry.get("grande")   # 1200 + 700 > 1300: despeja o LRU (llama), whisper fica
+    assert unloaded == ["llama"]
+    assert registry.usage() == (1300.0, 0.0)
+
+
+def test_modelo_em_uso_nao_e_despejado():
+    registry, unloaded = _registry(ram_budget_mb=1000)
+    with registry.acquire("whisper"):
+        registry.get("llama")
+        assert registry.is_loaded("whisper")
+        registry.unload("whisper")  # adiado: em uso
+        assert registry.is_loaded("whisper")
+    registry.get("whisper")
+    registry.unload("whisper")
+    assert unloaded == ["whisper"]
+
+
+def test_acquire_e_exclusivo_e_reentrante():
+    import threading
+
+    registry, _ = _registry()
+    order = []
+    with registry.acquire("llama") as outer:
+        with registry.acquire("llama") as inner:  # mesma thread: reentrante
+            assert inner is outer
+
+        def other():
+            with registry.acquire("llama"):
+                order.append("other")
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join(timeout=0.2)
+        order.append("owner")
+    thread.join()
+    assert order == ["owner", "other"]
+    assert registry.stats()["models"]["llama"]["in_use"] == 0
+
+
+def test_falha_na_carga_devolve_none():
+    registry = ModelRegistry(ram_budget_mb=1000, vram_budget_mb=0)
+    registry.register("quebrado", lambda: None, ram_mb=100)
+    with registry.acquire("quebrado") as model:
+        assert model is None
+    assert registry.usage() == (0.0, 0.0)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""parse_json_list: respostas cortadas por max_tokens ainda rendem os itens completos."""
+
+from core.ai_services.structured_output import parse_json_list, titles_max_tokens
+
+
+def test_lista_completa():
+    assert parse_json_list('["A", "B"]') == ["A", "B"]
+
+
+def test_titulos_truncados_recuperam_os_completos():
+    text = '["ELE NÃO ESPERAVA ISSO", "O VILÃO VOLTOU!", "A LUTA MAIS ÉPI'
+    assert parse_json_list(text) == ["ELE NÃO ESPERAVA ISSO", "O VILÃO VOLTOU!"]
+
+
+def test_titulo_com_virgula_e_aspas_escapadas():
+    assert parse_json_list('["SIM, ELE DISSE \\"NÃO\\"", "FIM') == ['SIM, ELE DISSE "NÃO"']
+
+
+def test_segmentos_truncados():
+    text = '[{"start": 10, "end": 70, "score": 80, "reason": "luta"}, {"start": 90, "end"'
+    assert parse_json_list(text) == [{"start": 10, "end": 70, "score": 80, "reason": "luta"}]
+
+
+def test_resposta_sem_lista():
+    assert parse_json_list("") == []
+    assert parse_json_list('{"start": 1}') == []
+
+
+def test_max_tokens_cresce_com_a_quantidade():
+    assert titles_max_tokens(8) > titles_max_tokens(4) > titles_max_tokens(1) > 0
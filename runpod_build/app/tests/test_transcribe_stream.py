@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""transcribe_stream repassa a causa da falha (evento de erro / resultado do job)."""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("torch")
+
+from core.ai_services import local_ai_service
+
+
+def test_falha_no_ffmpeg_sobe_com_a_causa(monkeypatch):
+    def broken(source):
+        raise RuntimeError("ffmpeg: 403 Forbidden")
+        yield
+
+    monkeypatch.setattr(local_ai_service, "iter_audio_16k", broken)
+    with pytest.raises(RuntimeError, match="403 Forbidden"):
+        local_ai_service.transcribe_stream("https://exemplo/ep.mp4")
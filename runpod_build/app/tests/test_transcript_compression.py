@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Compressão do roteiro: tira hesitações e repetições, preserva o conteúdo."""
+
+from core.ai_services.transcript_compression import clean_text, compress_transcript
+
+
+def test_artigos_e_palavras_de_conteudo_ficam():
+    assert clean_text("Eu vi um homem com um cachorro, hum, não não") == "Eu vi um homem com um cachorro, não"
+
+
+def test_hesitacoes_saem():
+    assert clean_text("Hã, ahn, eu acho que éh... Hmm, vamos") == "eu acho que vamos"
+
+
+def test_interjeicoes_com_sentido_ficam():
+    assert clean_text("Ah, ué, aham!") == "Ah, ué, aham!"
+
+
+def test_gagueira_e_pontuacao_repetida():
+    assert clean_text("Eu eu vou,, vou sim!!!") == "Eu vou, sim!"
+
+
+def test_compressao_junta_e_descarta_repeticoes():
+    segments = [
+        {"start": 0.0, "end": 2.0, "text": " Hum, onde está o mestre?"},
+        {"start": 2.5, "end": 4.0, "text": " Ele foi embora."},
+        {"start": 4.2, "end": 5.0, "text": " Ele foi embora."},
+        {"start": 30.0, "end": 32.0, "text": " Obrigado por assistir!"},
+    ]
+    compact, report = compress_transcript(segments)
+    assert compact == [{"start": 0.0, "end": 4.0, "text": "onde está o mestre? Ele foi embora."}]
+    assert report["lines"] == [4, 1]
+    assert 0 < report["reduction"] < 1
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""VAD: junção das regiões de fala e volta à linha do tempo original."""
+
+import pytest
+
+from core.ai_services import vad
+from core.ai_services.vad import _merge_regions, remap_timestamps
+
+
+def test_merge_junta_pausas_curtas_e_descarta_regioes_curtas():
+    regions = [(2.5, 3.0), (1.0, 2.0), (10.0, 10.5), (20.5, 20.5)]
+    merged = _merge_regions(regions, duration=20.5)
+    assert merged == [pytest.approx((0.8, 3.2)), pytest.approx((9.8, 10.7))]
+
+
+def test_merge_respeita_os_limites_do_audio():
+    assert _merge_regions([(0.0, 1.0), (4.9, 5.0)], duration=5.0) == [
+        pytest.approx((0.0, 1.2)), pytest.approx((4.7, 5.0))
+    ]
+
+
+def test_remap_devolve_segmentos_e_palavras_ao_original():
+    spans = [(5.0, 0.0, 2.0), (20.0, 2.0, 3.0)]
+    result = {"segments": [
+        {"start": 0.5, "end": 2.0, "text": " a", "words": [{"word": " a", "start": 0.5, "end": 2.0}]},
+        {"start": 2.0, "end": 4.0, "text": " b"},
+    ]}
+    segments = remap_timestamps(result, spans)["segments"]
+    # Um fim exatamente na junção pertence à região anterior
+    assert (segments[0]["start"], segments[0]["end"]) == (5.5, 7.0)
+    assert (segments[0]["words"][0]["start"], segments[0]["words"][0]["end"]) == (5.5, 7.0)
+    assert (segments[1]["start"], segments[1]["end"]) == (20.0, 22.0)
+
+
+def test_remap_sem_spans_nao_altera():
+    result = {"segments": [{"start": 1.0, "end": 2.0}]}
+    assert remap_timestamps(result, []) == {"segments": [{"start": 1.0, "end": 2.0}]}
+
+
+def test_apply_vad_de_energia_ida_e_volta(monkeypatch):
+    np = pytest.importorskip("numpy")
+
+    def sem_silero(audio, sr):
+        raise ImportError
+
+    monkeypatch.setattr(vad, "_silero_regions", sem_silero)
+    sr = vad.SAMPLE_RATE
+    t = np.arange(2 * sr, dtype=np.float32) / sr
+    audio = np.zeros(10 * sr, dtype=np.float32)
+    audio[3 * sr:5 * sr] = 0.3 * np.sin(2 * np.pi * 220 * t)
+
+    speech, spans, stats = vad.apply_vad(audio, sr)
+    assert stats["method"] == "energy" and stats["regions"] == 1
+    assert len(speech) / sr == pytest.approx(2.4, abs=0.05)
+    result = remap_timestamps({"segments": [{"start": 0.2, "end": 2.2}]}, spans)
+    assert result["segments"][0]["start"] == pytest.approx(3.0, abs=0.05)
+    assert result["segments"][0]["end"] == pytest.approx(5.0, abs=0.05)